@@ -1,19 +1,23 @@
-from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from typing import List, Optional
 from app.models.chat_models import (
     CreateChatRequest, CreateMessageRequest, CreateVisualizationRequest,
     UpdateChatTitleRequest, CreateMessageWithVisualizationRequest,
-    Chat, ChatDetail, ChatMessage, ChatVisualization
+    BulkCreateMessagesRequest, BulkCreateMessagesResponse,
+    Chat, ChatDetail, ChatMessage, ChatSearchResult, ChatVisualization, VisualizationData
 )
-from app.db.chat_database import chat_db
+from app.db.chat_database import ChatDatabaseManager, get_chat_db
+from app.db.database import execute_sql_query_cached
+from app.db.query_guard import QueryRejectedError, query_guard
+from app.services.payload_store import STORAGE_LAZY
 
 router = APIRouter(tags=["Chat Management"])
 
 @router.post("/chats", response_model=Chat)
-async def create_chat(request: CreateChatRequest):
+def create_chat(request: CreateChatRequest, db: ChatDatabaseManager = Depends(get_chat_db)):
     """Yeni chat yaradır."""
     try:
-        result = chat_db.create_chat(request.title)
+        result = db.create_chat(request.title)
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
@@ -26,20 +30,60 @@ async def create_chat(request: CreateChatRequest):
         raise HTTPException(status_code=500, detail=f"Chat yaradılarkən xəta: {str(e)}")
 
 @router.get("/chats", response_model=List[Chat])
-async def get_all_chats():
-    """Bütün chatləri qaytarır."""
+def get_all_chats(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    db: ChatDatabaseManager = Depends(get_chat_db),
+):
+    """Chatləri updated_at üzrə səhifə-səhifə qaytarır; növbəti səhifənin kursoru X-Next-Cursor başlığındadır."""
     try:
-        chats = chat_db.get_all_chats()
-        return chats
+        page = db.get_chats_page(limit=limit, cursor_token=cursor)
         
+        if "error" in page:
+            raise HTTPException(status_code=500, detail=page["error"])
+        
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return page["chats"]
+        
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chatlər alınarkən xəta: {str(e)}")
 
+# /chats/{chat_id}-dən əvvəl elan olunmalıdır, əks halda "search" chat_id kimi qəbul edilir
+@router.get("/chats/search", response_model=List[ChatSearchResult])
+def search_chats(
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    db: ChatDatabaseManager = Depends(get_chat_db),
+):
+    """Chat başlıqları, suallar və SQL üzrə axtarış; növbəti səhifənin offset-i X-Next-Cursor başlığındadır."""
+    try:
+        page = db.search(q, limit=limit, offset=offset)
+        
+        if "error" in page:
+            raise HTTPException(status_code=500, detail=page["error"])
+        
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return page["results"]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Axtarış zamanı xəta: {str(e)}")
+
 @router.get("/chats/{chat_id}", response_model=ChatDetail)
-async def get_chat_detail(chat_id: int):
+def get_chat_detail(chat_id: int, db: ChatDatabaseManager = Depends(get_chat_db)):
     """Müəyyən chat-in bütün məlumatlarını qaytarır."""
     try:
-        chat = chat_db.get_chat_detail(chat_id)
+        chat = db.get_chat_detail(chat_id)
         
         if not chat:
             raise HTTPException(status_code=404, detail="Chat tapılmadı")
@@ -51,22 +95,50 @@ async def get_chat_detail(chat_id: int):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Chat məlumatları alınarkən xəta: {str(e)}")
 
-@router.post("/chats/{chat_id}/messages", response_model=ChatMessage)
-async def create_message(chat_id: int, request: CreateMessageRequest):
-    """Chat-ə yeni mesaj əlavə edir."""
+@router.get("/chats/{chat_id}/messages", response_model=List[ChatMessage])
+def get_chat_messages(
+    chat_id: int,
+    response: Response,
+    limit: int = Query(50, ge=1, le=500),
+    after: Optional[int] = Query(None, ge=0, description="Əvvəlki səhifənin son message_order dəyəri"),
+    include_visualizations: bool = True,
+    db: ChatDatabaseManager = Depends(get_chat_db),
+):
+    """Chat mesajlarını message_order üzrə səhifə-səhifə qaytarır."""
     try:
-        # Chat-in mövcud olub-olmadığını yoxla
-        chat = chat_db.get_chat_detail(chat_id)
-        if not chat:
+        page = db.get_messages_page(chat_id, limit=limit, after_order=after,
+                                         include_visualizations=include_visualizations)
+        
+        if "error" in page:
+            raise HTTPException(status_code=500, detail=page["error"])
+        
+        if not page["messages"] and after is None and not db.chat_exists(chat_id):
             raise HTTPException(status_code=404, detail="Chat tapılmadı")
         
-        message = chat_db.create_message(
+        if page["next_cursor"]:
+            response.headers["X-Next-Cursor"] = page["next_cursor"]
+        return page["messages"]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Mesajlar alınarkən xəta: {str(e)}")
+
+@router.post("/chats/{chat_id}/messages", response_model=ChatMessage)
+def create_message(chat_id: int, request: CreateMessageRequest,
+                   db: ChatDatabaseManager = Depends(get_chat_db)):
+    """Chat-ə yeni mesaj əlavə edir."""
+    try:
+        message = db.create_message_with_visualization(
             chat_id=chat_id,
             message_text=request.message_text,
             generated_sql=request.generated_sql
         )
         
-        if not message:
+        if message is None:
+            raise HTTPException(status_code=404, detail="Chat tapılmadı")
+        
+        if "error" in message:
             raise HTTPException(status_code=500, detail="Mesaj yaradıla bilmədi")
         
         return message
@@ -77,35 +149,23 @@ async def create_message(chat_id: int, request: CreateMessageRequest):
         raise HTTPException(status_code=500, detail=f"Mesaj yaradılarkən xəta: {str(e)}")
 
 @router.post("/chats/{chat_id}/messages-with-viz", response_model=ChatMessage)
-async def create_message_with_visualization(chat_id: int, request: CreateMessageWithVisualizationRequest):
-    """Chat-ə mesaj və vizualizasiya birlikdə əlavə edir."""
+def create_message_with_visualization(chat_id: int, request: CreateMessageWithVisualizationRequest,
+                                      db: ChatDatabaseManager = Depends(get_chat_db)):
+    """Chat-ə mesaj və vizualizasiyanı bir tranzaksiyada birlikdə əlavə edir."""
     try:
-        # Chat-in mövcud olub-olmadığını yoxla
-        chat = chat_db.get_chat_detail(chat_id)
-        if not chat:
-            raise HTTPException(status_code=404, detail="Chat tapılmadı")
-        
-        # Mesajı yarat
-        message = chat_db.create_message(
+        message = db.create_message_with_visualization(
             chat_id=chat_id,
             message_text=request.message_text,
-            generated_sql=request.generated_sql
+            generated_sql=request.generated_sql,
+            visualization=request.visualization.model_dump() if request.visualization else None
         )
         
-        if not message:
-            raise HTTPException(status_code=500, detail="Mesaj yaradıla bilmədi")
+        # Chat-in mövcudluğu eyni sorğuda yoxlanılır (UPDATE heç bir sətrə toxunmadısa)
+        if message is None:
+            raise HTTPException(status_code=404, detail="Chat tapılmadı")
         
-        # Əgər vizualizasiya varsa, onu da əlavə et
-        if request.visualization:
-            visualization = chat_db.create_visualization(
-                message_id=message['message_id'],
-                visualization_type=request.visualization.visualization_type,
-                data_json=request.visualization.data_json,
-                chart_config=request.visualization.chart_config
-            )
-            
-            if visualization:
-                message['visualizations'] = [visualization]
+        if "error" in message:
+            raise HTTPException(status_code=500, detail=message["error"])
         
         return message
         
@@ -114,15 +174,40 @@ async def create_message_with_visualization(chat_id: int, request: CreateMessage
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Mesaj və vizualizasiya yaradılarkən xəta: {str(e)}")
 
+@router.post("/chats/{chat_id}/messages/bulk", response_model=BulkCreateMessagesResponse)
+def bulk_create_messages(chat_id: int, request: BulkCreateMessagesRequest,
+                         db: ChatDatabaseManager = Depends(get_chat_db)):
+    """Çoxlu mesajı (vizualizasiyaları ilə) bir tranzaksiyada idxal edir; tarixçə köçürmək üçündür."""
+    try:
+        result = db.bulk_create_messages(
+            chat_id,
+            [message.model_dump() for message in request.messages]
+        )
+        
+        if result is None:
+            raise HTTPException(status_code=404, detail="Chat tapılmadı")
+        
+        if "error" in result:
+            raise HTTPException(status_code=500, detail=result["error"])
+        
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Mesajlar idxal edilərkən xəta: {str(e)}")
+
 @router.post("/messages/{message_id}/visualizations", response_model=ChatVisualization)
-async def create_visualization(message_id: int, request: CreateVisualizationRequest):
+def create_visualization(message_id: int, request: CreateVisualizationRequest,
+                         db: ChatDatabaseManager = Depends(get_chat_db)):
     """Mesaja vizualizasiya əlavə edir."""
     try:
-        visualization = chat_db.create_visualization(
+        visualization = db.create_visualization(
             message_id=message_id,
             visualization_type=request.visualization_type,
             data_json=request.data_json,
-            chart_config=request.chart_config
+            chart_config=request.chart_config,
+            storage_mode=request.storage_mode
         )
         
         if not visualization:
@@ -133,11 +218,50 @@ async def create_visualization(message_id: int, request: CreateVisualizationRequ
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Vizualizasiya yaradılarkən xəta: {str(e)}")
 
+@router.get("/visualizations/{viz_id}/data", response_model=VisualizationData)
+def get_visualization_data(viz_id: int, db: ChatDatabaseManager = Depends(get_chat_db)):
+    """Vizualizasiyanın tam məlumatını qaytarır; lazy saxlanmışsa SQL yenidən icra olunur."""
+    try:
+        source = db.get_visualization_source(viz_id)
+        
+        if not source:
+            raise HTTPException(status_code=404, detail="Vizualizasiya tapılmadı")
+        
+        if "error" in source:
+            raise HTTPException(status_code=500, detail=source["error"])
+        
+        if source['storage_mode'] != STORAGE_LAZY:
+            data = source['data_json']
+        else:
+            try:
+                decision = query_guard.evaluate(source['source_sql'])
+            except QueryRejectedError as e:
+                raise HTTPException(status_code=400, detail=f"Sorğu icra olunmadı: {str(e)}")
+            
+            # Nəticə keşi eyni SQL-in təkrar baxışlarında bazaya getməyə imkan vermir
+            df, _ = execute_sql_query_cached(decision.sql, decision.effective_limit(None))
+            if isinstance(df, dict):
+                raise HTTPException(status_code=400, detail=df.get("error", "SQL icra edilə bilmədi"))
+            data = df.to_dict(orient='records')
+        
+        return {
+            "viz_id": viz_id,
+            "storage_mode": source['storage_mode'],
+            "row_count": len(data) if isinstance(data, list) else source['row_count'],
+            "data": data,
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Vizualizasiya məlumatı alınarkən xəta: {str(e)}")
+
 @router.put("/chats/{chat_id}/title")
-async def update_chat_title(chat_id: int, request: UpdateChatTitleRequest):
+def update_chat_title(chat_id: int, request: UpdateChatTitleRequest,
+                      db: ChatDatabaseManager = Depends(get_chat_db)):
     """Chat başlığını yeniləyir."""
     try:
-        success = chat_db.update_chat_title(chat_id, request.title)
+        success = db.update_chat_title(chat_id, request.title)
         
         if not success:
             raise HTTPException(status_code=404, detail="Chat tapılmadı və ya yenilənə bilmədi")
@@ -150,22 +274,22 @@ async def update_chat_title(chat_id: int, request: UpdateChatTitleRequest):
         raise HTTPException(status_code=500, detail=f"Chat başlığı yenilənərkən xəta: {str(e)}")
 
 @router.put("/chats/{chat_id}/auto-title")
-async def auto_update_chat_title(chat_id: int):
+def auto_update_chat_title(chat_id: int, db: ChatDatabaseManager = Depends(get_chat_db)):
     """Chat-in ilk mesajından avtomatik başlıq yaradır."""
     try:
-        chat = chat_db.get_chat_detail(chat_id)
+        chat = db.get_first_message_text(chat_id)
         
         if not chat:
             raise HTTPException(status_code=404, detail="Chat tapılmadı")
         
-        if not chat['messages']:
+        if chat['first_message'] is None:
             raise HTTPException(status_code=400, detail="Chat-də mesaj yoxdur")
         
         # İlk mesajdan başlıq yarat
-        first_message = chat['messages'][0]['message_text']
-        new_title = chat_db.generate_title_from_message(first_message)
+        first_message = chat['first_message']
+        new_title = db.generate_title_from_message(first_message)
         
-        success = chat_db.update_chat_title(chat_id, new_title)
+        success = db.update_chat_title(chat_id, new_title)
         
         if not success:
             raise HTTPException(status_code=500, detail="Chat başlığı yenilənə bilmədi")
@@ -178,10 +302,10 @@ async def auto_update_chat_title(chat_id: int):
         raise HTTPException(status_code=500, detail=f"Avtomatik başlıq yenilənərkən xəta: {str(e)}")
 
 @router.delete("/chats/{chat_id}")
-async def delete_chat(chat_id: int):
+def delete_chat(chat_id: int, db: ChatDatabaseManager = Depends(get_chat_db)):
     """Chat-i silir."""
     try:
-        success = chat_db.delete_chat(chat_id)
+        success = db.delete_chat(chat_id)
         
         if not success:
             raise HTTPException(status_code=404, detail="Chat tapılmadı və ya silinə bilmədi")
@@ -1,77 +1,583 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+import asyncio
+import datetime
+import decimal
+import json
+import logging
+import time
+from typing import List, Optional
+from urllib.parse import quote
+from fastapi import APIRouter, BackgroundTasks, Header, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, Field
 from app.services import gemini_service
 from app.db import database
+from app.db import chart_queries, pool
+from app.db.chat_database import get_chat_db
+from app.db.query_guard import QueryRejectedError, query_guard
+from app.db.query_log import STATUS_ERROR, STATUS_OK, query_log
+from app.db.schema_catalog import schema_catalog
+from app.db.sql_utils import canonicalize_sql
+from app.services.schema_retriever import schema_retriever
+from app.services.single_flight import nl_sql_flight, single_flight_stats, sql_flight
+from app.services.sql_cache import nl_sql_cache, normalize_question
+from app.services import metrics, result_formats
+from app.services.stage_limits import schema_stage, llm_stage, sql_stage, stage_stats
+from app.services.query_registry import CANCEL_CLIENT, CANCEL_DISCONNECT, QueryCancelledError, query_registry
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 # Frontend-dən gələcək sorğunun modelini təyin edirik
 class QueryRequest(BaseModel):
     query: str
+    stream: bool = False  # True olduqda nəticə NDJSON kimi partiyalarla göndərilir
+    limit: Optional[int] = Field(default=None, ge=0)
+    offset: Optional[int] = Field(default=None, ge=0)
+    batch_size: int = Field(default=1000, ge=1, le=50000)
+    format: Optional[str] = None  # json | arrow | parquet (verilməsə, Accept başlığına görə)
+    include_rows: bool = True  # False olduqda bütün sətirlər əvəzinə yalnız qrafik seriyası qaytarılır
+    max_chart_points: int = Field(default=500, ge=2, le=10000)
+    chart_mode: bool = False  # True olduqda zaman seriyası və nöqtə qrafiki üçün yalnız qrafik nöqtələri qaytarılır
+    chart_method: Optional[str] = None  # pushdown | lttb | minmax | uniform (verilməsə, avtomatik)
+    chat_id: Optional[int] = None  # verilərsə, sual, SQL və nəticə bu chat-ə server tərəfində saxlanılır
+    request_id: Optional[str] = Field(default=None, max_length=64)  # ləğv üçün müştərinin verdiyi id
+    timeout_seconds: Optional[float] = Field(default=None, gt=0)  # sorğunun son müddəti
+
+
+def _json_default(value):
+    """json.dumps-ın tanımadığı bazadan gələn tipləri çevirir."""
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, datetime.timedelta):
+        return value.total_seconds()
+    if isinstance(value, (bytes, memoryview)):
+        return bytes(value).hex()
+    if hasattr(value, 'item'):  # numpy skalyarları
+        return value.item()
+    return str(value)
+
+
+def _ndjson_line(payload):
+    return json.dumps(payload, default=_json_default, ensure_ascii=False) + "\n"
+
+
+def _iter_ndjson(sql_query, columns, batches, sql_cache_hit, message_id=None, guard=None, on_finish=None):
+    """Stream nəticəsini NDJSON sətirlərinə çevirir: meta, sətir partiyaları və yekun sətir.
+
+    on_finish(total_rows, status) stream bitdikdə (və ya xəta ilə kəsildikdə) çağırılır.
+    """
+    yield _ndjson_line({"type": "meta", "generated_sql": sql_query, "columns": columns,
+                        "sql_cache_hit": sql_cache_hit, "message_id": message_id, "guard": guard})
+    total_rows = 0
+    total_bytes = 0
+    try:
+        for batch in batches:
+            total_rows += len(batch)
+            rows = [dict(zip(columns, row)) for row in batch]
+            line = _ndjson_line({"type": "rows", "rows": rows, "rows_so_far": total_rows})
+            total_bytes += len(line.encode("utf-8"))
+            yield line
+    except Exception as e:
+        if on_finish is not None:
+            on_finish(total_rows, STATUS_ERROR)
+        yield _ndjson_line({"type": "error", "detail": f"SQL icrası zamanı xəta: {str(e)}",
+                            "rows_so_far": total_rows})
+        return
+    if on_finish is not None:
+        on_finish(total_rows, STATUS_OK)
+    metrics.query_rows.observe(total_rows)
+    metrics.response_bytes.observe(total_bytes, format="ndjson")
+    yield _ndjson_line({"type": "end", "total_rows": total_rows})
 
 
 @router.get("/tables")
-async def get_available_tables():
+def get_available_tables():
     """Mövcud cədvəllərin siyahısını qaytarır."""
+    snapshot = schema_catalog.get_snapshot()
+    if snapshot is None:
+        raise HTTPException(status_code=500, detail="Verilənlər bazası sxemi alına bilmədi")
+    return snapshot.table_names
+
+
+@router.post("/schema/refresh")
+def refresh_schema():
+    """Sxem keşini dərhal yeniləyir."""
+    snapshot = schema_catalog.get_snapshot(force_refresh=True)
+    if snapshot is None:
+        raise HTTPException(status_code=500, detail="Verilənlər bazası sxemi alına bilmədi")
+    return {
+        "fingerprint": snapshot.fingerprint,
+        "table_count": len(snapshot.tables),
+        "loaded_at": snapshot.loaded_at,
+    }
+
+
+@router.get("/health/db")
+def get_db_health():
+    """Əlaqə hovuzlarının sağlamlıq vəziyyətini və metrikalarını qaytarır."""
+    health = pool.health_check_all()
+    return {
+        "healthy": all(health.values()),
+        "databases": health,
+        "pools": pool.pool_stats(),
+        "stages": stage_stats(),
+    }
+
+
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Keşlərin hit/miss statistikasını qaytarır."""
+    from app.db.preaggregations import preaggregations
+    return {"nl_sql": nl_sql_cache.stats(), "results": database.result_cache.stats(),
+            "query_guard": query_guard.stats(), "queries": query_registry.stats(),
+            "query_log": query_log.stats(), "preaggregations": preaggregations.stats(),
+            "single_flight": single_flight_stats()}
+
+
+class CacheInvalidationRequest(BaseModel):
+    tables: List[str] = []  # boş olduqda bütün nəticə keşi təmizlənir
+
+
+@router.post("/cache/invalidate")
+def invalidate_result_cache(request: CacheInvalidationRequest):
+    """Verilmiş cədvəllərdən oxuyan keşlənmiş nəticələri silir (məs. ETL yükləməsindən sonra)."""
+    if request.tables:
+        removed = database.result_cache.invalidate_tables(request.tables)
+    else:
+        removed = database.result_cache.clear()
+    return {"invalidated": removed}
+
+
+async def _generate_sql(question):
+    """Sual üçün (SQL, keşdən gəlibmi, sxem versiyası) qaytarır (keşdən və ya Gemini vasitəsilə).
+
+    Yeni SQL keşə burada yazılmır — yalnız yoxlamadan keçib uğurla icra olunduqdan sonra.
+    """
+    # 1. Baza sxemini alırıq (bloklayan işlər event loop-dan kənarda icra olunur)
+    with metrics.stage("schema"):
+        snapshot = await schema_stage.run_blocking(schema_catalog.get_snapshot)
+    if not snapshot or not snapshot.prompt_text:
+        raise HTTPException(status_code=500, detail="Verilənlər bazası sxemi alına bilmədi.")
+
+    # 2. Təbii dili SQL-ə çeviririk (eyni sual bu sxem versiyası üçün artıq soruşulubsa, keşdən)
+    sql_query = nl_sql_cache.get(question, snapshot.fingerprint)
+    if sql_query is not None:
+        return sql_query, True, snapshot.fingerprint
+
+    # Eyni sual üçün Gemini çağırışı artıq gedirsə, onun nəticəsi gözlənilir
+    with metrics.stage("llm"):
+        sql_query, _ = await nl_sql_flight.run((normalize_question(question), snapshot.fingerprint),
+                                               lambda: _convert_to_sql(question, snapshot))
+    return sql_query, False, snapshot.fingerprint
+
+
+async def _convert_to_sql(question, snapshot):
+    """Sualı Gemini ilə SQL-ə çevirir."""
+    # Prompt-a yalnız suala uyğun cədvəlləri (və FK qonşularını) daxil edirik
+    with metrics.stage("prompt"):
+        db_schema = schema_retriever.select(question, snapshot).text
+    sql_query = await llm_stage.run(
+        lambda: gemini_service.convert_natural_language_to_sql_async(question, db_schema)
+    )
+    
+    # Əgər Gemini xəta qaytarsa
+    if "Gemini API xətası" in sql_query:
+         raise HTTPException(status_code=500, detail=sql_query)
+    return sql_query
+
+
+async def _guard_query(sql_query, limit):
+    """İcradan əvvəl SQL-i yoxlayır (yalnız oxuma, EXPLAIN əsasında xərc və sətir hədləri)."""
     try:
-        from app.db.database import get_db_connection
-        
-        conn = get_db_connection()
-        if not conn:
-            raise HTTPException(status_code=500, detail="Verilənlər bazası əlaqəsi yaradıla bilmədi")
-        
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_type = 'BASE TABLE'
-            ORDER BY table_name;
-        """)
-        
-        tables = cursor.fetchall()
-        table_names = [table[0] for table in tables]
-        
-        conn.close()
-        
-        return table_names
-        
+        with metrics.stage("guard"):
+            return await sql_stage.run_blocking(query_guard.evaluate, sql_query, limit)
+    except QueryRejectedError as e:
+        raise HTTPException(status_code=400, detail=f"Sorğu icra olunmadı: {str(e)}")
+    except asyncio.TimeoutError:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Cədvəllər alınarkən xəta: {str(e)}")
+        # EXPLAIN-də SQL xətası
+        raise HTTPException(status_code=400, detail=f"SQL icrası zamanı xəta: {str(e)}")
+
+
+async def _stream_query(request, decision, sql_query, sql_cache_hit, message_id=None, request_id=None):
+    """Nəticəni server-side cursor ilə NDJSON formatında göndərən cavab qaytarır."""
+    limit = decision.effective_limit(request.limit)
+    batches = database.stream_sql_query(decision.sql, request.batch_size, limit, request.offset)
+    started = time.perf_counter()
+
+    def log_stream(total_rows, status):
+        query_log.record(database.apply_limit_offset(decision.sql, limit, request.offset), total_rows,
+                         (time.perf_counter() - started) * 1000, decision.plan_summary,
+                         status=status, request_id=request_id)
+
+    try:
+        # İlk partiyanı cavab başlamazdan əvvəl alırıq ki, SQL xətası düzgün status kodu ilə qayıtsın
+        with metrics.stage("sql"):
+            columns = await sql_stage.run_blocking(next, batches)
+    except asyncio.TimeoutError:
+        raise
+    except Exception as e:
+        batches.close()
+        log_stream(None, STATUS_ERROR)
+        raise HTTPException(status_code=400, detail=f"SQL icrası zamanı xəta: {str(e)}")
+
+    return StreamingResponse(
+        _iter_ndjson(sql_query, columns, batches, sql_cache_hit, message_id, decision.to_dict(), log_stream),
+        media_type="application/x-ndjson",
+    )
+
+
+def _serialize_columnar(df, result_format):
+    """DataFrame-i birbaşa Arrow IPC və ya Parquet baytlarına çevirir."""
+    if result_format == "arrow":
+        return result_formats.dataframe_to_arrow_ipc(df)
+    return result_formats.dataframe_to_parquet(df)
+
+
+async def _columnar_response(df, result_format, sql_query, sql_cache_hit, result_cache_info,
+                             message_id=None, decision=None):
+    """Nəticəni sütun əsaslı (Arrow/Parquet) binar cavab kimi qaytarır."""
+    with metrics.stage("serialize"):
+        content = await sql_stage.run_blocking(_serialize_columnar, df, result_format)
+    metrics.response_bytes.observe(len(content), format=result_format)
+    headers = {
+        # SQL-də qeyri-ASCII simvollar ola bilər, ona görə URL-encode edirik
+        "X-Generated-SQL": quote(sql_query),
+        "X-SQL-Cache-Hit": str(sql_cache_hit).lower(),
+        "X-Row-Count": str(len(df)),
+        "X-Result-Cache": "hit" if result_cache_info["hit"] else "miss",
+        "X-Result-Cache-Age": str(result_cache_info["age_seconds"]),
+    }
+    if decision is not None:
+        headers["X-Query-Guard"] = decision.action
+    if "preaggregation" in result_cache_info:
+        headers["X-Preaggregation"] = result_cache_info["preaggregation"]["rollup"]
+    if message_id is not None:
+        headers["X-Message-Id"] = str(message_id)
+    if result_format == "parquet":
+        headers["Content-Disposition"] = 'attachment; filename="query_result.parquet"'
+    return Response(content=content, media_type=result_formats.FORMAT_MEDIA_TYPES[result_format],
+                    headers=headers)
+
+
+def _build_json_payload(df, request):
+    """DataFrame-dən JSON cavabının məlumat hissəsini (sətirlər və ya qrafik seriyası, profil) qurur."""
+    from app.services.result_profiler import build_chart_series, profile_result  # numpy/pandas tənbəl yüklənir
+    payload = profile_result(df)
+    visualization = {"type": payload["visualization_type"], "config": payload["visualization_config"]}
+    if not _chart_only(request, visualization["type"]):
+        payload["data"] = df.to_dict(orient='records')
+    else:
+        method = request.chart_method if request.chart_method != CHART_PUSHDOWN else None
+        chart = build_chart_series(df, visualization, request.max_chart_points, method)
+        payload["data"] = []
+        payload["chart_data"] = chart.to_dict(orient='records')
+        payload["chart"] = {"method": method or "auto", "points": int(len(chart)),
+                            "total_rows": int(len(df)), "full_result_available": True}
+    payload["row_count"] = int(len(df))
+    return payload
+
+
+CHART_PUSHDOWN = "pushdown"
+CHART_METHODS = (CHART_PUSHDOWN, "lttb", "minmax", "uniform")
+# chart_mode-da nöqtələri azaldılan vizualizasiyalar; digərləri üçün sətirlər adi qaydada qaytarılır
+CHART_MODE_TYPES = ("timeseries", "scatter")
+
 
+def _chart_only(request, chart_type=None):
+    """Cavabda sətirlər əvəzinə yalnız qrafik seriyası qaytarılmalıdırmı."""
+    if not request.include_rows:
+        return True
+    return request.chart_mode and (chart_type is None or chart_type in CHART_MODE_TYPES)
+
+
+def _wants_pushdown(request, decision):
+    """Qrafik rejimində böyük nəticənin nöqtələri Postgres-də aqreqasiya olunmalıdırmı."""
+    if not _chart_only(request) or request.chart_method not in (None, CHART_PUSHDOWN):
+        return False
+    if request.chart_method == CHART_PUSHDOWN:
+        return True
+    return decision.estimated_rows is not None and decision.estimated_rows > chart_queries.PUSHDOWN_MIN_ROWS
+
+
+def _execute_logged(sql, limit=None, offset=None, plan_summary=None):
+    """execute_sql_query_cached-i çağırır və icranı sorğu jurnalına yazır."""
+    started = time.perf_counter()
+    df, result_cache_info = database.execute_sql_query_cached(sql, limit, offset)
+    failed = isinstance(df, dict) and "error" in df
+    query_log.record(database.apply_limit_offset(sql, limit, offset), None if failed else int(len(df)),
+                     (time.perf_counter() - started) * 1000, plan_summary,
+                     result_cache_hit=result_cache_info["hit"], status=STATUS_ERROR if failed else STATUS_OK)
+    return df, result_cache_info
+
+
+async def _execute_coalesced(decision, limit, offset):
+    """Eyni səhifələnmiş SQL-in paralel icralarını birləşdirir; gözləyənlər nəticəni paylaşır."""
+    key = canonicalize_sql(database.apply_limit_offset(decision.sql, limit, offset))
+    (df, result_cache_info), shared = await sql_flight.run(key, lambda: sql_stage.run_blocking(
+        _execute_logged, decision.sql, limit, offset, decision.plan_summary
+    ))
+    if shared:
+        result_cache_info = dict(result_cache_info, coalesced=True)
+    return df, result_cache_info
+
+
+def _fetch_df(sql):
+    df, _ = _execute_logged(sql)
+    if isinstance(df, dict) and "error" in df:
+        raise HTTPException(status_code=400, detail=df["error"])
+    return df
+
+
+def _build_pushdown_payload(source_sql, request):
+    """Zaman seriyası və nöqtə qrafiki üçün nöqtələri bazada aqreqasiya edərək cavab qurur.
+
+    Vizualizasiya növü nəticənin ilk PROBE_ROWS sətrinə görə seçilir; digər növlər üçün None qaytarılır
+    və nəticə adi qaydada oxunur.
+    """
+    from app.services.result_profiler import profile_result
+    probe = _fetch_df(database.apply_limit_offset(source_sql, chart_queries.PROBE_ROWS))
+    payload = profile_result(probe)
+    chart_type, config = payload["visualization_type"], payload["visualization_config"]
+    if chart_type not in CHART_MODE_TYPES or len(probe) < chart_queries.PROBE_ROWS:
+        return None
+
+    y_columns = config["y"] if chart_type == "timeseries" else [config["y"]]
+    summary_df = _fetch_df(chart_queries.build_summary_sql(source_sql, config["x"], y_columns))
+    summary = chart_queries.parse_summary(summary_df.iloc[0].to_dict(), y_columns)
+
+    chart = {"method": CHART_PUSHDOWN, "total_rows": summary["total_rows"], "full_result_available": True}
+    if chart_type == "timeseries":
+        unit = chart_queries.choose_time_unit(summary["x_min"], summary["x_max"], request.max_chart_points)
+        chart_sql = chart_queries.build_timeseries_sql(source_sql, config["x"], y_columns, unit)
+        chart["unit"] = unit
+    else:
+        x_range = (summary["x_min"], summary["x_max"])
+        y_range = (summary["numeric_stats"][config["y"]]["min"], summary["numeric_stats"][config["y"]]["max"])
+        if not all(chart_queries.is_finite(bound) for bound in x_range + y_range):
+            # NaN/Infinity qiymətləri ilə width_bucket sərhədləri qurula bilmir — adi yola qayıdırıq
+            return None
+        chart_sql = chart_queries.build_scatter_sql(source_sql, config["x"], config["y"], x_range, y_range,
+                                                    request.max_chart_points)
+        chart["bins"] = chart_queries.scatter_bins(request.max_chart_points)
+    chart_df = _fetch_df(chart_sql)
+    chart["points"] = int(len(chart_df))
+
+    payload["statistics"] = chart_queries.summary_statistics(summary, payload["statistics"])
+    payload.update({"data": [], "chart_data": chart_df.to_dict(orient='records'), "chart": chart,
+                    "row_count": summary["total_rows"]})
+    return payload
+
+
+def _json_body(payload):
+    """JSON cavabını baytlara çevirir (Starlette-in JSONResponse parametrləri ilə)."""
+    return json.dumps(payload, default=_json_default, ensure_ascii=False, allow_nan=False,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def _save_query_message(chat_id, message_id, question, sql_query, df=None, payload=None):
+    """Sualı, SQL-i və nəticəni chat-ə yazır; cavab göndərildikdən sonra fon tapşırığı kimi işləyir."""
+    visualization = None
+    try:
+        if df is not None or payload is not None:
+            from app.services.result_profiler import profile_result
+            profile = payload if payload is not None else profile_result(df)
+            # Qrafik rejimində (sətirlər qaytarılmadıqda) tam nəticə, aqreqasiyada isə qrafik nöqtələri yazılır
+            rows = None
+            if payload is not None:
+                rows = payload.get("data") or (payload.get("chart_data") if df is None else None)
+            visualization = {
+                "visualization_type": profile["visualization_type"],
+                "data_json": rows if rows is not None else df.to_dict(orient='records'),
+                "chart_config": profile["visualization_config"],
+            }
+        result = get_chat_db().create_message_with_visualization(
+            chat_id, question, sql_query, visualization, message_id=message_id
+        )
+        if result is None:
+            logger.warning("Mesaj saxlanmadı: chat %s tapılmadı", chat_id)
+        elif "error" in result:
+            logger.error("Mesaj saxlanmadı: %s", result['error'])
+    except Exception as e:
+        logger.exception("Sorğu nəticəsi chat-ə saxlanarkən xəta: %s", e)
 
 
 @router.post("/query")
-async def process_query(request: QueryRequest):
-    """Frontend-dən gələn sorğunu qəbul edir, SQL-ə çevirir və nəticəni qaytarır."""
+async def process_query(request: QueryRequest, http_request: Request, background_tasks: BackgroundTasks,
+                        accept: Optional[str] = Header(default=None)):
+    """Frontend-dən gələn sorğunu qəbul edir, SQL-ə çevirir və nəticəni qaytarır.
+
+    Hər sorğu id və son müddət alır; DELETE /query/{request_id} və ya bağlantının kəsilməsi
+    LLM çağırışını və bazada icra olunan əmri dayandırır.
+    """
+    try:
+        ctx = query_registry.register(request.request_id, request.query, request.timeout_seconds)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
     try:
-        # 1. Baza sxemini alırıq
-        db_schema = database.get_db_schema()
-        if not db_schema:
-            raise HTTPException(status_code=500, detail="Verilənlər bazası sxemi alına bilmədi.")
-
-        # 2. Təbii dili SQL-ə çeviririk
-        sql_query = gemini_service.convert_natural_language_to_sql(request.query, db_schema)
-        
-        # Əgər Gemini xəta qaytarsa
-        if "Gemini API xətası" in sql_query:
-             raise HTTPException(status_code=500, detail=sql_query)
-
-        # 3. SQL-i icra edib nəticəni alırıq
-        result = database.execute_sql_query(sql_query)
-        
-        # Əgər SQL icrası zamanı xəta olsa
-        if isinstance(result, dict) and "error" in result:
-            raise HTTPException(status_code=400, detail=result["error"])
-
-        # 4. Nəticəni və SQL-i frontend-ə qaytarırıq
-        return {"generated_sql": sql_query, "data": result}
-        
+        response = await query_registry.run(
+            ctx, _process_query(request, background_tasks, accept, ctx.request_id), http_request
+        )
+    except QueryCancelledError as e:
+        query_registry.finish(ctx)
+        raise HTTPException(status_code=499, detail=str(e))
+    except asyncio.TimeoutError:
+        query_registry.finish(ctx)
+        raise HTTPException(status_code=504, detail="Sorğunun icra müddəti bitdi")
+    except BaseException:
+        query_registry.finish(ctx, failed=True)
+        raise
+
+    if isinstance(response, StreamingResponse):
+        # Stream davam etdikcə sorğu reyestrdə qalır ki, onu ləğv etmək mümkün olsun
+        response.body_iterator = _release_after_stream(response.body_iterator, ctx)
+    else:
+        query_registry.finish(ctx)
+    if isinstance(response, Response):
+        response.headers["X-Request-Id"] = ctx.request_id
+    return response
+
+
+@router.delete("/query/{request_id}")
+async def cancel_query(request_id: str):
+    """İcra olunan sorğunu ləğv edir (LLM çağırışı və bazadakı əmr dayandırılır)."""
+    ctx = query_registry.get(request_id)
+    if ctx is None:
+        raise HTTPException(status_code=404, detail="Aktiv sorğu tapılmadı")
+    cancelled = query_registry.cancel(ctx, CANCEL_CLIENT)
+    return {"request_id": request_id, "cancelled": cancelled, "reason": ctx.cancel_reason}
+
+
+@router.get("/query/active")
+def get_active_queries():
+    """Hazırda icra olunan sorğuları və ləğv sayğaclarını qaytarır."""
+    return {"queries": query_registry.active(), "stats": query_registry.stats()}
+
+
+async def _json_response(response, request, background_tasks, sql_query, sql_cache_hit, result_cache_info,
+                         decision, request_id, message_id, df=None):
+    """JSON cavabını tamamlayır, chat-ə yazını fona planlaşdırır və baytlara çevirir."""
+    response.update({"generated_sql": sql_query, "sql_cache_hit": sql_cache_hit,
+                     "result_cache": result_cache_info, "guard": decision.to_dict(),
+                     "preaggregation": result_cache_info.get("preaggregation"), "request_id": request_id})
+    if message_id is not None:
+        # 6. Chat-ə yazı cavabın kritik yolundan kənarda, cavab göndərildikdən sonra edilir
+        background_tasks.add_task(_save_query_message, request.chat_id, message_id,
+                                  request.query, sql_query, df, response)
+        response.update({"chat_id": request.chat_id, "message_id": message_id})
+    with metrics.stage("serialize"):
+        content = await sql_stage.run_blocking(_json_body, response)
+    metrics.response_bytes.observe(len(content), format="json")
+    return Response(content=content, media_type="application/json")
+
+
+async def _release_after_stream(body_iterator, ctx):
+    """Stream bitdikdə sorğunu reyestrdən çıxarır; yarımçıq qalıbsa, bazadakı əmri ləğv edir."""
+    finished = False
+    try:
+        async for chunk in body_iterator:
+            yield chunk
+        finished = True
+    finally:
+        if not finished:
+            query_registry.cancel(ctx, CANCEL_DISCONNECT)
+        query_registry.finish(ctx)
+
+
+async def _process_query(request, background_tasks, accept, request_id):
+    """Sorğu pipeline-ı: SQL yaradılması, yoxlama, icra və cavabın qurulması."""
+    try:
+        try:
+            result_format = result_formats.negotiate_format(accept, request.format)
+        except result_formats.UnsupportedFormatError as e:
+            raise HTTPException(status_code=406, detail=str(e))
+
+        message_id = None
+        if request.chat_id is not None:
+            # id indi ayrılır ki, müştəri nəticəni geri göndərmədən mesaja istinad edə bilsin
+            message_id = await asyncio.to_thread(get_chat_db().reserve_message_id, request.chat_id)
+            if message_id is None:
+                raise HTTPException(status_code=404, detail="Chat tapılmadı")
+
+        if (not request.stream and request.chart_method is not None
+                and request.chart_method not in CHART_METHODS):
+            raise HTTPException(status_code=400, detail=f"Naməlum qrafik üsulu: {request.chart_method}")
+
+        sql_query, sql_cache_hit, schema_fingerprint = await _generate_sql(request.query)
+        try:
+            response = await _run_generated_sql(request, background_tasks, result_format, request_id,
+                                                message_id, sql_query, sql_cache_hit)
+        except HTTPException as e:
+            if e.status_code == 400:
+                # Guard rədd etdi və ya SQL xəta verdi — keşdəki SQL yenidən istifadə olunmamalıdır
+                nl_sql_cache.invalidate(request.query, schema_fingerprint)
+            raise
+        if not sql_cache_hit:
+            nl_sql_cache.set(request.query, schema_fingerprint, sql_query)
+        return response
+
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Sorğunun icra müddəti bitdi")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gözlənilməyən xəta baş verdi: {str(e)}")
-    
 
 
+async def _run_generated_sql(request, background_tasks, result_format, request_id, message_id, sql_query,
+                             sql_cache_hit):
+    """Yaradılmış SQL-i yoxlayır, icra edir və cavabı qurur (SQL xətalarında 400 qaldırır)."""
+    # 3. İcradan əvvəl yoxlama: icazə, LIMIT, seçmə rejimi və ya rədd
+    decision = await _guard_query(sql_query, request.limit)
+    limit = decision.effective_limit(request.limit)
+
+    if request.stream:
+        if message_id is not None:
+            # Stream nəticəsi yaddaşda saxlanmır — mesaj yalnız SQL ilə yazılır
+            background_tasks.add_task(_save_query_message, request.chat_id, message_id,
+                                      request.query, sql_query)
+        return await _stream_query(request, decision, sql_query, sql_cache_hit, message_id, request_id)
+
+    # Qrafik rejimində böyük nəticə tam oxunmur: nöqtələr bazada aqreqasiya olunur
+    if result_format == "json" and _wants_pushdown(request, decision):
+        # Aqreqasiyanın nəticəsi onsuz da məhduddur: guard-ın sətir limiti (effective_limit) tətbiq
+        # olunmur, əks halda "dəqiq" say, statistika və qrafik yalnız ilk sətirləri əhatə edər
+        source_sql = database.apply_limit_offset(decision.sql, request.limit, request.offset)
+        with metrics.stage("chart"):
+            response = await sql_stage.run_blocking(_build_pushdown_payload, source_sql, request)
+        if response is not None:
+            return await _json_response(response, request, background_tasks, sql_query, sql_cache_hit,
+                                        {"hit": False, "age_seconds": 0.0}, decision, request_id,
+                                        message_id)
+
+    # 4. SQL-i icra edib nəticəni alırıq (eyni SQL bu yaxınlarda icra olunubsa, keşdən;
+    # hazırda icra olunursa, həmin icranın nəticəsi gözlənilir)
+    with metrics.stage("sql"):
+        df, result_cache_info = await _execute_coalesced(decision, limit, request.offset)
+    
+    # Əgər SQL icrası zamanı xəta olsa
+    if isinstance(df, dict) and "error" in df:
+        raise HTTPException(status_code=400, detail=df["error"])
+
+    if result_format != "json":
+        try:
+            response = await _columnar_response(df, result_format, sql_query, sql_cache_hit,
+                                                result_cache_info, message_id, decision)
+        except result_formats.UnsupportedFormatError as e:
+            raise HTTPException(status_code=406, detail=str(e))
+        if message_id is not None:
+            background_tasks.add_task(_save_query_message, request.chat_id, message_id,
+                                      request.query, sql_query, df)
+        return response
 
+    # 5. Nəticəni profilləşdirib (statistika, vizualizasiya seçimi) frontend-ə qaytarırıq
+    with metrics.stage("profile"):
+        response = await sql_stage.run_blocking(_build_json_payload, df, request)
+    return await _json_response(response, request, background_tasks, sql_query, sql_cache_hit,
+                                result_cache_info, decision, request_id, message_id, df)
 
@@ -0,0 +1,157 @@
+import datetime
+import math
+import os
+from typing import Any, Dict, Optional, Sequence
+
+# Təxmini sətir sayı bundan çox olduqda qrafik nöqtələri Postgres-də aqreqasiya olunur
+PUSHDOWN_MIN_ROWS = int(os.getenv('CHART_PUSHDOWN_MIN_ROWS', '20000'))
+# Vizualizasiya növünü müəyyən etmək üçün oxunan sətir sayı
+PROBE_ROWS = int(os.getenv('CHART_PROBE_ROWS', '1000'))
+
+# date_trunc vahidləri və onların təxmini uzunluğu (saniyə)
+TIME_UNITS = (
+    ('second', 1),
+    ('minute', 60),
+    ('hour', 3600),
+    ('day', 86400),
+    ('week', 604800),
+    ('month', 2629746),
+    ('quarter', 7889238),
+    ('year', 31556952),
+)
+
+
+def quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _source(sql: str) -> str:
+    return f"(\n{sql.strip().rstrip(';')}\n) AS chart_source"
+
+
+def is_finite(value: Any) -> bool:
+    """Qiymət SQL literalı kimi yazıla bilən sonlu ədəddirmi (NaN/Infinity deyil)."""
+    try:
+        return math.isfinite(float(value))
+    except (TypeError, ValueError):
+        return False
+
+
+def _number_literal(value: Any) -> str:
+    if not is_finite(value):
+        # repr(float('nan')) 'nan' verir — bu, etibarsız SQL-dir
+        raise ValueError(f"Sonlu olmayan ədəd SQL literalı ola bilməz: {value!r}")
+    return repr(float(value))
+
+
+def _finite_or_none(value: Any) -> Any:
+    """float8 NaN/Infinity qiymətlərini None ilə əvəz edir (JSON-da NaN olmur)."""
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def build_summary_sql(sql: str, x: str, y_columns: Sequence[str]) -> str:
+    """Dəqiq sətir sayı, x sütununun diapazonu və y sütunlarının statistikası üçün sorğu."""
+    qx = quote_identifier(x)
+    parts = ["count(*) AS total_rows", f"min({qx}) AS x_min", f"max({qx}) AS x_max"]
+    for i, column in enumerate(y_columns):
+        qy = quote_identifier(column)
+        parts.extend([
+            f"sum({qy})::float8 AS y{i}_sum", f"avg({qy})::float8 AS y{i}_avg",
+            f"min({qy})::float8 AS y{i}_min", f"max({qy})::float8 AS y{i}_max",
+            f"count({qy}) AS y{i}_count",
+        ])
+    return f"SELECT {', '.join(parts)} FROM {_source(sql)}"
+
+
+def parse_summary(row: Dict[str, Any], y_columns: Sequence[str]) -> Dict[str, Any]:
+    """build_summary_sql nəticəsini ümumi sətir sayı, x diapazonu və ədədi statistikaya çevirir."""
+    numeric_stats = {}
+    for i, column in enumerate(y_columns):
+        numeric_stats[column] = {
+            "sum": _finite_or_none(row[f"y{i}_sum"]), "avg": _finite_or_none(row[f"y{i}_avg"]),
+            "min": _finite_or_none(row[f"y{i}_min"]), "max": _finite_or_none(row[f"y{i}_max"]),
+            "count": int(row[f"y{i}_count"]),
+        }
+    return {
+        "total_rows": int(row["total_rows"]),
+        "x_min": row["x_min"],
+        "x_max": row["x_max"],
+        "numeric_stats": numeric_stats,
+    }
+
+
+def _to_datetime(value) -> Optional[datetime.datetime]:
+    if value is None:
+        return None
+    if hasattr(value, 'to_pydatetime'):  # pandas.Timestamp
+        value = value.to_pydatetime()
+    if isinstance(value, datetime.datetime):
+        return value
+    if isinstance(value, datetime.date):
+        return datetime.datetime(value.year, value.month, value.day)
+    return None
+
+
+def choose_time_unit(x_min, x_max, max_points: int) -> str:
+    """Diapazonu ən çoxu max_points intervala bölən ən kiçik date_trunc vahidini seçir."""
+    start, end = _to_datetime(x_min), _to_datetime(x_max)
+    if start is None or end is None:
+        return 'day'
+    span = abs((end - start).total_seconds())
+    for unit, seconds in TIME_UNITS:
+        if span / seconds < max_points:
+            return unit
+    return TIME_UNITS[-1][0]
+
+
+def build_timeseries_sql(sql: str, x: str, y_columns: Sequence[str], unit: str) -> str:
+    """Zaman seriyasını date_trunc ilə intervallara bölür: hər interval üçün y sütunlarının ortası."""
+    if unit not in dict(TIME_UNITS):
+        raise ValueError(f"Naməlum zaman vahidi: {unit}")
+    qx = quote_identifier(x)
+    columns = [f"date_trunc('{unit}', {qx}) AS {qx}"]
+    columns += [f"avg({quote_identifier(c)})::float8 AS {quote_identifier(c)}" for c in y_columns]
+    columns.append("count(*) AS point_count")
+    return (f"SELECT {', '.join(columns)} FROM {_source(sql)} "
+            f"WHERE {qx} IS NOT NULL GROUP BY 1 ORDER BY 1")
+
+
+def _bucket_expression(column: str, low, high, bins: int) -> Optional[str]:
+    """Ox üzrə width_bucket ifadəsi; bütün qiymətlər eynidirsə (sərhədlər bərabər) None."""
+    if low is None or high is None or float(low) == float(high):
+        return None
+    return (f"width_bucket({quote_identifier(column)}::float8, "
+            f"{_number_literal(low)}, {_number_literal(high)}, {int(bins)})")
+
+
+def scatter_bins(max_points: int) -> int:
+    """Hər ox üzrə interval sayı (width_bucket yuxarı sərhəd üçün əlavə interval yaradır)."""
+    return max(2, int(math.sqrt(max_points)) - 1)
+
+
+def build_scatter_sql(sql: str, x: str, y: str, x_range: Sequence[Any], y_range: Sequence[Any],
+                      max_points: int) -> str:
+    """Nöqtə qrafikini width_bucket ilə 2D şəbəkəyə bölür: hər dolu xana üçün orta nöqtə və say."""
+    bins = scatter_bins(max_points)
+    qx, qy = quote_identifier(x), quote_identifier(y)
+    buckets = [expression for expression in (_bucket_expression(x, x_range[0], x_range[1], bins),
+                                              _bucket_expression(y, y_range[0], y_range[1], bins))
+               if expression is not None]
+    group_by = f" GROUP BY {', '.join(buckets)}" if buckets else ""
+    return (f"SELECT avg({qx})::float8 AS {qx}, avg({qy})::float8 AS {qy}, count(*) AS point_count "
+            f"FROM {_source(sql)} WHERE {qx} IS NOT NULL AND {qy} IS NOT NULL"
+            f"{group_by} ORDER BY 1")
+
+
+def summary_statistics(summary: Dict[str, Any], probe_statistics: Dict[str, Any]) -> Dict[str, Any]:
+    """Nümunə üzrə statistikanı tam nəticənin dəqiq say və ədədi göstəriciləri ilə əvəz edir."""
+    statistics = dict(probe_statistics)
+    statistics["totalRows"] = summary["total_rows"]
+    numeric_stats = dict(statistics.get("numericStats", {}))
+    numeric_stats.update(summary["numeric_stats"])
+    statistics["numericStats"] = numeric_stats
+    # Kateqoriya statistikası yalnız nümunə üzrədir
+    statistics["categoryStatsSampled"] = bool(statistics.get("categoryStats"))
+    return statistics
@@ -1,9 +1,19 @@
 import psycopg2
 import psycopg2.extras
+import base64
+import os
+import logging
+import threading
+from contextlib import contextmanager
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 import json
-from app.db.database import get_db_connection
+import re
+from app.db.pool import get_pool, init_pool
+from app.services.metrics import timed_db_method
+from app.services.payload_store import STORAGE_LAZY, decode_payload, encode_visualization_data
+
+logger = logging.getLogger(__name__)
 
 
 DB_CONFIG = {
@@ -14,22 +24,74 @@ DB_CONFIG = {
     'password': '**'
 }
 
+# Əlaqə hovuzunun parametrləri
+POOL_NAME = 'chat_history'
+POOL_CONFIG = {
+    'minconn': int(os.getenv('CHAT_DB_POOL_MIN', '1')),
+    'maxconn': int(os.getenv('CHAT_DB_POOL_MAX', '10')),
+    'acquire_timeout': float(os.getenv('CHAT_DB_POOL_TIMEOUT', '5')),
+    'health_check_interval': float(os.getenv('CHAT_DB_POOL_HEALTH_INTERVAL', '30')),
+}
+
+
+def init_db_pool():
+    """'chat_history' bazası üçün əlaqə hovuzunu yaradır."""
+    return init_pool(POOL_NAME, DB_CONFIG, **POOL_CONFIG)
+
 
+@contextmanager
 def get_db_connection():
-    """PostgreSQL verilənlər bazasına əlaqə yaradır."""
-    try:
-        conn = psycopg2.connect(
-            host=DB_CONFIG['host'],
-            port=DB_CONFIG['port'],
-            database=DB_CONFIG['database'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password']
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
+    """Hovuzdan chat bazası üçün əlaqə götürür və iş bitdikdə onu geri qaytarır."""
+    with get_pool(POOL_NAME).connection() as conn:
+        yield conn
+
+def delete_orphan_payloads(cursor, payload_hashes=None) -> int:
+    """Heç bir vizualizasiyanın istinad etmədiyi payload-ları silir (verilibsə, yalnız bu hash-lər arasında).
+
+    Paralel yazılan mesaj eyni hash-i ON CONFLICT DO NOTHING ilə təkrar istifadə edə bilər. SHARE ROW
+    EXCLUSIVE kilidi payload yazan tranzaksiyaların (ROW EXCLUSIVE) bitməsini gözləyir və tranzaksiya
+    bitənə qədər yenilərini saxlayır — silinən payload-a yeni istinad yarana bilməz.
+    """
+    cursor.execute("LOCK TABLE visualization_payloads IN SHARE ROW EXCLUSIVE MODE")
+    sql = """
+        DELETE FROM visualization_payloads p
+        WHERE NOT EXISTS (SELECT 1 FROM chat_visualizations v WHERE v.payload_hash = p.payload_hash)
+    """
+    if payload_hashes is None:
+        cursor.execute(sql)
+    else:
+        cursor.execute(sql + " AND p.payload_hash = ANY(%s)", (list(payload_hashes),))
+    return cursor.rowcount
+
+# Tam mətn axtarışının parametrləri
+SEARCH_CONFIG = {
+    # Sıralama üçün nəzərə alınan ən çox uyğun mesaj sayı (ən yeniləri); çox yayılmış sözlərdə işi məhdudlaşdırır
+    'max_candidates': int(os.getenv('CHAT_SEARCH_MAX_CANDIDATES', '5000')),
+    'max_terms': 8,
+}
+# ts_headline-ın uyğun sözləri əhatə etdiyi işarələr (mətndə rast gəlinməyən idarəedici simvollar)
+HIGHLIGHT_START, HIGHLIGHT_STOP = '\x02', '\x03'
+HEADLINE_OPTIONS = (f"StartSel={HIGHLIGHT_START}, StopSel={HIGHLIGHT_STOP}, "
+                    "MaxWords=25, MinWords=8, MaxFragments=2, FragmentDelimiter=\" … \"")
+
+
+def build_prefix_tsquery(text: str, max_terms: int = SEARCH_CONFIG['max_terms']) -> Optional[str]:
+    """Axtarış mətnini to_tsquery üçün prefiks sorğusuna çevirir ('hesab fil' -> 'hesab:* & fil:*')."""
+    # str.lower() 'İ'-ni 'i̇'-yə (i + birləşən nöqtə) çevirir və \w+ sözü bölür; Azərbaycan qaydası ilə kiçildirik
+    text = text.replace('İ', 'i').replace('I', 'ı').lower()
+    terms = re.findall(r'\w+', text)[:max_terms]
+    if not terms:
         return None
+    return ' & '.join(f"{term}:*" for term in terms)
+
 
+def split_highlights(snippet: str) -> List[Dict[str, Any]]:
+    """ts_headline nəticəsini [{'text', 'highlight'}] hissələrinə bölür (HTML-siz, təhlükəsiz göstərmək üçün)."""
+    parts = []
+    for i, chunk in enumerate(re.split(f'[{HIGHLIGHT_START}{HIGHLIGHT_STOP}]', snippet or '')):
+        if chunk:
+            parts.append({"text": chunk, "highlight": i % 2 == 1})
+    return parts
 
 
 class ChatDatabaseManager:
@@ -38,254 +100,709 @@ class ChatDatabaseManager:
     def __init__(self):
         pass
     
+    @timed_db_method
     def create_chat(self, title: Optional[str] = None) -> Dict[str, Any]:
         """Yeni chat yaradır."""
         try:
-            conn = get_db_connection()
-            if not conn:
-                return {"error": "Database connection failed"}
-            
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            # Əgər başlıq verilməyibsə, default başlıq təyin edirik
-            if not title:
-                title = f"Yeni Chat - {datetime.now().strftime('%d.%m.%Y %H:%M')}"
-            
-            cursor.execute("""
-                INSERT INTO chats (title) 
-                VALUES (%s) 
-                RETURNING chat_id, title, created_at, updated_at
-            """, (title,))
-            
-            chat = cursor.fetchone()
-            conn.commit()
-            conn.close()
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                
+                # Əgər başlıq verilməyibsə, default başlıq təyin edirik
+                if not title:
+                    title = f"Yeni Chat - {datetime.now().strftime('%d.%m.%Y %H:%M')}"
+                
+                cursor.execute("""
+                    INSERT INTO chats (title) 
+                    VALUES (%s) 
+                    RETURNING chat_id, title, created_at, updated_at, message_count
+                """, (title,))
+                
+                chat = cursor.fetchone()
+                conn.commit()
             
             return dict(chat)
             
         except Exception as e:
-            print(f"Chat yaradılarkən xəta: {e}")
-            if conn:
-                conn.close()
+            logger.exception("Chat yaradılarkən xəta: %s", e)
             return {"error": f"Chat yaradılarkən xəta: {str(e)}"}
     
+    @timed_db_method
     def get_all_chats(self) -> List[Dict[str, Any]]:
         """Bütün chatləri qaytarır (message sayı ilə)."""
         try:
-            conn = get_db_connection()
-            if not conn:
-                return []
-            
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            cursor.execute("""
-                SELECT 
-                    c.chat_id, 
-                    c.title, 
-                    c.created_at, 
-                    c.updated_at,
-                    COUNT(cm.message_id) as message_count
-                FROM chats c
-                LEFT JOIN chat_messages cm ON c.chat_id = cm.chat_id
-                GROUP BY c.chat_id, c.title, c.created_at, c.updated_at
-                ORDER BY c.updated_at DESC
-            """)
-            
-            chats = cursor.fetchall()
-            conn.close()
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                
+                # message_count chats cədvəlində saxlanılır, chat_messages üzərində GROUP BY lazım deyil
+                cursor.execute("""
+                    SELECT chat_id, title, created_at, updated_at, message_count
+                    FROM chats
+                    ORDER BY updated_at DESC, chat_id DESC
+                """)
+                
+                chats = cursor.fetchall()
             
             return [dict(chat) for chat in chats]
             
         except Exception as e:
-            print(f"Chatlər alınarkən xəta: {e}")
+            logger.exception("Chatlər alınarkən xəta: %s", e)
             return []
     
-    def get_chat_detail(self, chat_id: int) -> Optional[Dict[str, Any]]:
-        """Müəyyən chat-in bütün məlumatlarını qaytarır."""
+    @staticmethod
+    def encode_chat_cursor(chat: Dict[str, Any]) -> str:
+        """Səhifənin son chat-indən növbəti səhifə üçün kursor yaradır."""
+        raw = json.dumps({"u": chat['updated_at'].isoformat(), "id": chat['chat_id']})
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def decode_chat_cursor(cursor_token: str):
+        """Kursoru (updated_at, chat_id) cütünə çevirir; yanlış kursor üçün ValueError qaldırır."""
         try:
-            conn = get_db_connection()
-            if not conn:
-                return None
-            
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+            raw = json.loads(base64.urlsafe_b64decode(cursor_token.encode('ascii')))
+            return datetime.fromisoformat(raw['u']), int(raw['id'])
+        except Exception:
+            raise ValueError("Yanlış kursor")
+    
+    @timed_db_method
+    def get_chats_page(self, limit: int = 50, cursor_token: Optional[str] = None) -> Dict[str, Any]:
+        """Chatləri updated_at üzrə keyset (kursor) səhifələməsi ilə qaytarır."""
+        after = self.decode_chat_cursor(cursor_token) if cursor_token else None
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                
+                # (updated_at, chat_id) üzrə müqayisə idx_chats_updated_at indeksindən istifadə edir
+                if after:
+                    cursor.execute("""
+                        SELECT chat_id, title, created_at, updated_at, message_count
+                        FROM chats
+                        WHERE (updated_at, chat_id) < (%s, %s)
+                        ORDER BY updated_at DESC, chat_id DESC
+                        LIMIT %s
+                    """, (after[0], after[1], limit + 1))
+                else:
+                    cursor.execute("""
+                        SELECT chat_id, title, created_at, updated_at, message_count
+                        FROM chats
+                        ORDER BY updated_at DESC, chat_id DESC
+                        LIMIT %s
+                    """, (limit + 1,))
+                
+                rows = [dict(row) for row in cursor.fetchall()]
             
-            # Chat məlumatlarını al
-            cursor.execute("""
-                SELECT chat_id, title, created_at, updated_at 
-                FROM chats 
-                WHERE chat_id = %s
-            """, (chat_id,))
+            has_more = len(rows) > limit
+            chats = rows[:limit]
+            next_cursor = self.encode_chat_cursor(chats[-1]) if has_more else None
+            return {"chats": chats, "next_cursor": next_cursor}
             
-            chat = cursor.fetchone()
-            if not chat:
-                conn.close()
-                return None
+        except Exception as e:
+            logger.exception("Chatlər alınarkən xəta: %s", e)
+            return {"error": f"Chatlər alınarkən xəta: {str(e)}"}
+    
+    @timed_db_method
+    def get_messages_page(self, chat_id: int, limit: int = 50, after_order: Optional[int] = None,
+                          include_visualizations: bool = True) -> Dict[str, Any]:
+        """Chat mesajlarını message_order üzrə keyset səhifələməsi ilə qaytarır."""
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                
+                cursor.execute("""
+                    SELECT 
+                        m.message_id, m.chat_id, m.message_text, 
+                        m.generated_sql, m.message_order, m.created_at,
+                        CASE WHEN %s THEN COALESCE((
+                            SELECT json_agg(json_build_object(
+                                'viz_id', v.viz_id,
+                                'message_id', v.message_id,
+                                'visualization_type', v.visualization_type,
+                                'data_json', v.data_json,
+                                'chart_config', v.chart_config,
+                                'payload_hash', v.payload_hash,
+                                'storage_mode', v.storage_mode,
+                                'row_count', v.row_count,
+                                'created_at', v.created_at
+                            ) ORDER BY v.created_at ASC)
+                            FROM chat_visualizations v
+                            WHERE v.message_id = m.message_id
+                        ), '[]'::json) ELSE '[]'::json END AS visualizations
+                    FROM chat_messages m
+                    WHERE m.chat_id = %s AND m.message_order > %s
+                    ORDER BY m.message_order ASC
+                    LIMIT %s
+                """, (include_visualizations, chat_id, after_order or 0, limit + 1))
+                
+                rows = [dict(row) for row in cursor.fetchall()]
+                self._hydrate_visualizations(cursor, rows)
             
-            # Chat mesajlarını al
-            cursor.execute("""
-                SELECT 
-                    message_id, chat_id, message_text, 
-                    generated_sql, message_order, created_at
-                FROM chat_messages 
-                WHERE chat_id = %s 
-                ORDER BY message_order ASC
-            """, (chat_id,))
+            has_more = len(rows) > limit
+            messages = rows[:limit]
+            next_cursor = str(messages[-1]['message_order']) if has_more else None
+            return {"messages": messages, "next_cursor": next_cursor}
             
-            messages = cursor.fetchall()
+        except Exception as e:
+            logger.exception("Mesajlar alınarkən xəta: %s", e)
+            return {"error": f"Mesajlar alınarkən xəta: {str(e)}"}
+    
+    @timed_db_method
+    def get_chat_detail(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Müəyyən chat-in bütün məlumatlarını (mesajlar və vizualizasiyalarla) bir sorğu ilə qaytarır."""
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                
+                # Mesajları və onların vizualizasiyalarını json_agg ilə eyni sorğuda yığırıq
+                cursor.execute("""
+                    SELECT 
+                        c.chat_id, c.title, c.created_at, c.updated_at,
+                        COALESCE((
+                            SELECT json_agg(json_build_object(
+                                'message_id', m.message_id,
+                                'chat_id', m.chat_id,
+                                'message_text', m.message_text,
+                                'generated_sql', m.generated_sql,
+                                'message_order', m.message_order,
+                                'created_at', m.created_at,
+                                'visualizations', COALESCE((
+                                    SELECT json_agg(json_build_object(
+                                        'viz_id', v.viz_id,
+                                        'message_id', v.message_id,
+                                        'visualization_type', v.visualization_type,
+                                        'data_json', v.data_json,
+                                        'chart_config', v.chart_config,
+                                        'payload_hash', v.payload_hash,
+                                        'storage_mode', v.storage_mode,
+                                        'row_count', v.row_count,
+                                        'created_at', v.created_at
+                                    ) ORDER BY v.created_at ASC)
+                                    FROM chat_visualizations v
+                                    WHERE v.message_id = m.message_id
+                                ), '[]'::json)
+                            ) ORDER BY m.message_order ASC)
+                            FROM chat_messages m
+                            WHERE m.chat_id = c.chat_id
+                        ), '[]'::json) AS messages
+                    FROM chats c
+                    WHERE c.chat_id = %s
+                """, (chat_id,))
+                
+                chat = cursor.fetchone()
+                if chat:
+                    self._hydrate_visualizations(cursor, chat['messages'])
             
-            # Hər mesaj üçün vizualizasiyaları al
-            chat_data = dict(chat)
-            chat_data['messages'] = []
+            return dict(chat) if chat else None
             
-            for message in messages:
-                message_data = dict(message)
+        except Exception as e:
+            logger.exception("Chat detalları alınarkən xəta: %s", e)
+            return None
+    
+    def _hydrate_visualizations(self, cursor, messages: List[Dict[str, Any]]) -> None:
+        """payload_hash ilə istinad edilən məlumatları bir sorğu ilə yükləyib data_json-a açır."""
+        visualizations = [viz for message in messages for viz in message.get('visualizations') or []]
+        hashes = sorted({viz['payload_hash'] for viz in visualizations if viz.get('payload_hash')})
+        payloads = {}
+        if hashes:
+            cursor.execute("""
+                SELECT payload_hash, encoding, payload
+                FROM visualization_payloads
+                WHERE payload_hash = ANY(%s)
+            """, (hashes,))
+            for row in cursor.fetchall():
+                payloads[row['payload_hash']] = decode_payload(row['encoding'], row['payload'])
+        
+        for viz in visualizations:
+            if viz.get('payload_hash'):
+                viz['data_json'] = payloads.get(viz['payload_hash'], [])
+            viz['is_preview'] = viz.get('storage_mode') == STORAGE_LAZY
+    
+    @timed_db_method
+    def search(self, text: str, limit: int = 20, offset: int = 0) -> Dict[str, Any]:
+        """Chat başlıqları, suallar və SQL üzrə tam mətn axtarışı; uyğunluğa görə sıralanmış fraqmentlər.
+
+        Uyğun sətirlər GIN indeksi ilə tapılır; ts_headline yalnız qaytarılan səhifə üçün hesablanır.
+        """
+        tsquery = build_prefix_tsquery(text)
+        if tsquery is None:
+            return {"results": [], "next_cursor": None}
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
                 
                 cursor.execute("""
-                    SELECT viz_id, message_id, visualization_type, 
-                           data_json, chart_config, created_at
-                    FROM chat_visualizations 
-                    WHERE message_id = %s 
-                    ORDER BY created_at ASC
-                """, (message['message_id'],))
+                    WITH q AS (
+                        SELECT to_tsquery('simple', %(tsquery)s) AS query
+                    ),
+                    message_hits AS (
+                        SELECT m.message_id, m.chat_id, m.message_order, m.created_at,
+                               ts_rank_cd(m.search_vector, q.query) AS rank
+                        FROM chat_messages m, q
+                        WHERE m.search_vector @@ q.query
+                        ORDER BY m.message_id DESC
+                        LIMIT %(candidates)s
+                    ),
+                    title_hits AS (
+                        SELECT c.chat_id, ts_rank_cd(c.search_vector, q.query) AS rank
+                        FROM chats c, q
+                        WHERE c.search_vector @@ q.query
+                    ),
+                    hits AS (
+                        -- Başlığı da uyğun gələn chat-in mesajları yuxarı qalxır
+                        SELECT h.message_id, h.chat_id, h.message_order, h.created_at,
+                               h.rank + COALESCE(t.rank, 0) AS rank
+                        FROM message_hits h
+                        LEFT JOIN title_hits t ON t.chat_id = h.chat_id
+                        UNION ALL
+                        SELECT NULL, t.chat_id, NULL, NULL, t.rank
+                        FROM title_hits t
+                        WHERE NOT EXISTS (SELECT 1 FROM message_hits h WHERE h.chat_id = t.chat_id)
+                    ),
+                    page AS (
+                        SELECT * FROM hits
+                        ORDER BY rank DESC, chat_id DESC, message_id DESC NULLS LAST
+                        LIMIT %(limit)s OFFSET %(offset)s
+                    )
+                    SELECT
+                        p.chat_id, c.title AS chat_title, p.message_id, p.message_order,
+                        COALESCE(p.created_at, c.updated_at) AS created_at, p.rank::float8 AS rank,
+                        CASE WHEN p.message_id IS NULL THEN 'title' ELSE 'message' END AS matched_in,
+                        CASE WHEN p.message_id IS NULL
+                             THEN ts_headline('simple', c.title, q.query, %(options)s)
+                             ELSE ts_headline('simple', m.message_text || E'\n' || COALESCE(m.generated_sql, ''),
+                                              q.query, %(options)s)
+                        END AS snippet
+                    FROM page p
+                    CROSS JOIN q
+                    JOIN chats c ON c.chat_id = p.chat_id
+                    LEFT JOIN chat_messages m ON m.message_id = p.message_id
+                    ORDER BY p.rank DESC, p.chat_id DESC, p.message_id DESC NULLS LAST
+                """, {"tsquery": tsquery, "candidates": SEARCH_CONFIG['max_candidates'],
+                      "limit": limit + 1, "offset": offset, "options": HEADLINE_OPTIONS})
                 
-                visualizations = cursor.fetchall()
-                message_data['visualizations'] = [dict(viz) for viz in visualizations]
-                chat_data['messages'].append(message_data)
+                rows = [dict(row) for row in cursor.fetchall()]
+            
+            has_more = len(rows) > limit
+            results = rows[:limit]
+            for row in results:
+                row['snippet_parts'] = split_highlights(row['snippet'])
+                row['snippet'] = ''.join(part['text'] for part in row['snippet_parts'])
+            return {"results": results, "next_cursor": str(offset + limit) if has_more else None}
             
-            conn.close()
-            return chat_data
+        except Exception as e:
+            logger.exception("Chatlərdə axtarış zamanı xəta: %s", e)
+            return {"error": f"Chatlərdə axtarış zamanı xəta: {str(e)}"}
+    
+    @timed_db_method
+    def chat_exists(self, chat_id: int) -> bool:
+        """Chat-in mövcud olub-olmadığını yoxlayır."""
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT EXISTS(SELECT 1 FROM chats WHERE chat_id = %s)", (chat_id,))
+                return cursor.fetchone()[0]
             
         except Exception as e:
-            print(f"Chat detalları alınarkən xəta: {e}")
-            if conn:
-                conn.close()
+            logger.exception("Chat yoxlanılarkən xəta: %s", e)
+            return False
+    
+    @timed_db_method
+    def get_first_message_text(self, chat_id: int) -> Optional[Dict[str, Any]]:
+        """Chat mövcuddursa, onun ilk mesajının mətnini qaytarır ({'chat_id', 'first_message'})."""
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                cursor.execute("""
+                    SELECT 
+                        c.chat_id,
+                        (SELECT m.message_text 
+                         FROM chat_messages m 
+                         WHERE m.chat_id = c.chat_id 
+                         ORDER BY m.message_order ASC 
+                         LIMIT 1) AS first_message
+                    FROM chats c
+                    WHERE c.chat_id = %s
+                """, (chat_id,))
+                row = cursor.fetchone()
+            
+            return dict(row) if row else None
+            
+        except Exception as e:
+            logger.exception("İlk mesaj alınarkən xəta: %s", e)
             return None
     
     def create_message(self, chat_id: int, message_text: str, 
                       generated_sql: Optional[str] = None) -> Optional[Dict[str, Any]]:
         """Chat-ə yeni mesaj əlavə edir."""
-        try:
-            conn = get_db_connection()
-            if not conn:
-                return None
-            
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        message = self.create_message_with_visualization(chat_id, message_text, generated_sql)
+        if not message or "error" in message:
+            return None
+        return message
+    
+    @timed_db_method
+    def reserve_message_id(self, chat_id: int) -> Optional[int]:
+        """Mesaj üçün message_id-ni əvvəlcədən ayırır (yazının özü sonra, fonda edilir); chat yoxdursa None."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
             
-            # Növbəti mesaj sırasını hesabla
             cursor.execute("""
-                SELECT COALESCE(MAX(message_order), 0) + 1 as next_order 
-                FROM chat_messages 
+                SELECT nextval(pg_get_serial_sequence('chat_messages', 'message_id'))
+                FROM chats 
                 WHERE chat_id = %s
             """, (chat_id,))
             
-            next_order = cursor.fetchone()['next_order']
-            
-            # Mesajı yarat
-            cursor.execute("""
-                INSERT INTO chat_messages (chat_id, message_text, generated_sql, message_order)
-                VALUES (%s, %s, %s, %s)
-                RETURNING message_id, chat_id, message_text, generated_sql, message_order, created_at
-            """, (chat_id, message_text, generated_sql, next_order))
+            row = cursor.fetchone()
+            conn.commit()
+        
+        return row[0] if row else None
+    
+    @timed_db_method
+    def create_message_with_visualization(self, chat_id: int, message_text: str,
+                                          generated_sql: Optional[str] = None,
+                                          visualization: Optional[Dict[str, Any]] = None,
+                                          message_id: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Mesajı (və varsa vizualizasiyasını) bir tranzaksiyada, bir sorğu ilə yazır.
+        
+        message_id verilərsə (reserve_message_id ilə ayrılıb), mesaj həmin id ilə yaradılır.
+        Chat tapılmadıqda None, xəta olduqda {"error": ...} qaytarır.
+        """
+        has_viz = visualization is not None
+        viz = visualization or {}
+        try:
+            encoded = (encode_visualization_data(viz['data_json'], viz.get('storage_mode'), generated_sql)
+                       if has_viz else None)
             
-            message = cursor.fetchone()
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                
+                # Sıra nömrəsi chats sətrindəki sayğacdan UPDATE ... RETURNING ilə ayrılır:
+                # sətir kilidi eyni chat-ə paralel yazanları ardıcıllaşdırır (MAX+1 yarışı yoxdur).
+                # Eyni məlumat artıq saxlanıbsa, payload yenidən yazılmır (ON CONFLICT DO NOTHING).
+                cursor.execute("""
+                    WITH slot AS (
+                        UPDATE chats
+                        SET last_message_order = last_message_order + 1,
+                            message_count = message_count + 1,
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE chat_id = %(chat_id)s
+                        RETURNING chat_id, last_message_order
+                    ), msg AS (
+                        INSERT INTO chat_messages (message_id, chat_id, message_text, generated_sql, message_order)
+                        SELECT COALESCE(%(message_id)s::integer,
+                                        nextval(pg_get_serial_sequence('chat_messages', 'message_id'))),
+                               chat_id, %(message_text)s, %(generated_sql)s, last_message_order
+                        FROM slot
+                        RETURNING message_id, chat_id, message_text, generated_sql, message_order, created_at
+                    ), payload AS (
+                        INSERT INTO visualization_payloads
+                        (payload_hash, encoding, payload, raw_size, stored_size, row_count)
+                        SELECT %(payload_hash)s, %(encoding)s, %(blob)s, %(raw_size)s, %(stored_size)s, %(row_count)s
+                        FROM msg
+                        WHERE %(payload_hash)s IS NOT NULL
+                        ON CONFLICT (payload_hash) DO NOTHING
+                    ), viz AS (
+                        INSERT INTO chat_visualizations
+                        (message_id, visualization_type, data_json, chart_config,
+                         payload_hash, storage_mode, source_sql, row_count)
+                        SELECT message_id, %(viz_type)s, %(preview_json)s::jsonb, %(chart_config)s::jsonb,
+                               %(payload_hash)s, %(storage_mode)s, %(generated_sql)s, %(row_count)s
+                        FROM msg
+                        WHERE %(has_viz)s
+                        RETURNING viz_id, message_id, visualization_type, chart_config,
+                                  payload_hash, storage_mode, row_count, created_at
+                    )
+                    SELECT
+                        msg.*,
+                        COALESCE((
+                            SELECT json_agg(json_build_object(
+                                'viz_id', viz.viz_id,
+                                'message_id', viz.message_id,
+                                'visualization_type', viz.visualization_type,
+                                'chart_config', viz.chart_config,
+                                'payload_hash', viz.payload_hash,
+                                'storage_mode', viz.storage_mode,
+                                'row_count', viz.row_count,
+                                'created_at', viz.created_at
+                            ))
+                            FROM viz
+                        ), '[]'::json) AS visualizations
+                    FROM msg
+                """, {
+                    'chat_id': chat_id,
+                    'message_id': message_id,
+                    'message_text': message_text,
+                    'generated_sql': generated_sql,
+                    'has_viz': has_viz,
+                    'viz_type': viz.get('visualization_type'),
+                    'chart_config': json.dumps(viz['chart_config']) if viz.get('chart_config') else None,
+                    **self._payload_params(encoded),
+                })
+                
+                message = cursor.fetchone()
+                conn.commit()
             
-            # Chat-in updated_at-ını yenilə
-            cursor.execute("""
-                UPDATE chats SET updated_at = CURRENT_TIMESTAMP WHERE chat_id = %s
-            """, (chat_id,))
+            if not message:
+                return None
             
-            conn.commit()
-            conn.close()
+            message = dict(message)
+            # Məlumatı bazadan geri oxumuruq — yazdığımız dəyəri cavaba qoyuruq
+            for created in message['visualizations']:
+                self._attach_written_data(created, viz['data_json'], encoded)
+            return message
+        
+        except Exception as e:
+            logger.exception("Mesaj yaradılarkən xəta: %s", e)
+            return {"error": f"Mesaj yaradılarkən xəta: {str(e)}"}
+    
+    @staticmethod
+    def _payload_params(encoded) -> Dict[str, Any]:
+        """Kodlanmış vizualizasiya məlumatını SQL parametrlərinə çevirir."""
+        if encoded is None:
+            return {'payload_hash': None, 'encoding': None, 'blob': None, 'raw_size': None,
+                    'stored_size': None, 'row_count': None, 'storage_mode': None, 'preview_json': None}
+        return {
+            'payload_hash': encoded.payload_hash,
+            'encoding': encoded.encoding,
+            'blob': psycopg2.Binary(encoded.blob) if encoded.blob is not None else None,
+            'raw_size': encoded.raw_size,
+            'stored_size': len(encoded.blob) if encoded.blob is not None else None,
+            'row_count': encoded.row_count,
+            'storage_mode': encoded.storage_mode,
+            'preview_json': encoded.preview_json,
+        }
+    
+    @staticmethod
+    def _attach_written_data(visualization: Dict[str, Any], data_json: Any, encoded) -> None:
+        """Yeni yazılmış vizualizasiyanın cavabına məlumatı (lazy rejimdə önizləməni) əlavə edir."""
+        if encoded.storage_mode == STORAGE_LAZY:
+            visualization['data_json'] = json.loads(encoded.preview_json)
+            visualization['is_preview'] = True
+        else:
+            visualization['data_json'] = data_json
+            visualization['is_preview'] = False
+    
+    @timed_db_method
+    def bulk_create_messages(self, chat_id: int, messages: List[Dict[str, Any]],
+                             page_size: int = 500) -> Optional[Dict[str, Any]]:
+        """Çoxlu mesaj və vizualizasiyanı bir tranzaksiyada execute_values ilə idxal edir.
+        
+        Chat tapılmadıqda None, xəta olduqda {"error": ...} qaytarır.
+        """
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                
+                # Bütün mesajlar üçün sıra nömrələrini bir dəfəyə ayırırıq
+                cursor.execute("""
+                    UPDATE chats 
+                    SET last_message_order = last_message_order + %s,
+                        message_count = message_count + %s,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE chat_id = %s
+                    RETURNING last_message_order
+                """, (len(messages), len(messages), chat_id))
+                
+                row = cursor.fetchone()
+                if row is None:
+                    conn.rollback()
+                    return None
+                
+                first_order = row[0] - len(messages) + 1
+                message_rows = [
+                    (chat_id, m['message_text'], m.get('generated_sql'), first_order + i)
+                    for i, m in enumerate(messages)
+                ]
+                inserted = psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO chat_messages (chat_id, message_text, generated_sql, message_order)
+                    VALUES %s
+                    RETURNING message_order, message_id
+                """, message_rows, page_size=page_size, fetch=True)
+                
+                # RETURNING sırasına güvənmirik: message_order -> message_id xəritəsi
+                ids_by_order = dict(inserted)
+                viz_rows = []
+                payload_rows = {}  # hash -> sətir (partiya daxilindəki təkrarlar da bir dəfə yazılır)
+                for i, m in enumerate(messages):
+                    viz = m.get('visualization')
+                    if not viz:
+                        continue
+                    encoded = encode_visualization_data(viz['data_json'], viz.get('storage_mode'),
+                                                        m.get('generated_sql'))
+                    params = self._payload_params(encoded)
+                    if encoded.payload_hash:
+                        payload_rows[encoded.payload_hash] = (
+                            params['payload_hash'], params['encoding'], params['blob'],
+                            params['raw_size'], params['stored_size'], params['row_count'],
+                        )
+                    viz_rows.append((
+                        ids_by_order[first_order + i],
+                        viz['visualization_type'],
+                        params['preview_json'],
+                        json.dumps(viz['chart_config']) if viz.get('chart_config') else None,
+                        params['payload_hash'],
+                        params['storage_mode'],
+                        m.get('generated_sql'),
+                        params['row_count'],
+                    ))
+                if payload_rows:
+                    psycopg2.extras.execute_values(cursor, """
+                        INSERT INTO visualization_payloads
+                        (payload_hash, encoding, payload, raw_size, stored_size, row_count)
+                        VALUES %s
+                        ON CONFLICT (payload_hash) DO NOTHING
+                    """, list(payload_rows.values()), page_size=page_size)
+                if viz_rows:
+                    psycopg2.extras.execute_values(cursor, """
+                        INSERT INTO chat_visualizations
+                        (message_id, visualization_type, data_json, chart_config,
+                         payload_hash, storage_mode, source_sql, row_count)
+                        VALUES %s
+                    """, viz_rows, template="(%s, %s, %s::jsonb, %s::jsonb, %s, %s, %s, %s)",
+                        page_size=page_size)
+                
+                conn.commit()
             
-            message_data = dict(message)
-            message_data['visualizations'] = []
-            return message_data
+            return {
+                "chat_id": chat_id,
+                "inserted_messages": len(message_rows),
+                "inserted_visualizations": len(viz_rows),
+                "first_message_order": first_order if message_rows else None,
+                "last_message_order": row[0] if message_rows else None,
+            }
             
         except Exception as e:
-            print(f"Mesaj yaradılarkən xəta: {e}")
-            if conn:
-                conn.close()
-            return None
+            logger.exception("Mesajlar idxal edilərkən xəta: %s", e)
+            return {"error": f"Mesajlar idxal edilərkən xəta: {str(e)}"}
     
+    @timed_db_method
     def create_visualization(self, message_id: int, visualization_type: str,
-                           data_json: Dict[str, Any], 
-                           chart_config: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
-        """Mesaja vizualizasiya əlavə edir."""
+                           data_json: Dict[str, Any],
+                           chart_config: Optional[Dict[str, Any]] = None,
+                           storage_mode: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Mesaja vizualizasiya əlavə edir (məlumat hash üzrə bir dəfə, sıxılmış saxlanılır)."""
         try:
-            conn = get_db_connection()
-            if not conn:
-                return None
-            
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
-            
-            cursor.execute("""
-                INSERT INTO chat_visualizations 
-                (message_id, visualization_type, data_json, chart_config)
-                VALUES (%s, %s, %s, %s)
-                RETURNING viz_id, message_id, visualization_type, data_json, chart_config, created_at
-            """, (message_id, visualization_type, json.dumps(data_json), 
-                  json.dumps(chart_config) if chart_config else None))
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                
+                # Lazy rejimdə yenidən icra olunacaq SQL mesajın özündən götürülür
+                cursor.execute("SELECT generated_sql FROM chat_messages WHERE message_id = %s", (message_id,))
+                row = cursor.fetchone()
+                source_sql = row['generated_sql'] if row else None
+                encoded = encode_visualization_data(data_json, storage_mode, source_sql)
+                
+                cursor.execute("""
+                    WITH payload AS (
+                        INSERT INTO visualization_payloads
+                        (payload_hash, encoding, payload, raw_size, stored_size, row_count)
+                        SELECT %(payload_hash)s, %(encoding)s, %(blob)s, %(raw_size)s, %(stored_size)s, %(row_count)s
+                        WHERE %(payload_hash)s IS NOT NULL
+                        ON CONFLICT (payload_hash) DO NOTHING
+                    )
+                    INSERT INTO chat_visualizations
+                    (message_id, visualization_type, data_json, chart_config,
+                     payload_hash, storage_mode, source_sql, row_count)
+                    VALUES (%(message_id)s, %(viz_type)s, %(preview_json)s::jsonb, %(chart_config)s::jsonb,
+                            %(payload_hash)s, %(storage_mode)s, %(source_sql)s, %(row_count)s)
+                    RETURNING viz_id, message_id, visualization_type, chart_config,
+                              payload_hash, storage_mode, row_count, created_at
+                """, {
+                    **self._payload_params(encoded),
+                    'message_id': message_id,
+                    'viz_type': visualization_type,
+                    'chart_config': json.dumps(chart_config) if chart_config else None,
+                    'source_sql': source_sql,
+                })
+                
+                visualization = dict(cursor.fetchone())
+                conn.commit()
             
-            visualization = cursor.fetchone()
-            conn.commit()
-            conn.close()
+            self._attach_written_data(visualization, data_json, encoded)
+            return visualization
+        
+        except Exception as e:
+            logger.exception("Vizualizasiya yaradılarkən xəta: %s", e)
+            return None
+    
+    @timed_db_method
+    def get_visualization_source(self, viz_id: int) -> Optional[Dict[str, Any]]:
+        """Vizualizasiyanın saxlanmış məlumatını və yenidən icra üçün SQL-i qaytarır."""
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+                
+                cursor.execute("""
+                    SELECT v.viz_id, v.storage_mode, v.source_sql, v.row_count, v.data_json,
+                           p.encoding, p.payload
+                    FROM chat_visualizations v
+                    LEFT JOIN visualization_payloads p ON p.payload_hash = v.payload_hash
+                    WHERE v.viz_id = %s
+                """, (viz_id,))
+                
+                row = cursor.fetchone()
             
-            return dict(visualization)
+            if not row:
+                return None
             
+            source = dict(row)
+            encoding, blob = source.pop('encoding'), source.pop('payload')
+            if blob is not None:
+                source['data_json'] = decode_payload(encoding, blob)
+            return source
+        
         except Exception as e:
-            print(f"Vizualizasiya yaradılarkən xəta: {e}")
-            if conn:
-                conn.close()
-            return None
+            logger.exception("Vizualizasiya mənbəyi alınarkən xəta: %s", e)
+            return {"error": f"Vizualizasiya mənbəyi alınarkən xəta: {str(e)}"}
     
+    @timed_db_method
     def update_chat_title(self, chat_id: int, title: str) -> bool:
         """Chat başlığını yeniləyir."""
         try:
-            conn = get_db_connection()
-            if not conn:
-                return False
-            
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                UPDATE chats 
-                SET title = %s, updated_at = CURRENT_TIMESTAMP 
-                WHERE chat_id = %s
-            """, (title, chat_id))
-            
-            success = cursor.rowcount > 0
-            conn.commit()
-            conn.close()
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    UPDATE chats 
+                    SET title = %s, updated_at = CURRENT_TIMESTAMP 
+                    WHERE chat_id = %s
+                """, (title, chat_id))
+                
+                success = cursor.rowcount > 0
+                conn.commit()
             
             return success
             
         except Exception as e:
-            print(f"Chat başlığı yenilənərkən xəta: {e}")
-            if conn:
-                conn.close()
+            logger.exception("Chat başlığı yenilənərkən xəta: %s", e)
             return False
     
+    @timed_db_method
     def delete_chat(self, chat_id: int) -> bool:
-        """Chat-i silir (CASCADE ilə bütün mesaj və vizualizasiyalar da silinir)."""
+        """Chat-i silir (CASCADE ilə bütün mesaj və vizualizasiyalar da silinir).
+
+        Payload-lara CASCADE çatmır: chat-in istinad etdiyi və başqa heç bir vizualizasiyanın
+        istifadə etmədiyi payload-lar eyni tranzaksiyada silinir.
+        """
         try:
-            conn = get_db_connection()
-            if not conn:
-                return False
-            
-            cursor = conn.cursor()
-            
-            cursor.execute("DELETE FROM chats WHERE chat_id = %s", (chat_id,))
-            
-            success = cursor.rowcount > 0
-            conn.commit()
-            conn.close()
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute("""
+                    SELECT DISTINCT v.payload_hash
+                    FROM chat_visualizations v
+                    JOIN chat_messages m ON m.message_id = v.message_id
+                    WHERE m.chat_id = %s AND v.payload_hash IS NOT NULL
+                """, (chat_id,))
+                payload_hashes = [row[0] for row in cursor.fetchall()]
+
+                cursor.execute("DELETE FROM chats WHERE chat_id = %s", (chat_id,))
+                
+                success = cursor.rowcount > 0
+                if success and payload_hashes:
+                    delete_orphan_payloads(cursor, payload_hashes)
+                conn.commit()
             
             return success
             
         except Exception as e:
-            print(f"Chat silinərkən xəta: {e}")
-            if conn:
-                conn.close()
+            logger.exception("Chat silinərkən xəta: %s", e)
             return False
     
     def generate_title_from_message(self, message_text: str) -> str:
@@ -302,4 +819,26 @@ class ChatDatabaseManager:
         return title
 
 # Singleton instance
-chat_db = ChatDatabaseManager()
\ No newline at end of file
+_chat_db: Optional[ChatDatabaseManager] = None
+_chat_db_lock = threading.Lock()
+
+
+def get_chat_db() -> ChatDatabaseManager:
+    """Paylaşılan ChatDatabaseManager-i qaytarır (FastAPI dependency).
+
+    Obyekt və əlaqə hovuzu ilk müraciətdə yaradılır, import zamanı bazaya qoşulma baş vermir.
+    """
+    global _chat_db
+    if _chat_db is None:
+        with _chat_db_lock:
+            if _chat_db is None:
+                init_db_pool()
+                _chat_db = ChatDatabaseManager()
+    return _chat_db
+
+
+def __getattr__(name):
+    # Köhnə 'from app.db.chat_database import chat_db' idxalları üçün
+    if name == 'chat_db':
+        return get_chat_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,8 +1,16 @@
-import psycopg2
-import pandas as pd
+import logging
 import os
-from sqlalchemy import create_engine
-from urllib.parse import quote_plus
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from app.db.pool import get_pool, init_pool
+from app.db.sql_utils import canonicalize_sql, extract_tables
+from app.services.metrics import query_rows
+from app.services.query_registry import cancellable_connection, remaining_ms
+
+logger = logging.getLogger(__name__)
 
 # PostgreSQL connection parameters
 DB_CONFIG = {
@@ -13,165 +21,304 @@ DB_CONFIG = {
     'password': '**'
 }
 
+# Əlaqə hovuzunun parametrləri
+POOL_NAME = 'retail_banking'
+POOL_CONFIG = {
+    'minconn': int(os.getenv('RETAIL_DB_POOL_MIN', '1')),
+    'maxconn': int(os.getenv('RETAIL_DB_POOL_MAX', '10')),
+    'acquire_timeout': float(os.getenv('RETAIL_DB_POOL_TIMEOUT', '5')),
+    'health_check_interval': float(os.getenv('RETAIL_DB_POOL_HEALTH_INTERVAL', '30')),
+}
 
-def get_db_connection():
-    """PostgreSQL verilənlər bazasına əlaqə yaradır."""
-    try:
-        conn = psycopg2.connect(
-            host=DB_CONFIG['host'],
-            port=DB_CONFIG['port'],
-            database=DB_CONFIG['database'],
-            user=DB_CONFIG['user'],
-            password=DB_CONFIG['password']
-        )
-        return conn
-    except Exception as e:
-        print(f"Database connection error: {e}")
-        return None
 
-def get_sqlalchemy_engine():
-    """SQLAlchemy engine yaradır (pandas üçün)."""
-    try:
-        # Password-də xüsusi simvollar varsa, onları encode edirik
-        password = quote_plus(DB_CONFIG['password'])
-        
-        connection_string = f"postgresql://{DB_CONFIG['user']}:{password}@{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}"
-        engine = create_engine(connection_string)
-        return engine
-    except Exception as e:
-        print(f"SQLAlchemy engine creation error: {e}")
-        return None
+# Modelin yaratdığı sorğular üçün icra müddəti həddi (millisaniyə)
+STATEMENT_TIMEOUT_MS = int(os.getenv('QUERY_STATEMENT_TIMEOUT_MS', '30000'))
+
+
+def init_db_pool():
+    """'retail banking' bazası üçün əlaqə hovuzunu yaradır."""
+    return init_pool(POOL_NAME, DB_CONFIG, **POOL_CONFIG)
+
+
+@contextmanager
+def get_db_connection():
+    """Hovuzdan PostgreSQL əlaqəsi götürür və iş bitdikdə onu geri qaytarır."""
+    with get_pool(POOL_NAME).connection() as conn:
+        yield conn
 
 def get_db_schema():
-    """PostgreSQL verilənlər bazasının sxemini qaytarır."""
-    schema = ""
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return None
-            
-        cursor = conn.cursor()
-        
-        # PostgreSQL-də cədvəllərin siyahısını alırıq
-        cursor.execute("""
-            SELECT table_name 
-            FROM information_schema.tables 
-            WHERE table_schema = 'public' 
-            AND table_type = 'BASE TABLE';
-        """)
-        tables = cursor.fetchall()
-        
-        if not tables:
-            print("No tables found in database")
-            conn.close()
-            return None
-        
-        # Hər cədvəlin strukturunu alırıq
-        for table_name in tables:
-            cursor.execute(f"""
-                SELECT column_name, data_type, is_nullable, column_default
-                FROM information_schema.columns
-                WHERE table_name = '{table_name[0]}'
-                ORDER BY ordinal_position;
-            """)
-            columns = cursor.fetchall()
-            
-            schema += f"\nTable: {table_name[0]}\n"
-            schema += "-" * 50 + "\n"
-            for col in columns:
-                schema += f"  {col[0]} | {col[1]} | Nullable: {col[2]} | Default: {col[3]}\n"
-            schema += "\n"
-                
-        conn.close()
-        print(f"Schema retrieved successfully: {len(tables)} tables found")
-        return schema
-        
-    except Exception as e:
-        print(f"Sxem alınarkən xəta baş verdi: {e}")
+    """PostgreSQL verilənlər bazasının sxemini (keşlənmiş kataloqdan) qaytarır."""
+    from app.db.schema_catalog import schema_catalog
+
+    snapshot = schema_catalog.get_snapshot()
+    if not snapshot or not snapshot.tables:
         return None
+    return snapshot.prompt_text
 
-def execute_sql_query(sql_query):
-    """SQL sorğusunu icra edir və nəticəni JSON formatında qaytarır."""
+def apply_limit_offset(sql_query, limit=None, offset=None):
+    """Sorğunu xarici SELECT-ə bükərək LIMIT/OFFSET əlavə edir."""
+    if limit is None and not offset:
+        return sql_query
+    inner = sql_query.strip().rstrip(';')
+    wrapped = f"SELECT * FROM (\n{inner}\n) AS paged_query"
+    if limit is not None:
+        wrapped += f" LIMIT {int(limit)}"
+    if offset:
+        wrapped += f" OFFSET {int(offset)}"
+    return wrapped
+
+def _begin_read_only(execute, statement_timeout_ms=None):
+    """Cari tranzaksiyanı yalnız oxuma rejiminə keçirir və statement_timeout təyin edir.
+
+    Müddət verilməyibsə, sorğunun qalan vaxtından (və STATEMENT_TIMEOUT_MS-dən) çox olmur.
+    """
+    timeout = remaining_ms(STATEMENT_TIMEOUT_MS) if statement_timeout_ms is None else statement_timeout_ms
+    execute("SET TRANSACTION READ ONLY")
+    execute(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+def execute_sql_query_df(sql_query, limit=None, offset=None, statement_timeout_ms=None):
+    """SQL sorğusunu yalnız oxuma tranzaksiyasında icra edir və nəticəni pandas DataFrame kimi qaytarır.
+
+    Əlaqə ümumi hovuzdan götürülür (ayrıca SQLAlchemy hovuzu yoxdur) — bazaya açılan əlaqələrin sayı
+    və gözləmə metrikaları bütün sorğular üçün hovuzun həddi ilə məhdudlaşır.
+    """
     try:
-        print(f"Executing SQL: {sql_query}")
-        
-        # SQLAlchemy engine ilə pandas istifadə edirik
-        engine = get_sqlalchemy_engine()
-        if not engine:
-            return {"error": "Database engine creation failed"}
-        
-        df = pd.read_sql_query(sql_query, engine)
-        
-        # Pandas DataFrame-i JSON-a çeviririk
-        result = df.to_dict(orient='records')
-        print(f"Query executed successfully, returned {len(result)} rows")
-        return result
+        import pandas as pd
+        sql_query = apply_limit_offset(sql_query, limit, offset)
+        logger.debug("SQL icra olunur", extra={"sql": sql_query})
+        started = time.perf_counter()
+
+        # Ləğv zamanı icra olunan əmri dayandırmaq üçün əlaqəni sorğuya bağlayırıq
+        with get_db_connection() as conn, cancellable_connection(conn):
+            cursor = conn.cursor()
+            _begin_read_only(cursor.execute, statement_timeout_ms)
+            cursor.execute(sql_query)
+            columns = [desc[0] for desc in cursor.description]
+            # pandas.read_sql_query ilə eyni çevirmə (Decimal -> float)
+            df = pd.DataFrame.from_records(cursor.fetchall(), columns=columns, coerce_float=True)
+            conn.rollback()
+        query_rows.observe(len(df))
+        logger.info("SQL icra olundu", extra={"rows": len(df),
+                                              "duration_ms": round((time.perf_counter() - started) * 1000, 1)})
+        return df
         
     except Exception as e:
         error_msg = f"SQL icrası zamanı xəta: {str(e)}"
-        print(error_msg)
+        logger.warning(error_msg, extra={"sql": sql_query})
         return {"error": error_msg}
 
+def rewrite_for_preaggregations(sql_query):
+    """Sorğu rollup-dan cavablandırıla bilərsə (yeni SQL, rollup məlumatı), yoxsa None qaytarır."""
+    from app.db.preaggregations import preaggregations  # başlanğıcı yavaşlatmamaq üçün ilk sorğuda yüklənir
+    return preaggregations.rewrite(sql_query)
+
+def execute_sql_query(sql_query, limit=None, offset=None):
+    """SQL sorğusunu icra edir və nəticəni JSON formatında qaytarır."""
+    rewrite = rewrite_for_preaggregations(sql_query)
+    df = execute_sql_query_df(rewrite[0] if rewrite else sql_query, limit, offset)
+    if isinstance(df, dict):
+        return df
+    
+    # Pandas DataFrame-i JSON-a çeviririk
+    return df.to_dict(orient='records')
+
+class ResultCache:
+    """Kanonik SQL üzrə sorğu nəticələrinin keşi: ümumi bayt həcmi ilə məhdud LRU, TTL və cədvəl üzrə invalidasiya."""
+
+    def __init__(self, max_bytes, ttl, max_entry_fraction=0.25):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.max_entry_bytes = int(max_bytes * max_entry_fraction)
+        self._entries = OrderedDict()  # açar -> (DataFrame, ölçü, yaradılma vaxtı, cədvəllər)
+        self._by_table = {}  # cədvəl -> açarlar
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _remove(self, key):
+        df, size, created_at, tables = self._entries.pop(key)
+        self._bytes -= size
+        for table in tables:
+            keys = self._by_table.get(table)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_table[table]
+
+    def get(self, key):
+        """Keşdə varsa (DataFrame, yaşı saniyə ilə) qaytarır."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            age = time.time() - entry[2]
+            if age >= self.ttl:
+                self._remove(key)
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0], age
+
+    def put(self, key, df, tables):
+        """Nəticəni keşə yazır; çox böyük nəticələr keşlənmir."""
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if size > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (df, size, time.time(), tables)
+            self._bytes += size
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def invalidate_tables(self, tables):
+        """Verilmiş cədvəlləri oxuyan bütün qeydləri silir."""
+        removed = 0
+        with self._lock:
+            for table in tables:
+                for key in list(self._by_table.get(table.lower(), ())):
+                    if key in self._entries:
+                        self._remove(key)
+                        removed += 1
+            self._invalidations += removed
+        return removed
+
+    def clear(self):
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+            self._invalidations += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "hit_ratio": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+result_cache = ResultCache(
+    max_bytes=int(os.getenv('RESULT_CACHE_MAX_BYTES', str(256 * 1024 * 1024))),
+    ttl=float(os.getenv('RESULT_CACHE_TTL', '300')),
+)
+
+def execute_sql_query_cached(sql_query, limit=None, offset=None):
+    """Nəticəni əvvəlcə keşdə axtarır; (DataFrame və ya xəta dict-i, keş məlumatı) qaytarır.
+
+    Keşdən qaytarılan DataFrame paylaşılır, ona görə onu dəyişdirmək olmaz. Sorğu rollup-dan
+    cavablandırıla bilərsə, yenidən yazılmış SQL icra olunur (keş açarı və cədvəllər orijinal sorğuya görədir).
+    """
+    paged_sql = apply_limit_offset(sql_query, limit, offset)
+    key = canonicalize_sql(paged_sql)
+    cached = result_cache.get(key)
+    if cached is not None:
+        df, age = cached
+        return df, {"hit": True, "age_seconds": round(age, 3)}
+
+    rewrite = rewrite_for_preaggregations(sql_query)
+    df = execute_sql_query_df(rewrite[0] if rewrite else sql_query, limit, offset)
+    if not isinstance(df, dict):
+        result_cache.put(key, df, frozenset(t.lower() for t in extract_tables(paged_sql)))
+    info = {"hit": False, "age_seconds": 0.0}
+    if rewrite:
+        info["preaggregation"] = rewrite[1]
+    return df, info
+
+def stream_sql_query(sql_query, batch_size=1000, limit=None, offset=None):
+    """Server-side (adlı) cursor ilə nəticəni partiyalarla qaytaran generator.
+
+    İlk olaraq sütun adlarının siyahısını, sonra isə hər partiya üçün sətir tuple-larının
+    siyahısını verir. Yaddaş istifadəsi nəticənin ölçüsündən asılı olmayaraq bir partiya ilə məhdudlaşır.
+    """
+    rewrite = rewrite_for_preaggregations(sql_query)
+    sql_query = apply_limit_offset(rewrite[0] if rewrite else sql_query, limit, offset)
+    logger.debug("SQL stream rejimində icra olunur", extra={"sql": sql_query})
+
+    with get_db_connection() as conn, cancellable_connection(conn):
+        _begin_read_only(conn.cursor().execute)
+        cursor = conn.cursor(name=f"stream_{uuid.uuid4().hex}")
+        cursor.itersize = batch_size
+        cursor.execute(sql_query)
+        batch = cursor.fetchmany(batch_size)
+        yield [desc[0] for desc in cursor.description]
+        while batch:
+            yield batch
+            batch = cursor.fetchmany(batch_size)
+        # Cursor tranzaksiya ilə birlikdə bağlanır (hovuz əlaqəni qaytararkən rollback edir)
+
 def execute_sql_query_with_psycopg2(sql_query):
     """Alternativ: Yalnız psycopg2 istifadə edərək SQL sorğusu icra edir."""
     try:
-        print(f"Executing SQL with psycopg2: {sql_query}")
+        logger.debug("SQL psycopg2 ilə icra olunur", extra={"sql": sql_query})
         
-        conn = get_db_connection()
-        if not conn:
-            return {"error": "Database connection failed"}
-        
-        cursor = conn.cursor()
-        cursor.execute(sql_query)
-        
-        # Sütun adlarını alırıq
-        column_names = [desc[0] for desc in cursor.description]
-        
-        # Məlumatları alırıq
-        rows = cursor.fetchall()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql_query)
+            
+            # Sütun adlarını alırıq
+            column_names = [desc[0] for desc in cursor.description]
+            
+            # Məlumatları alırıq
+            rows = cursor.fetchall()
         
         # Dictionary formatına çeviririk
         result = []
         for row in rows:
             result.append(dict(zip(column_names, row)))
         
-        conn.close()
-        print(f"Query executed successfully, returned {len(result)} rows")
+        query_rows.observe(len(result))
+        logger.info("SQL icra olundu", extra={"rows": len(result)})
         return result
         
     except Exception as e:
         error_msg = f"SQL icrası zamanı xəta: {str(e)}"
-        print(error_msg)
+        logger.warning(error_msg)
         return {"error": error_msg}
 
 # Test funksiyası
 def test_connection():
     """Verilənlər bazasına əlaqəni test edir."""
     try:
-        conn = get_db_connection()
-        if conn:
-            print("PostgreSQL connection successful!")
+        with get_db_connection() as conn:
+            logger.info("PostgreSQL əlaqəsi uğurludur")
             cursor = conn.cursor()
             cursor.execute("SELECT version();")
             version = cursor.fetchone()
-            print(f"PostgreSQL version: {version[0]}")
-            conn.close()
+            logger.info("PostgreSQL versiyası: %s", version[0])
             return True
-        else:
-            print("PostgreSQL connection failed!")
-            return False
     except Exception as e:
-        print(f"Connection test error: {e}")
+        logger.error("Əlaqə testi uğursuz oldu: %s", e)
         return False
 
 # Usage example
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    init_db_pool()
     # Test connection
     if test_connection():
         # Get database schema
         schema = get_db_schema()
         if schema:
-            print("Database Schema:")
-            print(schema)
+            logger.info("Verilənlər bazası sxemi:\n%s", schema)
         
         
\ No newline at end of file
@@ -0,0 +1,327 @@
+"""Sorğu jurnalına (query_log) əsaslanan indeks tövsiyələri.
+
+Ən çox ümumi vaxt aparan fingerprint-lər seçilir, onların son SQL nümunəsi "retail banking" bazasında
+EXPLAIN ilə yoxlanılır; filtrli ardıcıl oxunmalar (Seq Scan) və diskə düşən / baha sıralamalar üçün
+namizəd indekslər təklif olunur və təxmini qazanc (ms) hesablanır. Heç bir indeks yaradılmır —
+nəticə DBA üçün CREATE INDEX əmrləri siyahısıdır.
+
+    python -m app.db.index_advisor --days 7 --top 20
+    python -m app.db.index_advisor --analyze          # EXPLAIN ANALYZE (sorğular icra olunur)
+    python -m app.db.index_advisor --hypopg --json    # hypopg varsa, qazanc hipotetik indekslə ölçülür
+"""
+import argparse
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import psycopg2.extras
+
+from app.db import chat_database, database
+from app.db.query_guard import walk_plan
+from app.db.query_log import STATUS_OK
+
+logger = logging.getLogger(__name__)
+
+# Filtrdəki "sütun operator" ifadəsi (cast və alias prefiksi ola bilər)
+PREDICATE_RE = re.compile(
+    r'(?:\b\w+\.)?"?\b(?P<column>[A-Za-z_]\w*)"?\)*(?:::[\w ]+?\)*)?\s*(?P<op>= ANY|>=|<=|<>|=|>|<)'
+)
+EQUALITY_OPS = {'=', '= ANY'}
+RANGE_OPS = {'>', '<', '>=', '<='}
+BOOLEAN_OPERATORS = {'AND', 'OR'}
+SORT_KEY_RE = re.compile(r'^(?:\w+\.)?"?(?P<column>[A-Za-z_]\w*)"?(?P<desc> DESC)?(?: NULLS (?:FIRST|LAST))?$')
+SORT_NODE_TYPES = {'Sort', 'Incremental Sort'}
+# Sıralama ilə cədvəl oxunması arasında ola bilən, sətir sırasını dəyişməyən düyünlər
+PASS_THROUGH_NODES = {'Seq Scan', 'Result', 'Subquery Scan', 'Gather', 'Materialize'}
+MAX_INDEX_COLUMNS = 3
+
+
+@dataclass
+class IndexCandidate:
+    table: str
+    columns: Tuple[str, ...]
+    reasons: Set[str] = field(default_factory=set)
+    fingerprints: Set[str] = field(default_factory=set)
+    estimated_benefit_ms: float = 0.0
+    measured: bool = False  # qazanc hypopg ilə ölçülübsə True
+
+    @property
+    def ddl(self) -> str:
+        name = f"idx_{self.table}_{'_'.join(column.split()[0] for column in self.columns)}"[:63]
+        return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {self.table} ({', '.join(self.columns)});"
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload = asdict(self)
+        payload.update({"columns": list(self.columns), "reasons": sorted(self.reasons),
+                        "fingerprints": sorted(self.fingerprints), "ddl": self.ddl,
+                        "estimated_benefit_ms": round(self.estimated_benefit_ms, 1)})
+        return payload
+
+
+def heaviest_fingerprints(days: int, top: int, min_calls: int) -> List[Dict[str, Any]]:
+    """Son 'days' gündə keşdən olmayan uğurlu icraları fingerprint üzrə ümumi vaxta görə sıralayır."""
+    with chat_database.get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("""
+            SELECT
+                fingerprint_hash,
+                MIN(fingerprint) AS fingerprint,
+                (ARRAY_AGG(executed_sql ORDER BY executed_at DESC))[1] AS sample_sql,
+                COUNT(*) AS calls,
+                SUM(execution_ms) AS total_ms,
+                AVG(execution_ms) AS mean_ms,
+                PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY execution_ms) AS p95_ms,
+                AVG(row_count) AS mean_rows
+            FROM query_log
+            WHERE executed_at >= NOW() - %s * INTERVAL '1 day'
+              AND status = %s AND NOT result_cache_hit
+            GROUP BY fingerprint_hash
+            HAVING COUNT(*) >= %s
+            ORDER BY total_ms DESC
+            LIMIT %s
+        """, (days, STATUS_OK, min_calls, top))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def explain(cursor, sql: str, analyze: bool, timeout_ms: int) -> Dict[str, Any]:
+    """Yalnız oxuma tranzaksiyasında EXPLAIN (lazım olduqda ANALYZE) icra edir; kök düyünü qaytarır."""
+    cursor.execute("SET TRANSACTION READ ONLY")
+    cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+    options = "ANALYZE, BUFFERS, FORMAT JSON" if analyze else "FORMAT JSON"
+    cursor.execute(f"EXPLAIN ({options}) {sql.strip().rstrip(';')}")
+    plan = cursor.fetchone()[0]
+    cursor.connection.rollback()
+    return plan[0]['Plan']
+
+
+def load_table_info(cursor, tables: Set[str]) -> Dict[str, Dict[str, Any]]:
+    """Cədvəllərin təxmini sətir sayı, sütunları və mövcud indekslərin sütun ardıcıllığı."""
+    info = {table: {"rows": 0.0, "columns": set(), "indexes": []} for table in tables}
+    if not tables:
+        return info
+    names = sorted(tables)
+    cursor.execute("""
+        SELECT c.relname, c.reltuples, a.attname
+        FROM pg_class c
+        JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+        WHERE c.relname = ANY(%s) AND c.relkind IN ('r', 'p')
+    """, (names,))
+    for relname, reltuples, attname in cursor.fetchall():
+        info[relname]["rows"] = max(float(reltuples), 0.0)
+        info[relname]["columns"].add(attname)
+    cursor.execute("""
+        SELECT t.relname, ARRAY_AGG(a.attname ORDER BY k.ord)
+        FROM pg_index x
+        JOIN pg_class t ON t.oid = x.indrelid
+        CROSS JOIN LATERAL UNNEST(x.indkey) WITH ORDINALITY AS k(attnum, ord)
+        JOIN pg_attribute a ON a.attrelid = t.oid AND a.attnum = k.attnum
+        WHERE t.relname = ANY(%s)
+        GROUP BY t.relname, x.indexrelid
+    """, (names,))
+    for relname, columns in cursor.fetchall():
+        info[relname]["indexes"].append(tuple(columns))
+    cursor.connection.rollback()
+    return info
+
+
+def work_mem_bytes(cursor) -> int:
+    cursor.execute("SELECT pg_size_bytes(current_setting('work_mem'))")
+    value = int(cursor.fetchone()[0])
+    cursor.connection.rollback()
+    return value
+
+
+def filter_columns(filter_text: str, table_columns: Set[str]) -> Tuple[List[str], List[str]]:
+    """Seq Scan filtrindən (bərabərlik, diapazon) sütunlarını çıxarır; funksiya arqumentləri nəzərə alınmır."""
+    equality, ranges = [], []
+    for match in PREDICATE_RE.finditer(filter_text or ''):
+        column, op = match.group('column'), match.group('op')
+        if column not in table_columns:
+            continue
+        # 'lower(name) = ...', 'date_trunc(..., col) = ...' və ya "'x'::text = ..." adi indeksdən istifadə etmir
+        prefix = filter_text[:match.start()].rstrip()
+        call = re.search(r'(\w+)\s*\(+$', prefix)
+        if prefix.endswith((',', ':')) or (call and call.group(1).upper() not in BOOLEAN_OPERATORS):
+            continue
+        target = equality if op in EQUALITY_OPS else ranges if op in RANGE_OPS else None
+        if target is not None and column not in equality and column not in ranges:
+            target.append(column)
+    return equality, ranges
+
+
+def _scan_below(node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Sıralamanın bilavasitə oxuduğu cədvəl düyünü (aralıqda join/aqreqasiya yoxdursa)."""
+    while node.get('Plans'):
+        if len(node['Plans']) != 1:
+            return None
+        node = node['Plans'][0]
+        if node.get('Node Type') not in PASS_THROUGH_NODES:
+            return None
+    return node if node.get('Node Type') == 'Seq Scan' else None
+
+
+def _is_covered(columns: Tuple[str, ...], indexes: List[Tuple[str, ...]]) -> bool:
+    plain = tuple(column.split()[0] for column in columns)
+    return any(index[:len(plain)] == plain for index in indexes)
+
+
+def analyze_plan(plan: Dict[str, Any], table_info: Dict[str, Dict[str, Any]], work_mem: int,
+                 max_selectivity: float) -> List[Tuple[str, Tuple[str, ...], str, float]]:
+    """Plan üzrə (cədvəl, sütunlar, səbəb, planın xərcindəki pay) namizədlərini qaytarır."""
+    root_cost = float(plan.get('Total Cost') or 0) or 1.0
+    candidates = []
+    for node in walk_plan(plan):
+        node_type = node.get('Node Type')
+        relation = node.get('Relation Name')
+
+        if node_type == 'Seq Scan' and relation in table_info and node.get('Filter'):
+            info = table_info[relation]
+            if 'Actual Rows' in node:
+                kept = float(node['Actual Rows'])
+                selectivity = kept / max(kept + float(node.get('Rows Removed by Filter', 0)), 1.0)
+            else:
+                selectivity = float(node.get('Plan Rows', 0)) / max(info["rows"], 1.0)
+            if selectivity > max_selectivity:
+                continue
+            equality, ranges = filter_columns(node['Filter'], info["columns"])
+            columns = tuple((equality + ranges[:1])[:MAX_INDEX_COLUMNS])
+            if columns:
+                share = float(node.get('Total Cost', 0)) / root_cost * (1 - selectivity)
+                candidates.append((relation, columns,
+                                   f"seq scan (seçicilik {selectivity:.2%})", share))
+
+        elif node_type in SORT_NODE_TYPES:
+            scan = _scan_below(node)
+            if scan is None or scan.get('Relation Name') not in table_info:
+                continue
+            keys = [SORT_KEY_RE.match(key.strip()) for key in node.get('Sort Key', [])]
+            info = table_info[scan['Relation Name']]
+            if not keys or not all(keys) or any(key.group('column') not in info["columns"] for key in keys):
+                continue
+            if 'Sort Space Type' in node:
+                spilled = node['Sort Space Type'] == 'Disk'
+            else:
+                spilled = float(node.get('Plan Rows', 0)) * float(node.get('Plan Width', 0)) > work_mem
+            columns = tuple(f"{key.group('column')}{' DESC' if key.group('desc') else ''}"
+                            for key in keys)[:MAX_INDEX_COLUMNS]
+            child_cost = float(node['Plans'][0].get('Total Cost', 0)) if node.get('Plans') else 0.0
+            share = max(float(node.get('Total Cost', 0)) - child_cost, 0.0) / root_cost
+            reason = "sıralama diskə düşür" if spilled else "sıralama"
+            if spilled or share >= 0.2:
+                candidates.append((scan['Relation Name'], columns, reason, share))
+    return candidates
+
+
+def measure_with_hypopg(cursor, sql: str, candidate: IndexCandidate) -> Optional[float]:
+    """hypopg ilə hipotetik indeksdən əvvəl və sonrakı plan xərcinin nisbi azalmasını qaytarır."""
+    statement = sql.strip().rstrip(';')
+    try:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}")
+        before = float(cursor.fetchone()[0][0]['Plan']['Total Cost'])
+        cursor.execute("SELECT * FROM hypopg_create_index(%s)",
+                       (candidate.ddl.replace(" CONCURRENTLY IF NOT EXISTS", ""),))
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}")
+        after = float(cursor.fetchone()[0][0]['Plan']['Total Cost'])
+        cursor.execute("SELECT hypopg_reset()")
+        return max(before - after, 0.0) / before if before else 0.0
+    except Exception as e:
+        logger.info("hypopg ilə ölçmə mümkün olmadı: %s", e)
+        return None
+    finally:
+        cursor.connection.rollback()
+
+
+def recommend(days=7, top=20, min_calls=1, analyze=False, hypopg=False, max_selectivity=0.1,
+              timeout_ms=30000) -> Dict[str, Any]:
+    """Ağır fingerprint-lər üçün namizəd indeksləri təxmini qazanca görə sıralanmış şəkildə qaytarır."""
+    workload = heaviest_fingerprints(days, top, min_calls)
+    candidates: Dict[Tuple[str, Tuple[str, ...]], IndexCandidate] = {}
+    skipped = []
+    with database.get_db_connection() as conn:
+        cursor = conn.cursor()
+        work_mem = work_mem_bytes(cursor)
+        for item in workload:
+            try:
+                plan = explain(cursor, item["sample_sql"], analyze, timeout_ms)
+            except Exception as e:
+                conn.rollback()
+                skipped.append({"fingerprint_hash": item["fingerprint_hash"], "error": str(e)})
+                continue
+            tables = {node['Relation Name'] for node in walk_plan(plan) if node.get('Relation Name')}
+            table_info = load_table_info(cursor, tables)
+            for table, columns, reason, share in analyze_plan(plan, table_info, work_mem, max_selectivity):
+                if _is_covered(columns, table_info[table]["indexes"]):
+                    continue
+                candidate = candidates.setdefault((table, columns), IndexCandidate(table, columns))
+                candidate.reasons.add(reason)
+                candidate.fingerprints.add(item["fingerprint_hash"])
+                benefit = None
+                if hypopg:
+                    ratio = measure_with_hypopg(cursor, item["sample_sql"], candidate)
+                    if ratio is not None:
+                        benefit, candidate.measured = ratio * float(item["total_ms"]), True
+                if benefit is None:
+                    benefit = min(share, 1.0) * float(item["total_ms"])
+                candidate.estimated_benefit_ms += benefit
+
+    ranked = sorted(candidates.values(), key=lambda c: c.estimated_benefit_ms, reverse=True)
+    return {
+        "window_days": days,
+        "workload": [{key: (float(value) if value is not None and (key.endswith('_ms') or key == 'mean_rows')
+                            else value)
+                      for key, value in item.items() if key != 'sample_sql'} for item in workload],
+        "candidates": [candidate.to_dict() for candidate in ranked],
+        "skipped": skipped,
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(f"Son {report['window_days']} gün üzrə ən ağır {len(report['workload'])} sorğu forması:")
+    print(f"{'fingerprint':<34}{'çağırış':>9}{'cəmi ms':>12}{'orta ms':>10}{'p95 ms':>10}")
+    for item in report["workload"]:
+        print(f"{item['fingerprint_hash']:<34}{item['calls']:>9}{item['total_ms']:>12.0f}"
+              f"{item['mean_ms']:>10.1f}{item['p95_ms']:>10.1f}")
+
+    if not report["candidates"]:
+        print("\nNamizəd indeks tapılmadı.")
+    else:
+        print(f"\n{'cədvəl':<20}{'sütunlar':<40}{'qazanc ms':>12}  səbəb")
+        for candidate in report["candidates"]:
+            benefit = f"{candidate['estimated_benefit_ms']:.0f}{'' if candidate['measured'] else '~'}"
+            print(f"{candidate['table']:<20}{', '.join(candidate['columns']):<40}{benefit:>12}  "
+                  f"{'; '.join(candidate['reasons'])}")
+        print("\n-- Tövsiyə olunan indekslər (~ evristik təxmin, hypopg olmadan)")
+        for candidate in report["candidates"]:
+            print(candidate["ddl"])
+    for item in report["skipped"]:
+        print(f"\nXƏBƏRDARLIQ: {item['fingerprint_hash']} üçün EXPLAIN alınmadı: {item['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=7)
+    parser.add_argument("--top", type=int, default=20, help="yoxlanılacaq fingerprint sayı")
+    parser.add_argument("--min-calls", type=int, default=1)
+    parser.add_argument("--analyze", action="store_true",
+                        help="EXPLAIN ANALYZE istifadə et (sorğular yalnız oxuma rejimində icra olunur)")
+    parser.add_argument("--hypopg", action="store_true", help="qazancı hypopg hipotetik indeksləri ilə ölç")
+    parser.add_argument("--max-selectivity", type=float, default=0.1,
+                        help="Seq Scan-in saxladığı sətir payı bundan çox olduqda indeks təklif olunmur")
+    parser.add_argument("--timeout-ms", type=int, default=30000)
+    parser.add_argument("--json", action="store_true", help="nəticəni JSON kimi çap et")
+    args = parser.parse_args()
+
+    database.init_db_pool()
+    chat_database.init_db_pool()
+    report = recommend(args.days, args.top, args.min_calls, args.analyze, args.hypopg,
+                       args.max_selectivity, args.timeout_ms)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
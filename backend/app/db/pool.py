@@ -0,0 +1,214 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Any
+
+import psycopg2
+import psycopg2.extensions
+from psycopg2 import pool as pg_pool
+
+from app.services.metrics import connection_acquire_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(Exception):
+    """Hovuzdan təyin olunmuş müddət ərzində əlaqə alına bilmədikdə qaldırılır."""
+
+
+class PoolNotInitializedError(Exception):
+    """Adı verilmiş hovuz hələ yaradılmayıbsa qaldırılır."""
+
+
+class ConnectionPool:
+    """Bir verilənlər bazası üçün məhdud ölçülü, thread-safe psycopg2 əlaqə hovuzu."""
+
+    def __init__(self, name: str, db_config: Dict[str, Any], minconn: int = 1,
+                 maxconn: int = 10, acquire_timeout: float = 5.0,
+                 health_check_interval: float = 30.0):
+        self.name = name
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.health_check_interval = health_check_interval
+
+        # Əlaqələri tənbəl açırıq ki, baza əlçatan olmasa da tətbiq başlaya bilsin
+        self._pool = pg_pool.ThreadedConnectionPool(0, maxconn, **db_config)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._last_used: Dict[int, float] = {}
+
+        # Metrikalar
+        self._acquired = 0
+        self._in_use = 0
+        self._timeouts = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._health_check_failures = 0
+        self._discarded = 0
+
+        self._prewarm()
+
+    def _prewarm(self):
+        """minconn qədər əlaqəni əvvəlcədən açır."""
+        conns = []
+        try:
+            for _ in range(self.minconn):
+                conns.append(self._pool.getconn())
+        except Exception as e:
+            logger.warning("[%s] Hovuz əvvəlcədən doldurula bilmədi: %s", self.name, e)
+        finally:
+            for conn in conns:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+
+    def _is_healthy(self, conn) -> bool:
+        """Uzun müddət boş qalmış əlaqəni 'SELECT 1' ilə yoxlayır."""
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        # Yeni açılmış əlaqəni yoxlamağa ehtiyac yoxdur
+        if last_used is None or time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _checkout(self):
+        """Hovuzdan sağlam əlaqə götürür, xarab olanları bağlayıb əvəz edir."""
+        conn = self._pool.getconn()
+        if self._is_healthy(conn):
+            return conn
+        with self._lock:
+            self._health_check_failures += 1
+            self._discarded += 1
+        self._last_used.pop(id(conn), None)
+        self._pool.putconn(conn, close=True)
+        return self._pool.getconn()
+
+    @contextmanager
+    def connection(self):
+        """Hovuzdan əlaqə verir və blok bitdikdə onu hovuza qaytarır."""
+        started = time.perf_counter()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._timeouts += 1
+            raise PoolTimeoutError(
+                f"'{self.name}' hovuzundan {self.acquire_timeout} saniyə ərzində əlaqə alına bilmədi"
+            )
+
+        conn = None
+        discard = False
+        try:
+            conn = self._checkout()
+            waited = time.perf_counter() - started
+            with self._lock:
+                self._acquired += 1
+                self._in_use += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            connection_acquire_seconds.observe(waited, pool=self.name)
+            try:
+                yield conn
+            finally:
+                with self._lock:
+                    self._in_use -= 1
+            # Açıq qalmış tranzaksiyanı növbəti istifadəçiyə ötürmürük
+            if not conn.closed and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except BaseException:
+            # GeneratorExit də daxil olmaqla (məs. stream yarımçıq dayandırıldıqda)
+            if conn is not None and not conn.closed:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+            raise
+        finally:
+            if conn is not None:
+                discard = discard or bool(conn.closed)
+                if discard:
+                    self._last_used.pop(id(conn), None)
+                    with self._lock:
+                        self._discarded += 1
+                else:
+                    self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn, close=discard)
+            self._slots.release()
+
+    def health_check(self) -> bool:
+        """Hovuzdan əlaqə götürüb bazanın cavab verdiyini yoxlayır."""
+        try:
+            with self.connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                    cursor.fetchone()
+            return True
+        except Exception as e:
+            logger.warning("[%s] Sağlamlıq yoxlaması uğursuz oldu: %s", self.name, e)
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Hovuzun cari vəziyyətini və metrikalarını qaytarır."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "min_size": self.minconn,
+                "max_size": self.maxconn,
+                "in_use": self._in_use,
+                "idle": len(self._pool._pool),
+                "acquired_total": self._acquired,
+                "acquire_timeouts": self._timeouts,
+                "acquire_wait_avg_ms": round(self._wait_total / self._acquired * 1000, 3) if self._acquired else 0.0,
+                "acquire_wait_max_ms": round(self._wait_max * 1000, 3),
+                "health_check_failures": self._health_check_failures,
+                "connections_discarded": self._discarded,
+            }
+
+    def close(self):
+        """Hovuzdakı bütün əlaqələri bağlayır."""
+        self._pool.closeall()
+
+
+_pools: Dict[str, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def init_pool(name: str, db_config: Dict[str, Any], **options) -> ConnectionPool:
+    """Adı verilmiş hovuzu yaradır (artıq varsa, mövcud olanı qaytarır)."""
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ConnectionPool(name, db_config, **options)
+            logger.info("[%s] Əlaqə hovuzu yaradıldı (max=%d)", name, _pools[name].maxconn)
+        return _pools[name]
+
+
+def get_pool(name: str) -> ConnectionPool:
+    """Əvvəlcədən yaradılmış hovuzu qaytarır."""
+    try:
+        return _pools[name]
+    except KeyError:
+        raise PoolNotInitializedError(f"'{name}' əlaqə hovuzu yaradılmayıb")
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Bütün hovuzların metrikalarını qaytarır."""
+    return {name: p.stats() for name, p in _pools.items()}
+
+
+def health_check_all() -> Dict[str, bool]:
+    """Bütün hovuzlar üçün sağlamlıq yoxlaması aparır."""
+    return {name: p.health_check() for name, p in _pools.items()}
+
+
+def close_all_pools():
+    """Tətbiq dayandırılarkən bütün hovuzları bağlayır."""
+    with _pools_lock:
+        for p in _pools.values():
+            p.close()
+        _pools.clear()
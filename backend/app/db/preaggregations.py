@@ -0,0 +1,929 @@
+"""Təkrarlanan aqreqasiya sorğuları üçün ön-aqreqasiya (rollup) cədvəlləri.
+
+Modelin yaratdığı SQL-lərin çoxu eyni formadadır: bir böyük cədvəl üzərində GROUP BY sütunlar və ya
+date_trunc(...) intervalları, SUM/COUNT/AVG/MIN/MAX aqreqatları və bu sütunlar üzrə filtrlər.
+Sorğu jurnalında (query_log) tez-tez rast gəlinən belə formalar üçün "preagg" sxemində rollup cədvəlləri
+yaradılır; icra zamanı uyğun sorğu rollup-dan oxuyan ekvivalent sorğuya çevrilir (yenidən aqreqasiya ilə).
+
+Rollup-lar planlaşdırıcı ilə yenilənir: zaman intervalı olan rollup-larda yalnız son interval(lar)
+yenidən hesablanır (artımlı), vaxtaşırı isə tam yenilənir.
+
+    python -m app.db.preaggregations detect            # namizəd formalar
+    python -m app.db.preaggregations create --top 5    # namizədlər üçün rollup yaradır
+    python -m app.db.preaggregations refresh [--full] [ad ...]
+    python -m app.db.preaggregations list
+    python -m app.db.preaggregations drop <ad>
+"""
+import argparse
+import asyncio
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from app.db.chart_queries import TIME_UNITS, quote_identifier
+from app.db.sql_utils import tokenize_sql
+
+logger = logging.getLogger(__name__)
+
+PREAGG_CONFIG = {
+    # Sorğuların rollup-a yönləndirilməsi
+    'enabled': os.getenv('PREAGG_ENABLED', 'true').lower() == 'true',
+    'schema': os.getenv('PREAGG_SCHEMA', 'preagg'),
+    # Bundan köhnə rollup-lar istifadə olunmur (saniyə)
+    'max_staleness': float(os.getenv('PREAGG_MAX_STALENESS', '3600')),
+    # Planlaşdırıcı: artımlı yeniləmə intervalı (0 — söndürülüb) və tam yeniləmə intervalı
+    'refresh_interval': float(os.getenv('PREAGG_REFRESH_INTERVAL', '300')),
+    'full_refresh_interval': float(os.getenv('PREAGG_FULL_REFRESH_INTERVAL', '86400')),
+    # Planlaşdırıcı yeni rollup-ları sorğu jurnalına əsasən özü yaratsınmı
+    'auto_create': os.getenv('PREAGG_AUTO_CREATE', 'false').lower() == 'true',
+    'min_calls': int(os.getenv('PREAGG_MIN_CALLS', '3')),
+    'window_days': int(os.getenv('PREAGG_WINDOW_DAYS', '7')),
+    'max_rollups': int(os.getenv('PREAGG_MAX_ROLLUPS', '20')),
+    # Kiçik cədvəllər və mənbədən az kiçilən rollup-lar üçün fayda yoxdur
+    'min_source_rows': int(os.getenv('PREAGG_MIN_SOURCE_ROWS', '100000')),
+    'max_rollup_ratio': float(os.getenv('PREAGG_MAX_ROLLUP_RATIO', '0.2')),
+}
+
+AGGREGATES = {'sum', 'count', 'avg', 'min', 'max'}
+SCALAR_FUNCTIONS = {'round', 'coalesce', 'nullif', 'abs', 'greatest', 'least'}
+TIME_UNIT_NAMES = {unit for unit, _ in TIME_UNITS}
+# İfadədə sütun kimi qəbul edilməyən sözlər (açar sözlər, tip adları, cari vaxt)
+EXPRESSION_KEYWORDS = {
+    'and', 'or', 'not', 'is', 'null', 'true', 'false', 'in', 'between', 'like', 'ilike',
+    'case', 'when', 'then', 'else', 'end', 'asc', 'desc', 'nulls', 'first', 'last',
+    'precision', 'varying', 'time', 'zone', 'current_date', 'current_timestamp', 'localtimestamp',
+}
+TYPED_LITERALS = {'date', 'timestamp', 'timestamptz', 'interval', 'time'}
+CLAUSES = ('select', 'from', 'where', 'group', 'having', 'order', 'limit', 'offset')
+UNSUPPORTED_WORDS = {
+    'join', 'union', 'intersect', 'except', 'window', 'fetch', 'for', 'with', 'distinct', 'tablesample',
+    'lateral', 'into', 'over', 'filter', 'within', 'rollup', 'cube', 'grouping', 'sets',
+}
+FLOAT_TYPES = {'real', 'double precision'}
+PAGED_QUERY_RE = re.compile(r'^SELECT \* FROM \(\n(?P<sql>.*)\n\) AS paged_query(?: LIMIT \d+)?(?: OFFSET \d+)?$',
+                            re.DOTALL)
+
+
+class _Unsupported(Exception):
+    """Sorğu ön-aqreqasiya formasına uyğun deyil (və ya rollup onu cavablandıra bilmir)."""
+
+
+@dataclass(frozen=True)
+class Dimension:
+    column: str
+    unit: Optional[str] = None  # date_trunc vahidi; None — sütunun özü
+
+    @property
+    def name(self) -> str:
+        return self.column if self.unit is None else f"{self.column}_{self.unit}"
+
+    @property
+    def expression(self) -> str:
+        if self.unit is None:
+            return quote_identifier(self.column)
+        return f"date_trunc('{self.unit}', {quote_identifier(self.column)})"
+
+
+def _ident(kind: str, text: str) -> str:
+    return text[1:-1].replace('""', '"') if kind == 'quoted' else text.lower()
+
+
+def _render(parts: List[str]) -> str:
+    """Tokenləri SQL mətninə yığır (mötərizə, vergül və :: ətrafında boşluqsuz)."""
+    text = ''
+    for part in parts:
+        if text and not (part in ('(', ')', ',', '::') or text.endswith(('(', '::'))):
+            text += ' '
+        text += part
+    return text
+
+
+def _matching_paren(tokens, start: int) -> int:
+    depth = 0
+    for i in range(start, len(tokens)):
+        if tokens[i][1] == '(':
+            depth += 1
+        elif tokens[i][1] == ')':
+            depth -= 1
+            if depth == 0:
+                return i
+    raise _Unsupported("mötərizə bağlanmayıb")
+
+
+def _split(tokens, separator: str = ',') -> List[list]:
+    """Tokenləri yuxarı səviyyədəki ayırıcıya görə bölür; 'and' üçün BETWEEN ... AND nəzərə alınır."""
+    parts, current, depth, between = [], [], 0, False
+    for kind, text in tokens:
+        lower = text.lower()
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+        elif depth == 0 and lower == 'between':
+            between = True
+        elif depth == 0 and lower == separator:
+            if separator == 'and' and between:
+                between = False
+            else:
+                parts.append(current)
+                current = []
+                continue
+        current.append((kind, text))
+    parts.append(current)
+    return [part for part in parts if part]
+
+
+def _unwrap_parens(tokens):
+    while len(tokens) > 2 and tokens[0][1] == '(' and _matching_paren(tokens, 0) == len(tokens) - 1:
+        tokens = tokens[1:-1]
+    return tokens
+
+
+def _output_name(expr) -> str:
+    """Alias verilmədikdə PostgreSQL-in nəticə sütununa verdiyi ad."""
+    while len(expr) > 2 and expr[-2][1] == '::':
+        expr = expr[:-2]
+    if len(expr) == 1 and expr[0][0] in ('word', 'quoted'):
+        return _ident(*expr[0])
+    if len(expr) == 3 and expr[1][1] == '.' and expr[2][0] in ('word', 'quoted'):
+        return _ident(*expr[2])
+    if len(expr) > 2 and expr[0][0] == 'word' and expr[1][1] == '(' and _matching_paren(expr, 1) == len(expr) - 1:
+        return expr[0][1].lower()
+    if expr and expr[0][1].lower() == 'case':
+        return 'case'
+    return '?column?'
+
+
+def _split_alias(item) -> Tuple[list, str]:
+    if len(item) >= 3 and item[-2][1].lower() == 'as' and item[-1][0] in ('word', 'quoted'):
+        return item[:-2], _ident(*item[-1])
+    if (len(item) >= 2 and item[-1][0] in ('word', 'quoted') and item[-2][1] not in ('.', '::')
+            and item[-1][1].lower() not in EXPRESSION_KEYWORDS
+            and (item[-2][1] == ')' or item[-2][0] in ('word', 'quoted', 'string', 'number'))):
+        return item[:-1], _ident(*item[-1])
+    return item, _output_name(item)
+
+
+def _literal_datetime(tokens) -> Optional[datetime.datetime]:
+    """'2024-01-01'::date və ya DATE '2024-01-01' kimi literalın qiymətini qaytarır."""
+    strings = [text for kind, text in tokens if kind == 'string']
+    words = {text.lower() for kind, text in tokens if kind == 'word'}
+    if len(strings) != 1 or not words <= TYPED_LITERALS | {'timestamp', 'without', 'with', 'time', 'zone'}:
+        return None
+    try:
+        return datetime.datetime.fromisoformat(strings[0].strip("'"))
+    except ValueError:
+        return None
+
+
+def _aligned(value: datetime.datetime, unit: str) -> bool:
+    """Qiymət date_trunc(unit, ...) intervalının başlanğıcıdırmı."""
+    if value.microsecond:
+        return False
+    checks = {
+        'second': True,
+        'minute': value.second == 0,
+        'hour': value.second == 0 and value.minute == 0,
+    }
+    if unit in checks:
+        return checks[unit]
+    if (value.hour, value.minute, value.second) != (0, 0, 0):
+        return False
+    return {
+        'day': True,
+        'week': value.weekday() == 0,
+        'month': value.day == 1,
+        'quarter': value.day == 1 and value.month in (1, 4, 7, 10),
+        'year': value.day == 1 and value.month == 1,
+    }[unit]
+
+
+@dataclass
+class AggregateQuery:
+    """Bir cədvəl üzərində GROUP BY sorğusunun təhlil olunmuş forması."""
+    table: str
+    alias: Optional[str]
+    select: List[Tuple[list, str]] = field(default_factory=list)  # (ifadə tokenləri, nəticə adı)
+    group_by: List[Dimension] = field(default_factory=list)
+    where: List[Tuple[str, Any]] = field(default_factory=list)  # ('expr', tokenlər) və ya ('range', (sütun, op, literal))
+    having: Optional[list] = None
+    order_by: Optional[list] = None
+    limit: Optional[str] = None
+    offset: Optional[str] = None
+    aggregates: Set[Tuple[str, Optional[str]]] = field(default_factory=set)  # (funksiya, sütun)
+    filter_dimensions: Set[Dimension] = field(default_factory=set)
+
+    def _column_at(self, tokens, i: int) -> Optional[Tuple[str, int]]:
+        """i mövqeyində 'sütun' və ya 'alias.sütun' istinadı varsa, (sütun, növbəti mövqe) qaytarır."""
+        if i >= len(tokens) or tokens[i][0] not in ('word', 'quoted'):
+            return None
+        name = _ident(*tokens[i])
+        if i + 2 < len(tokens) and tokens[i + 1][1] == '.' and tokens[i + 2][0] in ('word', 'quoted'):
+            if name not in (self.table, self.alias):
+                raise _Unsupported(f"naməlum cədvəl istinadı: {name}")
+            return _ident(*tokens[i + 2]), i + 3
+        return name, i + 1
+
+    def walk(self, tokens, on_dimension, on_measure, keep_words=(), allow_aggregates=True) -> List[str]:
+        """İfadəni gəzir: sütunları və date_trunc-ı on_dimension, aqreqatları on_measure ilə əvəz edir."""
+        out = []
+        i = 0
+        while i < len(tokens):
+            kind, text = tokens[i]
+            lower = text.lower()
+            is_call = kind == 'word' and i + 1 < len(tokens) and tokens[i + 1][1] == '('
+            if is_call and lower in AGGREGATES:
+                if not allow_aggregates:
+                    raise _Unsupported("aqreqat bu hissədə ola bilməz")
+                end = _matching_paren(tokens, i + 1)
+                inner = tokens[i + 2:end]
+                if lower == 'count' and [t[1] for t in inner] == ['*']:
+                    column = None
+                else:
+                    ref = self._column_at(inner, 0)
+                    if ref is None or ref[1] != len(inner):
+                        raise _Unsupported(f"{lower}(...) yalnız sütun üzərində dəstəklənir")
+                    column = ref[0]
+                out.append(on_measure(lower, column))
+                i = end + 1
+            elif is_call and lower == 'date_trunc':
+                end = _matching_paren(tokens, i + 1)
+                inner = tokens[i + 2:end]
+                if len(inner) < 3 or inner[0][0] != 'string' or inner[1][1] != ',':
+                    raise _Unsupported("date_trunc forması dəstəklənmir")
+                unit = inner[0][1].strip("'").lower()
+                ref = self._column_at(inner, 2)
+                if unit not in TIME_UNIT_NAMES or ref is None or ref[1] != len(inner):
+                    raise _Unsupported("date_trunc forması dəstəklənmir")
+                out.append(on_dimension(Dimension(ref[0], unit)))
+                i = end + 1
+            elif is_call and lower in SCALAR_FUNCTIONS:
+                out.append(text)
+                i += 1
+            elif is_call:
+                raise _Unsupported(f"'{lower}' funksiyası dəstəklənmir")
+            elif kind in ('word', 'quoted') and (
+                    (i and tokens[i - 1][1] == '::') or _ident(kind, text) in keep_words
+                    or (kind == 'word' and lower in EXPRESSION_KEYWORDS)
+                    or (kind == 'word' and lower in TYPED_LITERALS
+                        and i + 1 < len(tokens) and tokens[i + 1][0] == 'string')):
+                out.append(text)
+                i += 1
+            elif kind in ('word', 'quoted'):
+                column, i = self._column_at(tokens, i)
+                out.append(on_dimension(Dimension(column)))
+            elif kind == 'param':
+                raise _Unsupported("parametrli sorğu")
+            else:
+                out.append(text)
+                i += 1
+        return out
+
+    def _range_predicate(self, tokens):
+        """'sütun >= literal' / 'sütun < literal' (zaman intervalının sərhədi ola bilən) filtr."""
+        ref = self._column_at(tokens, 0)
+        if ref is None or ref[1] >= len(tokens) or tokens[ref[1]][1] not in ('>=', '<'):
+            return None
+        literal = tokens[ref[1] + 1:]
+        if _literal_datetime(literal) is None:
+            return None
+        return ref[0], tokens[ref[1]][1], literal
+
+    def rollup_dimensions(self) -> Set[Dimension]:
+        """Bu sorğunu cavablandırmaq üçün rollup-da olmalı ölçülər."""
+        dimensions = set(self.group_by) | self.filter_dimensions
+        bucketed = {d.column for d in self.group_by if d.unit is not None}
+        for kind, value in self.where:
+            if kind == 'range' and value[0] not in bucketed:
+                dimensions.add(Dimension(value[0]))
+        return dimensions
+
+    def rollup_measures(self) -> Set[Tuple[str, str]]:
+        measures = set()
+        for func, column in self.aggregates:
+            if column is None:
+                continue
+            if func == 'avg':
+                measures.update({('sum', column), ('count', column)})
+            else:
+                measures.add((func, column))
+        return measures
+
+    def rewrite(self, rollup: 'Rollup', schema: str) -> str:
+        """Sorğunu rollup cədvəlindən oxuyan ekvivalent sorğuya çevirir; mümkün olmadıqda _Unsupported."""
+        dimensions = set(rollup.dimensions)
+
+        def dimension(d):
+            if d not in dimensions:
+                raise _Unsupported(f"rollup-da '{d.name}' yoxdur")
+            return quote_identifier(d.name)
+
+        def measure(func, column):
+            if column is None:
+                return "COALESCE(SUM(row_count), 0)::bigint"
+            needed = {('sum', column), ('count', column)} if func == 'avg' else {(func, column)}
+            if not needed <= set(rollup.measures):
+                raise _Unsupported(f"rollup-da {func}({column}) yoxdur")
+            if func == 'avg':
+                cast = 'double precision' if rollup.source_types.get(column) in FLOAT_TYPES else 'numeric'
+                return (f"(SUM({quote_identifier(f'sum_{column}')})::{cast} / "
+                        f"NULLIF(SUM({quote_identifier(f'count_{column}')}), 0))")
+            name = quote_identifier(f"{func}_{column}")
+            if func == 'count':
+                return f"COALESCE(SUM({name}), 0)::bigint"
+            if func == 'sum':
+                return f"SUM({name})::{rollup.column_types[f'sum_{column}']}"
+            return f"{func.upper()}({name})"
+
+        select = [f"{_render(self.walk(expr, dimension, measure))} AS {quote_identifier(name)}"
+                  for expr, name in self.select]
+        where = []
+        for kind, value in self.where:
+            if kind == 'expr':
+                where.append(_render(self.walk(value, dimension, measure, allow_aggregates=False)))
+                continue
+            column, op, literal = value
+            if Dimension(column) in dimensions:
+                where.append(f"{quote_identifier(column)} {op} {_render([t[1] for t in literal])}")
+                continue
+            bucket = next((d for d in rollup.dimensions
+                           if d.column == column and d.unit is not None
+                           and _aligned(_literal_datetime(literal), d.unit)), None)
+            if bucket is None:
+                raise _Unsupported(f"'{column}' filtri rollup intervalları ilə üst-üstə düşmür")
+            where.append(f"{quote_identifier(bucket.name)} {op} {_render([t[1] for t in literal])}")
+
+        sql = f"SELECT {', '.join(select)} FROM {schema}.{quote_identifier(rollup.name)}"
+        if where:
+            sql += " WHERE " + " AND ".join(f"({predicate})" for predicate in where)
+        if self.group_by:
+            sql += " GROUP BY " + ", ".join(dimension(d) for d in self.group_by)
+        if self.having is not None:
+            sql += " HAVING " + _render(self.walk(self.having, dimension, measure))
+        if self.order_by is not None:
+            names = {name for _, name in self.select}
+            sql += " ORDER BY " + _render(self.walk(self.order_by, dimension, measure, keep_words=names))
+        if self.limit is not None:
+            sql += f" LIMIT {self.limit}"
+        if self.offset is not None:
+            sql += f" OFFSET {self.offset}"
+        return sql
+
+
+def _parse_from(tokens) -> Tuple[str, Optional[str]]:
+    names = []
+    i = 0
+    while i < len(tokens) and tokens[i][0] in ('word', 'quoted'):
+        names.append(_ident(*tokens[i]))
+        if i + 1 < len(tokens) and tokens[i + 1][1] == '.':
+            i += 2
+            continue
+        i += 1
+        break
+    if not names or len(names) > 2 or (len(names) == 2 and names[0] != 'public'):
+        raise _Unsupported("FROM yalnız bir cədvəl olmalıdır")
+    rest = tokens[i:]
+    if rest and rest[0][1].lower() == 'as':
+        rest = rest[1:]
+    if len(rest) > 1 or (rest and rest[0][0] not in ('word', 'quoted')):
+        raise _Unsupported("FROM yalnız bir cədvəl olmalıdır")
+    return names[-1], _ident(*rest[0]) if rest else None
+
+
+def parse_aggregate_query(sql: str) -> Optional[AggregateQuery]:
+    """Bir cədvəl üzərində aqreqasiya sorğusunu təhlil edir; forma dəstəklənmirsə None qaytarır."""
+    tokens = tokenize_sql(sql)
+    while tokens and tokens[-1][1] == ';':
+        tokens.pop()
+    words = [text.lower() for kind, text in tokens if kind == 'word']
+    if not tokens or tokens[0][1].lower() != 'select' or words.count('select') != 1:
+        return None
+    if UNSUPPORTED_WORDS & set(words) or ';' in (text for _, text in tokens):
+        return None
+
+    clauses: Dict[str, list] = {}
+    order = []
+    depth = 0
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i]
+        lower = text.lower()
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+        elif depth == 0 and kind == 'word' and lower in CLAUSES:
+            if lower in ('group', 'order'):
+                if i + 1 >= len(tokens) or tokens[i + 1][1].lower() != 'by':
+                    return None
+                i += 1
+            if lower in clauses:
+                return None
+            clauses[lower] = []
+            order.append(lower)
+            i += 1
+            continue
+        clauses[order[-1]].append(tokens[i])
+        i += 1
+    if 'from' not in clauses or order != sorted(order, key=CLAUSES.index):
+        return None
+
+    try:
+        table, alias = _parse_from(clauses['from'])
+        query = AggregateQuery(table, alias)
+        used = set()
+
+        def record_dimension(d):
+            used.add(d)
+            return d.name
+
+        def record_measure(func, column):
+            query.aggregates.add((func, column))
+            return func
+
+        for item in _split(clauses['select']):
+            expr, name = _split_alias(item)
+            if [t[1] for t in expr] == ['*']:
+                return None
+            query.walk(expr, record_dimension, record_measure)
+            query.select.append((expr, name))
+
+        for item in _split(clauses.get('group', [])):
+            if len(item) == 1 and item[0][0] == 'number':
+                position = int(item[0][1]) - 1
+                if not 0 <= position < len(query.select):
+                    return None
+                item = query.select[position][0]
+            elif len(item) == 1 and _ident(*item[0]) in {name for _, name in query.select}:
+                item = next(expr for expr, name in query.select if name == _ident(*item[0]))
+            dims = []
+            query.walk(item, lambda d: dims.append(d) or d.name, record_measure, allow_aggregates=False)
+            if len(dims) != 1 or len(item) not in (1, 3) and dims[0].unit is None:
+                return None
+            query.group_by.append(dims[0])
+
+        if not query.aggregates or not used <= set(query.group_by):
+            return None
+
+        for conjunct in _split(clauses.get('where', []), 'and'):
+            conjunct = _unwrap_parens(conjunct)
+            bucketed = {d.column for d in query.group_by if d.unit is not None}
+            predicate = query._range_predicate(conjunct)
+            if predicate is not None and predicate[0] in bucketed:
+                query.where.append(('range', predicate))
+            else:
+                query.walk(conjunct, lambda d: query.filter_dimensions.add(d) or d.name, record_measure,
+                           allow_aggregates=False)
+                query.where.append(('expr', conjunct))
+
+        if 'having' in clauses:
+            used.clear()
+            query.walk(clauses['having'], record_dimension, record_measure)
+            if not used <= set(query.group_by):
+                return None
+            query.having = clauses['having']
+        if 'order' in clauses:
+            used.clear()
+            query.walk(clauses['order'], record_dimension, record_measure,
+                       keep_words={name for _, name in query.select})
+            if not used <= set(query.group_by):
+                return None
+            query.order_by = clauses['order']
+        for clause in ('limit', 'offset'):
+            if clause in clauses:
+                value = clauses[clause]
+                if len(value) != 1 or value[0][0] != 'number' and value[0][1].lower() != 'all':
+                    return None
+                setattr(query, clause, value[0][1])
+        return query
+    except _Unsupported:
+        return None
+
+
+@dataclass
+class Rollup:
+    name: str
+    table: str
+    dimensions: Tuple[Dimension, ...]
+    measures: Tuple[Tuple[str, str], ...]  # (funksiya, sütun); COUNT(*) həmişə row_count sütunundadır
+    column_types: Dict[str, str] = field(default_factory=dict)
+    source_types: Dict[str, str] = field(default_factory=dict)
+    row_count: int = 0
+    refreshed_at: Optional[float] = None
+    full_refreshed_at: Optional[float] = None
+
+    @staticmethod
+    def make_name(table: str, dimensions, measures) -> str:
+        definition = json.dumps([table, sorted(d.name for d in dimensions), sorted(measures)])
+        return f"{table}_{hashlib.sha1(definition.encode('utf-8')).hexdigest()[:10]}"
+
+    @property
+    def incremental_dimension(self) -> Optional[Dimension]:
+        return next((d for d in self.dimensions if d.unit is not None), None)
+
+    def definition(self) -> Dict[str, Any]:
+        return {"dimensions": [[d.column, d.unit] for d in self.dimensions],
+                "measures": [list(m) for m in self.measures],
+                "column_types": self.column_types, "source_types": self.source_types}
+
+    @classmethod
+    def from_row(cls, name, table, definition, row_count, refreshed_at, full_refreshed_at):
+        return cls(name, table, tuple(Dimension(column, unit) for column, unit in definition["dimensions"]),
+                   tuple(tuple(m) for m in definition["measures"]), definition.get("column_types", {}),
+                   definition.get("source_types", {}), int(row_count or 0), refreshed_at, full_refreshed_at)
+
+    def select_sql(self, incremental: bool = False) -> str:
+        """Rollup-un məzmununu mənbə cədvəldən hesablayan sorğu (artımlıda %(since)s parametri ilə)."""
+        columns = [f"{d.expression} AS {quote_identifier(d.name)}" for d in self.dimensions]
+        columns.append("COUNT(*) AS row_count")
+        columns += [f"{func.upper()}({quote_identifier(column)}) AS {quote_identifier(f'{func}_{column}')}"
+                    for func, column in self.measures]
+        sql = f"SELECT {', '.join(columns)} FROM {quote_identifier(self.table)}"
+        if incremental:
+            sql += f" WHERE {quote_identifier(self.incremental_dimension.column)} >= %(since)s"
+        if self.dimensions:
+            sql += " GROUP BY " + ", ".join(str(i + 1) for i in range(len(self.dimensions)))
+        return sql
+
+
+class PreaggregationManager:
+    """Rollup-ların reyestri: sorğuların yönləndirilməsi, aşkarlanma, yaradılma və yenilənmə."""
+
+    def __init__(self, config=None):
+        self.config = dict(PREAGG_CONFIG, **(config or {}))
+        self._rollups: Dict[str, Rollup] = {}
+        self._lock = threading.Lock()
+        self._counts = {"rewrites": 0, "misses": 0, "refreshes": 0, "refresh_errors": 0,
+                        "refresh_skipped": 0, "created": 0}
+
+    @property
+    def _qualified_schema(self) -> str:
+        return quote_identifier(self.config['schema'])
+
+    def _table(self, name: str) -> str:
+        return f"{self._qualified_schema}.{quote_identifier(name)}"
+
+    def rewrite(self, sql: str, require_fresh: bool = True) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Sorğu təzə rollup-dan cavablandırıla bilərsə, (yeni SQL, məlumat) qaytarır."""
+        if not self.config['enabled'] or not self._rollups:
+            return None
+        query = parse_aggregate_query(sql)
+        if query is None:
+            return None
+        now = time.time()
+        with self._lock:
+            candidates = sorted(
+                (r for r in self._rollups.values() if r.table == query.table and r.refreshed_at is not None
+                 and (not require_fresh or now - r.refreshed_at <= self.config['max_staleness'])),
+                key=lambda r: r.row_count,
+            )
+        for rollup in candidates:
+            try:
+                rewritten = query.rewrite(rollup, self._qualified_schema)
+            except _Unsupported:
+                continue
+            with self._lock:
+                self._counts["rewrites"] += 1
+            return rewritten, {
+                "rollup": rollup.name,
+                "source_table": rollup.table,
+                "refreshed_at": datetime.datetime.fromtimestamp(rollup.refreshed_at,
+                                                                datetime.timezone.utc).isoformat(),
+                "age_seconds": round(now - rollup.refreshed_at, 1),
+                "rewritten_sql": rewritten,
+            }
+        with self._lock:
+            self._counts["misses"] += 1
+        return None
+
+    def _ensure_schema(self, cursor):
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {self._qualified_schema}")
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {self._table('rollups')} (
+                name TEXT PRIMARY KEY,
+                source_table TEXT NOT NULL,
+                definition JSONB NOT NULL,
+                row_count BIGINT,
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+                refreshed_at TIMESTAMP WITH TIME ZONE,
+                full_refreshed_at TIMESTAMP WITH TIME ZONE,
+                last_refresh_ms DOUBLE PRECISION
+            )
+        """)
+
+    def load(self) -> int:
+        """Rollup reyestrini bazadan oxuyur; sxem hələ yaradılmayıbsa, reyestr boş qalır."""
+        from app.db.database import get_db_connection
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT to_regclass(%s)", (f"{self.config['schema']}.rollups",))
+                if cursor.fetchone()[0] is None:
+                    conn.rollback()
+                    return 0
+                cursor.execute(f"""
+                    SELECT name, source_table, definition, row_count,
+                           EXTRACT(EPOCH FROM refreshed_at), EXTRACT(EPOCH FROM full_refreshed_at)
+                    FROM {self._table('rollups')}
+                """)
+                rows = cursor.fetchall()
+                conn.rollback()
+        except Exception as e:
+            logger.warning("Rollup reyestri oxuna bilmədi: %s", e)
+            return 0
+        rollups = {}
+        for name, table, definition, row_count, refreshed_at, full_refreshed_at in rows:
+            rollups[name] = Rollup.from_row(name, table, definition, row_count,
+                                            float(refreshed_at) if refreshed_at is not None else None,
+                                            float(full_refreshed_at) if full_refreshed_at is not None else None)
+        with self._lock:
+            self._rollups = rollups
+        return len(rollups)
+
+    def detect(self) -> List[Dict[str, Any]]:
+        """Sorğu jurnalında təkrarlanan aqreqasiya formalarını (hələ rollup-u olmayan) qaytarır."""
+        from app.db.chat_database import get_db_connection as chat_connection
+        from app.db.query_log import STATUS_OK
+
+        with chat_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT fingerprint_hash, (ARRAY_AGG(executed_sql ORDER BY executed_at DESC))[1],
+                       COUNT(*), SUM(execution_ms)
+                FROM query_log
+                WHERE executed_at >= NOW() - %s * INTERVAL '1 day' AND status = %s AND NOT result_cache_hit
+                GROUP BY fingerprint_hash
+                HAVING COUNT(*) >= %s
+                ORDER BY SUM(execution_ms) DESC
+            """, (self.config['window_days'], STATUS_OK, self.config['min_calls']))
+            rows = cursor.fetchall()
+
+        proposals: Dict[Tuple[str, frozenset], Dict[str, Any]] = {}
+        for fingerprint, sql, calls, total_ms in rows:
+            # Jurnalda səhifələnmiş SQL saxlanılır; forma daxili sorğuya görə müəyyən edilir
+            match = PAGED_QUERY_RE.match(sql.strip())
+            if match:
+                sql = match.group('sql')
+            query = parse_aggregate_query(sql)
+            if query is None or self.rewrite(sql, require_fresh=False) is not None:
+                continue
+            key = (query.table, frozenset(query.rollup_dimensions()))
+            proposal = proposals.setdefault(key, {"table": query.table, "dimensions": key[1], "measures": set(),
+                                                  "calls": 0, "total_ms": 0.0, "fingerprints": []})
+            proposal["measures"] |= query.rollup_measures()
+            proposal["calls"] += int(calls)
+            proposal["total_ms"] += float(total_ms)
+            proposal["fingerprints"].append(fingerprint)
+        return sorted(proposals.values(), key=lambda p: p["total_ms"], reverse=True)
+
+    def create(self, proposal: Dict[str, Any]) -> Optional[Rollup]:
+        """Namizəd forma üçün rollup cədvəlini yaradıb doldurur; faydasızdırsa, None qaytarır."""
+        from app.db.database import get_db_connection
+
+        dimensions = tuple(sorted(proposal["dimensions"], key=lambda d: (d.column, d.unit or '')))
+        measures = tuple(sorted(proposal["measures"]))
+        rollup = Rollup(Rollup.make_name(proposal["table"], dimensions, measures), proposal["table"],
+                        dimensions, measures)
+        started = time.perf_counter()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)",
+                               (quote_identifier(rollup.table),))
+                row = cursor.fetchone()
+                source_rows = float(row[0]) if row else 0.0
+                if source_rows < self.config['min_source_rows']:
+                    logger.info("%s üçün rollup yaradılmadı: cədvəl kiçikdir (%.0f sətir)", rollup.table, source_rows)
+                    conn.rollback()
+                    return None
+
+                self._ensure_schema(cursor)
+                cursor.execute(f"CREATE TABLE {self._table(rollup.name)} AS {rollup.select_sql()}")
+                rollup.row_count = cursor.rowcount
+                if rollup.row_count > source_rows * self.config['max_rollup_ratio']:
+                    logger.info("%s üçün rollup yaradılmadı: %d sətir, mənbə %.0f", rollup.table,
+                                rollup.row_count, source_rows)
+                    conn.rollback()
+                    return None
+                if dimensions:
+                    cursor.execute(f"CREATE INDEX ON {self._table(rollup.name)} "
+                                   f"({', '.join(quote_identifier(d.name) for d in dimensions)})")
+                rollup.column_types = self._column_types(cursor, self._table(rollup.name))
+                source_types = self._column_types(cursor, quote_identifier(rollup.table))
+                rollup.source_types = {column: source_types[column] for _, column in measures
+                                       if column in source_types}
+                cursor.execute(f"""
+                    INSERT INTO {self._table('rollups')}
+                    (name, source_table, definition, row_count, refreshed_at, full_refreshed_at, last_refresh_ms)
+                    VALUES (%s, %s, %s, %s, NOW(), NOW(), %s)
+                    RETURNING EXTRACT(EPOCH FROM refreshed_at)
+                """, (rollup.name, rollup.table, json.dumps(rollup.definition()), rollup.row_count,
+                      (time.perf_counter() - started) * 1000))
+                rollup.refreshed_at = rollup.full_refreshed_at = float(cursor.fetchone()[0])
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+        with self._lock:
+            self._rollups[rollup.name] = rollup
+            self._counts["created"] += 1
+        logger.info("Rollup yaradıldı: %s (%d sətir, %s)", rollup.name, rollup.row_count, rollup.table)
+        return rollup
+
+    @staticmethod
+    def _column_types(cursor, relation: str) -> Dict[str, str]:
+        cursor.execute("""
+            SELECT attname, format_type(atttypid, NULL)
+            FROM pg_attribute
+            WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+        """, (relation,))
+        return dict(cursor.fetchall())
+
+    def refresh(self, rollup: Rollup, full: bool = False, wait: bool = False) -> Rollup:
+        """Rollup-u yeniləyir: zaman intervalı varsa, son intervaldan başlayaraq (artımlı), yoxsa tam.
+
+        Eyni rollup-u yeniləyən digər proses (başqa worker-in planlaşdırıcısı, CLI) ilə üst-üstə düşməmək
+        üçün tranzaksiya advisory kilidi ilə icra olunur; kilid tutulubsa, wait=False olduqda yeniləmə
+        buraxılır (rollup dəyişmədən qaytarılır), wait=True olduqda kilid gözlənilir.
+        """
+        from app.db.database import get_db_connection, result_cache
+
+        table = self._table(rollup.name)
+        bucket = rollup.incremental_dimension
+        started = time.perf_counter()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            try:
+                lock_key = f"{self.config['schema']}.{rollup.name}"
+                if wait:
+                    cursor.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (lock_key,))
+                else:
+                    cursor.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s))", (lock_key,))
+                    if not cursor.fetchone()[0]:
+                        conn.rollback()
+                        with self._lock:
+                            self._counts["refresh_skipped"] += 1
+                        logger.info("Rollup yenilənməsi buraxıldı: %s başqa proses tərəfindən yenilənir", rollup.name)
+                        return rollup
+                since = None
+                if not full and bucket is not None:
+                    # Son interval yarımçıq ola bilər — o da yenidən hesablanır
+                    cursor.execute(f"SELECT MAX({quote_identifier(bucket.name)}) FROM {table}")
+                    since = cursor.fetchone()[0]
+                if since is None:
+                    full = True
+                    cursor.execute(f"DELETE FROM {table}")
+                    cursor.execute(f"INSERT INTO {table} {rollup.select_sql()}")
+                else:
+                    cursor.execute(f"DELETE FROM {table} WHERE {quote_identifier(bucket.name)} >= %s", (since,))
+                    cursor.execute(f"INSERT INTO {table} {rollup.select_sql(incremental=True)}", {"since": since})
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                row_count = cursor.fetchone()[0]
+                cursor.execute(f"""
+                    UPDATE {self._table('rollups')}
+                    SET row_count = %s, refreshed_at = NOW(), last_refresh_ms = %s,
+                        full_refreshed_at = CASE WHEN %s THEN NOW() ELSE full_refreshed_at END
+                    WHERE name = %s
+                    RETURNING EXTRACT(EPOCH FROM refreshed_at), EXTRACT(EPOCH FROM full_refreshed_at)
+                """, (row_count, (time.perf_counter() - started) * 1000, full, rollup.name))
+                refreshed_at, full_refreshed_at = cursor.fetchone()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                with self._lock:
+                    self._counts["refresh_errors"] += 1
+                raise
+
+        rollup.row_count = int(row_count)
+        rollup.refreshed_at = float(refreshed_at)
+        rollup.full_refreshed_at = float(full_refreshed_at) if full_refreshed_at is not None else None
+        with self._lock:
+            self._counts["refreshes"] += 1
+        # Rollup-dan əvvəl hesablanmış nəticələr köhnəlib
+        result_cache.invalidate_tables([rollup.table])
+        logger.info("Rollup yeniləndi: %s (%s, %d sətir, %.0f ms)", rollup.name, "tam" if full else "artımlı",
+                    rollup.row_count, (time.perf_counter() - started) * 1000)
+        return rollup
+
+    def drop(self, name: str) -> bool:
+        from app.db.database import get_db_connection
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"DROP TABLE IF EXISTS {self._table(name)}")
+            cursor.execute(f"DELETE FROM {self._table('rollups')} WHERE name = %s", (name,))
+            deleted = cursor.rowcount > 0
+            conn.commit()
+        with self._lock:
+            self._rollups.pop(name, None)
+        return deleted
+
+    def maintain(self) -> None:
+        """Planlaşdırıcının bir addımı: lazım olduqda yeni rollup-lar yaradır, vaxtı çatanları yeniləyir."""
+        if self.config['auto_create']:
+            try:
+                for proposal in self.detect():
+                    if len(self._rollups) >= self.config['max_rollups']:
+                        break
+                    self.create(proposal)
+            except Exception as e:
+                logger.warning("Rollup namizədləri yaradıla bilmədi: %s", e)
+
+        now = time.time()
+        for rollup in list(self._rollups.values()):
+            full = (rollup.full_refreshed_at is None
+                    or now - rollup.full_refreshed_at >= self.config['full_refresh_interval'])
+            if rollup.refreshed_at is not None and now - rollup.refreshed_at < self.config['refresh_interval'] \
+                    and not full:
+                continue
+            try:
+                self.refresh(rollup, full=full)
+            except Exception as e:
+                logger.warning("Rollup yenilənə bilmədi (%s): %s", rollup.name, e)
+
+    async def run_scheduler(self) -> None:
+        """Reyestri yükləyir və refresh_interval-da bir maintain() çağırır (fon tapşırığı kimi).
+
+        Reyestr hər addımda yenidən oxunur ki, CLI və ya digər worker-lərin yaratdığı/sildiyi rollup-lar
+        yenidən başlatmadan görünsün.
+        """
+        await asyncio.to_thread(self.load)
+        interval = self.config['refresh_interval']
+        if interval <= 0:
+            return
+        while True:
+            await asyncio.sleep(interval)
+            await asyncio.to_thread(self.load)
+            await asyncio.to_thread(self.maintain)
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            return {
+                "enabled": self.config['enabled'],
+                "rollups": [{
+                    "name": r.name, "source_table": r.table, "dimensions": [d.name for d in r.dimensions],
+                    "row_count": r.row_count,
+                    "age_seconds": round(now - r.refreshed_at, 1) if r.refreshed_at is not None else None,
+                } for r in self._rollups.values()],
+                **self._counts,
+            }
+
+
+preaggregations = PreaggregationManager()
+
+
+def _describe(proposal: Dict[str, Any]) -> str:
+    dimensions = ", ".join(sorted(d.name for d in proposal["dimensions"])) or "-"
+    measures = ", ".join(f"{func}({column})" for func, column in sorted(proposal["measures"])) or "count(*)"
+    return f"{proposal['table']}: [{dimensions}] {measures}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("detect", help="sorğu jurnalında təkrarlanan formalar")
+    create = subparsers.add_parser("create", help="namizəd formalar üçün rollup yaradır")
+    create.add_argument("--top", type=int, default=5)
+    refresh = subparsers.add_parser("refresh", help="rollup-ları yeniləyir")
+    refresh.add_argument("--full", action="store_true")
+    refresh.add_argument("names", nargs="*")
+    subparsers.add_parser("list", help="mövcud rollup-lar")
+    drop = subparsers.add_parser("drop", help="rollup-u silir")
+    drop.add_argument("name")
+    args = parser.parse_args()
+
+    from app.db import chat_database, database
+    database.init_db_pool()
+    chat_database.init_db_pool()
+    preaggregations.load()
+
+    if args.command in ("detect", "create"):
+        proposals = preaggregations.detect()
+        if args.command == "create":
+            proposals = proposals[:args.top]
+        for proposal in proposals:
+            print(f"{proposal['calls']:>6} çağırış {proposal['total_ms']:>12.0f} ms  {_describe(proposal)}")
+            if args.command == "create":
+                rollup = preaggregations.create(proposal)
+                print(f"        -> {rollup.name} ({rollup.row_count} sətir)" if rollup else "        -> yaradılmadı")
+    elif args.command == "refresh":
+        for name, rollup in preaggregations._rollups.items():
+            if not args.names or name in args.names:
+                preaggregations.refresh(rollup, full=args.full, wait=True)
+                print(f"{name}: {rollup.row_count} sətir")
+    elif args.command == "list":
+        print(json.dumps(preaggregations.stats(), ensure_ascii=False, indent=2))
+    elif args.command == "drop":
+        print("silindi" if preaggregations.drop(args.name) else "tapılmadı")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from app.db.database import STATEMENT_TIMEOUT_MS, get_db_connection, rewrite_for_preaggregations
+from app.db.sql_utils import (
+    apply_tablesample, canonicalize_sql, find_function_calls, find_table_references, is_read_only_query,
+    tokenize_sql,
+)
+from app.services.query_registry import cancellable_connection, remaining_ms
+
+logger = logging.getLogger(__name__)
+
+# Qərarlar
+ACTION_ALLOW = 'allow'    # olduğu kimi icra olunur
+ACTION_LIMIT = 'limit'    # çoxlu sətir gözlənilir — LIMIT əlavə olunur
+ACTION_SAMPLE = 'sample'  # baha sorğu — ən böyük cədvəl TABLESAMPLE ilə seçmə rejimində oxunur
+ACTION_REJECT = 'reject'  # icra olunmur
+
+GUARD_CONFIG = {
+    'enabled': os.getenv('QUERY_GUARD_ENABLED', 'true').lower() == 'true',
+    # EXPLAIN-in total_cost qiymətinə görə hədlər
+    'sample_cost': float(os.getenv('QUERY_GUARD_SAMPLE_COST', '1000000')),
+    'reject_cost': float(os.getenv('QUERY_GUARD_REJECT_COST', '10000000')),
+    # Gözlənilən sətir sayı bundan çox olduqda LIMIT əlavə olunur
+    'max_rows': int(os.getenv('QUERY_GUARD_MAX_ROWS', '100000')),
+    'sample_percent': float(os.getenv('QUERY_GUARD_SAMPLE_PERCENT', '1')),
+    'explain_timeout_ms': int(os.getenv('QUERY_GUARD_EXPLAIN_TIMEOUT_MS', '2000')),
+    'decision_cache_ttl': float(os.getenv('QUERY_GUARD_CACHE_TTL', '300')),
+    'decision_cache_size': int(os.getenv('QUERY_GUARD_CACHE_SIZE', '1000')),
+}
+
+# Oxuma tranzaksiyasında da zərərli ola biləcək funksiyalar
+BLOCKED_FUNCTIONS = {
+    'pg_terminate_backend', 'pg_cancel_backend', 'pg_stat_file', 'set_config', 'pg_reload_conf',
+    'pg_rotate_logfile', 'loread', 'lowrite',
+}
+# Bütün ailəsi bloklanan funksiyalar: pg_sleep_for/until, dblink_*, lo_*, başqa SQL mətni icra edən *_to_xml
+BLOCKED_FUNCTION_PREFIXES = (
+    'pg_sleep', 'dblink', 'lo_', 'pg_read_', 'pg_ls_', 'pg_file_', 'query_to_xml', 'cursor_to_xml',
+)
+
+SCAN_NODE_TYPES = {'Seq Scan', 'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan'}
+
+
+class QueryRejectedError(Exception):
+    """Sorğu təhlükəsizlik və ya xərc yoxlamasından keçmədikdə qaldırılır."""
+
+    def __init__(self, message, decision=None):
+        super().__init__(message)
+        self.decision = decision
+
+
+@dataclass
+class GuardDecision:
+    """Sorğu üçün icradan əvvəl verilmiş qərar və onun səbəbi."""
+    action: str
+    sql: str
+    reason: str
+    estimated_rows: Optional[float] = None
+    estimated_cost: Optional[float] = None
+    row_limit: Optional[int] = None
+    sample_percent: Optional[float] = None
+    sampled_tables: List[str] = field(default_factory=list)
+    plan_summary: Optional[Dict[str, Any]] = None
+
+    def effective_limit(self, limit: Optional[int]) -> Optional[int]:
+        """İstifadəçinin limiti ilə qərarın limitindən kiçiyini qaytarır."""
+        limits = [value for value in (limit, self.row_limit) if value is not None]
+        return min(limits) if limits else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        payload = asdict(self)
+        payload['executed_sql'] = payload.pop('sql')
+        return payload
+
+
+def is_blocked_function(name: str) -> bool:
+    """Funksiya (kiçik hərflə, sxemsiz ad) BLOCKED_FUNCTIONS və ya bloklanan ailələrdəndirsə True."""
+    return (name in BLOCKED_FUNCTIONS or name.startswith(BLOCKED_FUNCTION_PREFIXES)
+            or (name.startswith('pg_') and 'advisory' in name))
+
+
+def check_statement(sql: str) -> None:
+    """Yalnız tək, oxuma üçün SELECT/WITH əmrinə icazə verir; əks halda QueryRejectedError qaldırır."""
+    if not is_read_only_query(sql):
+        raise QueryRejectedError("Yalnız tək SELECT/WITH oxuma sorğusuna icazə verilir")
+    if any(kind == 'word' and text.lower() == 'into' for kind, text in tokenize_sql(sql)):
+        raise QueryRejectedError("SELECT ... INTO cədvəl yaradır və icazə verilmir")
+    for name in find_function_calls(sql):
+        if is_blocked_function(name):
+            raise QueryRejectedError(f"'{name}' funksiyasına icazə verilmir")
+
+
+def _scan_nodes(plan: Dict[str, Any]):
+    """Planın bütün cədvəl oxuma düyünlərini (əlaqə adı, gözlənilən sətir) qaytarır."""
+    if plan.get('Node Type') in SCAN_NODE_TYPES and plan.get('Relation Name'):
+        yield plan['Relation Name'], plan.get('Plan Rows', 0)
+    for child in plan.get('Plans', []):
+        yield from _scan_nodes(child)
+
+
+def walk_plan(plan: Dict[str, Any]):
+    """Plan ağacının bütün düyünlərini (kök daxil) qaytarır."""
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from walk_plan(child)
+
+
+def summarize_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """Planın qısa xülasəsi (sorğu jurnalı üçün): kök düyün, xərc, ardıcıl oxunan cədvəllər, sıralamalar."""
+    nodes = list(walk_plan(plan))
+    return {
+        "node_type": plan.get('Node Type'),
+        "total_cost": plan.get('Total Cost'),
+        "plan_rows": plan.get('Plan Rows'),
+        "nodes": len(nodes),
+        "seq_scans": sorted({node['Relation Name'] for node in nodes
+                             if node.get('Node Type') == 'Seq Scan' and node.get('Relation Name')}),
+        "sorts": sum(1 for node in nodes if node.get('Node Type') in ('Sort', 'Incremental Sort')),
+    }
+
+
+def explain_plan(sql: str, timeout_ms: int) -> Dict[str, Any]:
+    """EXPLAIN (FORMAT JSON) ilə sorğunun kök plan düyününü qaytarır (sorğu icra olunmur)."""
+    with get_db_connection() as conn, cancellable_connection(conn):
+        cursor = conn.cursor()
+        cursor.execute("SET TRANSACTION READ ONLY")
+        cursor.execute("SET LOCAL statement_timeout = %s", (remaining_ms(int(timeout_ms)),))
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql.strip().rstrip(';')}")
+        plan = cursor.fetchone()[0]
+        conn.rollback()
+    return plan[0]['Plan']
+
+
+class QueryGuard:
+    """İcradan əvvəl SQL-i yoxlayır: icazə, LIMIT, seçmə (TABLESAMPLE) və ya rədd qərarı verir."""
+
+    def __init__(self, config=None, explain=explain_plan):
+        self.config = dict(GUARD_CONFIG, **(config or {}))
+        self._explain = explain
+        self._decisions = OrderedDict()  # (kanonik SQL, limit) -> (qərar, vaxt)
+        self._lock = threading.Lock()
+        self._counts = {ACTION_ALLOW: 0, ACTION_LIMIT: 0, ACTION_SAMPLE: 0, ACTION_REJECT: 0}
+
+    def evaluate(self, sql: str, limit: Optional[int] = None) -> GuardDecision:
+        """Sorğu üçün qərar qaytarır; rədd edildikdə QueryRejectedError qaldırır.
+
+        EXPLAIN-də SQL xətası olarsa, psycopg2 istisnası olduğu kimi ötürülür.
+        """
+        check_statement(sql)
+        if not self.config['enabled']:
+            return self._record(GuardDecision(ACTION_ALLOW, sql, "Yoxlama söndürülüb"))
+
+        key = (canonicalize_sql(sql), limit)
+        cached = self._cached(key)
+        if cached is not None:
+            return self._record(cached)
+
+        decision = self._decide(sql, limit)
+        with self._lock:
+            self._decisions[key] = (decision, time.monotonic())
+            self._decisions.move_to_end(key)
+            while len(self._decisions) > self.config['decision_cache_size']:
+                self._decisions.popitem(last=False)
+        return self._record(decision)
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._decisions.get(key)
+            if entry is None:
+                return None
+            decision, created = entry
+            if time.monotonic() - created > self.config['decision_cache_ttl']:
+                del self._decisions[key]
+                return None
+            self._decisions.move_to_end(key)
+            return decision
+
+    def _record(self, decision):
+        with self._lock:
+            self._counts[decision.action] += 1
+        if decision.action == ACTION_REJECT:
+            raise QueryRejectedError(decision.reason, decision)
+        return decision
+
+    def _decide(self, sql: str, limit: Optional[int]) -> GuardDecision:
+        cfg = self.config
+        # Rollup-dan cavablandırılacaq sorğunun xərci yenidən yazılmış SQL-ə görə qiymətləndirilir
+        rewrite = rewrite_for_preaggregations(sql)
+        plan = self._explain(rewrite[0] if rewrite else sql, cfg['explain_timeout_ms'])
+        rows = float(plan.get('Plan Rows', 0))
+        cost = float(plan.get('Total Cost', 0))
+
+        if cost > cfg['sample_cost']:
+            sampled = self._sample(sql, plan, cost)
+            if sampled is not None:
+                return sampled
+            if cost > cfg['reject_cost']:
+                return GuardDecision(
+                    ACTION_REJECT, sql,
+                    f"Sorğu çox bahadır (təxmini xərc {cost:,.0f} > {cfg['reject_cost']:,.0f})",
+                    estimated_rows=rows, estimated_cost=cost, plan_summary=summarize_plan(plan),
+                )
+
+        if rows > cfg['max_rows'] and (limit is None or limit > cfg['max_rows']):
+            return GuardDecision(
+                ACTION_LIMIT, sql,
+                f"Təxminən {rows:,.0f} sətir gözlənilir — ilk {cfg['max_rows']} sətir qaytarılır",
+                estimated_rows=rows, estimated_cost=cost, row_limit=cfg['max_rows'],
+                plan_summary=summarize_plan(plan),
+            )
+        return GuardDecision(ACTION_ALLOW, sql, "Hədlər daxilində",
+                             estimated_rows=rows, estimated_cost=cost, plan_summary=summarize_plan(plan))
+
+    def _sample(self, sql: str, plan: Dict[str, Any], cost: float) -> Optional[GuardDecision]:
+        """Ən çox sətir oxunan cədvəli TABLESAMPLE ilə oxuyan variantı yoxlayır."""
+        cfg = self.config
+        scans = sorted(_scan_nodes(plan), key=lambda node: node[1], reverse=True)
+        referenced = {name for name, _ in find_table_references(sql)}
+        target = next((name for name, _ in scans if name in referenced), None)
+        if target is None:
+            return None
+
+        sampled_sql = apply_tablesample(sql, cfg['sample_percent'], {target})
+        try:
+            # TABLESAMPLE view-lar üçün işləmir — o halda seçmə rejimi mümkün deyil
+            sampled_plan = self._explain(sampled_sql, cfg['explain_timeout_ms'])
+        except Exception as e:
+            logger.info("Seçmə rejimi mümkün olmadı: %s", e)
+            return None
+
+        sampled_cost = float(sampled_plan.get('Total Cost', 0))
+        if sampled_cost > cfg['reject_cost']:
+            return None
+        sampled_rows = float(sampled_plan.get('Plan Rows', 0))
+        return GuardDecision(
+            ACTION_SAMPLE, sampled_sql,
+            f"Sorğu bahadır (təxmini xərc {cost:,.0f}) — '{target}' cədvəlinin "
+            f"{cfg['sample_percent']:g}%-i üzərində təxmini nəticə qaytarılır",
+            estimated_rows=sampled_rows, estimated_cost=sampled_cost,
+            row_limit=cfg['max_rows'] if sampled_rows > cfg['max_rows'] else None,
+            sample_percent=cfg['sample_percent'], sampled_tables=[target],
+            plan_summary=summarize_plan(sampled_plan),
+        )
+
+    def clear(self):
+        with self._lock:
+            self._decisions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": self.config['enabled'],
+                "decisions": dict(self._counts),
+                "cached_decisions": len(self._decisions),
+                "statement_timeout_ms": STATEMENT_TIMEOUT_MS,
+            }
+
+
+query_guard = QueryGuard()
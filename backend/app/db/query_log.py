@@ -0,0 +1,126 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+
+import psycopg2.extras
+
+from app.db.chat_database import get_db_connection
+from app.db.sql_utils import extract_tables, fingerprint_sql
+from app.services.query_registry import current_query
+
+logger = logging.getLogger(__name__)
+
+# Sorğu jurnalının parametrləri
+QUERY_LOG_CONFIG = {
+    'enabled': os.getenv('QUERY_LOG_ENABLED', 'true').lower() == 'true',
+    # Yazılar partiyalarla, fon axınında bazaya köçürülür
+    'batch_size': int(os.getenv('QUERY_LOG_BATCH_SIZE', '100')),
+    'flush_interval': float(os.getenv('QUERY_LOG_FLUSH_INTERVAL', '2')),
+    # Baza əlçatan olmadıqda yaddaşda saxlanılan ən çox yazı (artığı atılır)
+    'max_pending': int(os.getenv('QUERY_LOG_MAX_PENDING', '10000')),
+}
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+
+
+def fingerprint_hash(fingerprint: str) -> str:
+    return hashlib.md5(fingerprint.encode('utf-8')).hexdigest()
+
+
+class QueryLog:
+    """/api/query icralarını query_log cədvəlinə yazır (cavabın kritik yolundan kənarda).
+
+    record() yalnız yazını növbəyə əlavə edir; fingerprint, cədvəllər və INSERT fon axınında hesablanır.
+    """
+
+    def __init__(self, config=None):
+        self.config = dict(QUERY_LOG_CONFIG, **(config or {}))
+        self._pending = deque()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._counts = {"recorded": 0, "written": 0, "dropped": 0, "failed_flushes": 0}
+
+    def record(self, sql: str, row_count: Optional[int], duration_ms: float,
+               plan_summary: Optional[Dict[str, Any]] = None, result_cache_hit: bool = False,
+               status: str = STATUS_OK, request_id: Optional[str] = None) -> None:
+        """Bir icranı jurnala əlavə edir; request_id verilməsə, cari sorğunun id-si götürülür."""
+        if not self.config['enabled']:
+            return
+        if request_id is None:
+            ctx = current_query.get()
+            request_id = ctx.request_id if ctx is not None else None
+        entry = (sql, row_count, round(duration_ms, 3), plan_summary, result_cache_hit, status, request_id,
+                 datetime.datetime.now(datetime.timezone.utc))
+        with self._lock:
+            if len(self._pending) >= self.config['max_pending']:
+                self._pending.popleft()
+                self._counts["dropped"] += 1
+            self._pending.append(entry)
+            self._counts["recorded"] += 1
+            pending = len(self._pending)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-log", daemon=True)
+                self._thread.start()
+        if pending >= self.config['batch_size']:
+            self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.config['flush_interval'])
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self) -> int:
+        """Növbədəki yazıları bir INSERT ilə bazaya yazır; yazılan sətir sayını qaytarır."""
+        with self._lock:
+            entries = list(self._pending)
+            self._pending.clear()
+        if not entries:
+            return 0
+
+        rows = []
+        for sql, row_count, duration_ms, plan_summary, cache_hit, status, request_id, executed_at in entries:
+            fingerprint = fingerprint_sql(sql)
+            rows.append((
+                fingerprint_hash(fingerprint), fingerprint, sql, sorted(t.lower() for t in extract_tables(sql)),
+                row_count, duration_ms, cache_hit, status,
+                json.dumps(plan_summary) if plan_summary is not None else None, request_id, executed_at,
+            ))
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                psycopg2.extras.execute_values(cursor, """
+                    INSERT INTO query_log
+                    (fingerprint_hash, fingerprint, executed_sql, tables, row_count, execution_ms,
+                     result_cache_hit, status, plan_summary, request_id, executed_at)
+                    VALUES %s
+                """, rows)
+                conn.commit()
+        except Exception as e:
+            logger.warning("Sorğu jurnalı yazıla bilmədi: %s", e)
+            with self._lock:
+                self._counts["failed_flushes"] += 1
+                # Yazılar geri qaytarılır ki, baza əlçatan olanda itməsin
+                room = self.config['max_pending'] - len(self._pending)
+                kept = entries[-room:] if room > 0 else []
+                self._counts["dropped"] += len(entries) - len(kept)
+                self._pending.extendleft(reversed(kept))
+            return 0
+
+        with self._lock:
+            self._counts["written"] += len(rows)
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"enabled": self.config['enabled'], "pending": len(self._pending), **self._counts}
+
+
+query_log = QueryLog()
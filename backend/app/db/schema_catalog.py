@@ -0,0 +1,202 @@
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from app.db.database import get_db_connection
+
+logger = logging.getLogger(__name__)
+
+
+# Bütün sütunları bir sorğu ilə alırıq (cədvəl başına ayrıca sorğu əvəzinə)
+COLUMNS_QUERY = """
+    SELECT c.table_name, c.column_name, c.data_type, c.is_nullable, c.column_default,
+           col_description(format('%I.%I', c.table_schema, c.table_name)::regclass, c.ordinal_position),
+           obj_description(format('%I.%I', c.table_schema, c.table_name)::regclass, 'pg_class')
+    FROM information_schema.columns c
+    JOIN information_schema.tables t
+      ON t.table_schema = c.table_schema AND t.table_name = c.table_name
+    WHERE c.table_schema = 'public'
+      AND t.table_type = 'BASE TABLE'
+    ORDER BY c.table_name, c.ordinal_position;
+"""
+
+# Primary və foreign key-lər
+CONSTRAINTS_QUERY = """
+    SELECT con.contype, rel.relname, att.attname, frel.relname, fatt.attname
+    FROM pg_constraint con
+    JOIN pg_class rel ON rel.oid = con.conrelid
+    JOIN pg_namespace n ON n.oid = rel.relnamespace
+    CROSS JOIN LATERAL unnest(con.conkey, con.confkey) AS k(attnum, fattnum)
+    JOIN pg_attribute att ON att.attrelid = con.conrelid AND att.attnum = k.attnum
+    LEFT JOIN pg_class frel ON frel.oid = con.confrelid
+    LEFT JOIN pg_attribute fatt ON fatt.attrelid = con.confrelid AND fatt.attnum = k.fattnum
+    WHERE n.nspname = 'public'
+      AND con.contype IN ('p', 'f');
+"""
+
+# Sxem dəyişikliklərini aşkar etmək üçün ucuz DDL "barmaq izi"
+FINGERPRINT_QUERY = """
+    SELECT md5(
+        coalesce((
+            SELECT string_agg(
+                c.oid::text || ':' || c.relname || ':' || a.attnum || ':' || a.attname || ':' ||
+                a.atttypid::text || ':' || a.attnotnull::text,
+                ',' ORDER BY c.oid, a.attnum)
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = c.oid AND a.attnum > 0 AND NOT a.attisdropped
+            WHERE n.nspname = 'public' AND c.relkind IN ('r', 'p')
+        ), '') || '|' ||
+        coalesce((
+            SELECT string_agg(con.oid::text || ':' || con.contype, ',' ORDER BY con.oid)
+            FROM pg_constraint con
+            JOIN pg_namespace n ON n.oid = con.connamespace
+            WHERE n.nspname = 'public' AND con.contype IN ('p', 'f')
+        ), '')
+    );
+"""
+
+
+@dataclass
+class ColumnInfo:
+    name: str
+    data_type: str
+    is_nullable: str
+    default: Optional[str]
+    is_primary_key: bool = False
+    references: Optional[str] = None  # "cədvəl.sütun"
+    comment: Optional[str] = None
+
+
+@dataclass
+class TableInfo:
+    name: str
+    columns: List[ColumnInfo] = field(default_factory=list)
+    comment: Optional[str] = None
+
+    @property
+    def primary_key(self) -> List[str]:
+        return [col.name for col in self.columns if col.is_primary_key]
+
+    @property
+    def foreign_keys(self) -> Dict[str, str]:
+        return {col.name: col.references for col in self.columns if col.references}
+
+
+@dataclass
+class SchemaSnapshot:
+    """Sxemin müəyyən bir versiyasının strukturlaşdırılmış modeli."""
+    fingerprint: str
+    tables: Dict[str, TableInfo]
+    loaded_at: float
+    prompt_text: str = ""
+
+    @property
+    def table_names(self) -> List[str]:
+        return sorted(self.tables)
+
+
+def render_schema_text(tables: Dict[str, TableInfo]) -> str:
+    """Strukturlaşdırılmış sxemi LLM prompt-u üçün mətnə çevirir."""
+    parts = []
+    for table in tables.values():
+        parts.append(f"\nTable: {table.name}\n")
+        if table.comment:
+            parts.append(f"Comment: {table.comment}\n")
+        parts.append("-" * 50 + "\n")
+        for col in table.columns:
+            line = f"  {col.name} | {col.data_type} | Nullable: {col.is_nullable} | Default: {col.default}"
+            if col.is_primary_key:
+                line += " | PK"
+            if col.references:
+                line += f" | FK -> {col.references}"
+            if col.comment:
+                line += f" | Comment: {col.comment}"
+            parts.append(line + "\n")
+        parts.append("\n")
+    return "".join(parts)
+
+
+class SchemaCatalog:
+    """'retail banking' bazasının sxemini yaddaşda saxlayır və lazım olduqda yeniləyir."""
+
+    def __init__(self, ttl: float = 300.0, check_interval: float = 30.0):
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self._snapshot: Optional[SchemaSnapshot] = None
+        self._last_checked = 0.0
+        self._lock = threading.Lock()
+
+    def _fetch_fingerprint(self, cursor) -> str:
+        cursor.execute(FINGERPRINT_QUERY)
+        return cursor.fetchone()[0]
+
+    def _load(self) -> SchemaSnapshot:
+        """Sxemi bazadan sabit sayda sorğu ilə yükləyir."""
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            fingerprint = self._fetch_fingerprint(cursor)
+
+            cursor.execute(COLUMNS_QUERY)
+            column_rows = cursor.fetchall()
+
+            cursor.execute(CONSTRAINTS_QUERY)
+            constraint_rows = cursor.fetchall()
+
+        tables: Dict[str, TableInfo] = {}
+        for table_name, column_name, data_type, is_nullable, default, comment, table_comment in column_rows:
+            table = tables.setdefault(table_name, TableInfo(name=table_name, comment=table_comment))
+            table.columns.append(ColumnInfo(column_name, data_type, is_nullable, default, comment=comment))
+
+        for contype, table_name, column_name, ref_table, ref_column in constraint_rows:
+            table = tables.get(table_name)
+            if not table:
+                continue
+            for col in table.columns:
+                if col.name != column_name:
+                    continue
+                if contype == 'p':
+                    col.is_primary_key = True
+                else:
+                    col.references = f"{ref_table}.{ref_column}"
+
+        snapshot = SchemaSnapshot(fingerprint=fingerprint, tables=tables, loaded_at=time.time())
+        snapshot.prompt_text = render_schema_text(tables)
+        logger.info("Sxem alındı: %d cədvəl", len(tables))
+        return snapshot
+
+    def _needs_refresh(self, now: float) -> bool:
+        """TTL bitibsə və ya DDL barmaq izi dəyişibsə True qaytarır."""
+        if self._snapshot is None or now - self._snapshot.loaded_at >= self.ttl:
+            return True
+        if now - self._last_checked < self.check_interval:
+            return False
+        self._last_checked = now
+        with get_db_connection() as conn:
+            fingerprint = self._fetch_fingerprint(conn.cursor())
+        return fingerprint != self._snapshot.fingerprint
+
+    def get_snapshot(self, force_refresh: bool = False) -> Optional[SchemaSnapshot]:
+        """Aktual sxemi qaytarır; yeniləmə alınmasa köhnə versiyanı saxlayır."""
+        with self._lock:
+            try:
+                if force_refresh or self._needs_refresh(time.time()):
+                    self._snapshot = self._load()
+                    self._last_checked = time.time()
+            except Exception as e:
+                logger.exception("Sxem alınarkən xəta baş verdi: %s", e)
+            return self._snapshot
+
+    def invalidate(self):
+        """Növbəti sorğuda sxemin yenidən yüklənməsini təmin edir."""
+        with self._lock:
+            self._snapshot = None
+
+
+schema_catalog = SchemaCatalog(
+    ttl=float(os.getenv('SCHEMA_CACHE_TTL', '300')),
+    check_interval=float(os.getenv('SCHEMA_FINGERPRINT_CHECK_INTERVAL', '30')),
+)
@@ -0,0 +1,314 @@
+import re
+from typing import List, Optional, Set, Tuple
+
+# Sadə SQL tokenizatoru: şərhlər, sətir literalları, dırnaqlı identifikatorlar, ədədlər, sözlər, simvollar
+TOKEN_RE = re.compile(r"""
+    (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>[eE]?'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+(?:[eE][+-]?\d+)?)
+  | (?P<param>\$\d+)
+  | (?P<word>[A-Za-z_À-￿][A-Za-z0-9_$À-￿]*)
+  | (?P<op>::|<=|>=|<>|!=|\|\||[^\sA-Za-z0-9_])
+""", re.VERBOSE | re.DOTALL)
+
+# FROM siyahısını bitirən açar sözlər
+CLAUSE_KEYWORDS = {
+    'where', 'group', 'order', 'having', 'limit', 'offset', 'union', 'intersect',
+    'except', 'window', 'fetch', 'for', 'on', 'using', 'join', 'inner', 'left', 'right',
+    'full', 'cross', 'natural', 'returning', 'tablesample',
+}
+
+
+# Oxuma sorğusu yalnız bu açar sözlərlə başlaya bilər
+READ_ONLY_STATEMENTS = ('select', 'with')
+# WITH ... AS (...) daxilində icazə verilən əmrlər (INSERT/UPDATE/DELETE ... RETURNING istisna)
+CTE_BODY_STATEMENTS = {'select', 'with', 'values', 'table'}
+# WITH siyahısından sonra gələ bilən əsas əmr
+MAIN_STATEMENTS = {'select', 'values', 'table', '('}
+# CTE-nin SEARCH/CYCLE hissəsini bitirən tokenlər (əsas əmrin başlanğıcı)
+STATEMENT_KEYWORDS = MAIN_STATEMENTS | {'insert', 'update', 'delete', 'merge'}
+
+
+# Arqumentlərində FROM açar sözü işlənən funksiyalar
+FROM_FUNCTIONS = {'extract', 'substring', 'trim', 'overlay', 'position'}
+
+
+def tokenize_sql_with_offsets(sql: str) -> List[Tuple[str, str, int, int]]:
+    """SQL-i (növ, mətn, başlanğıc, son) tokenlərinə bölür; şərhlər atılır."""
+    tokens = []
+    for match in TOKEN_RE.finditer(sql or ""):
+        kind = match.lastgroup
+        if kind == 'comment':
+            continue
+        tokens.append((kind, match.group(), match.start(), match.end()))
+    return tokens
+
+
+def tokenize_sql(sql: str) -> List[Tuple[str, str]]:
+    """SQL-i (növ, mətn) cütlərinə bölür; şərhlər atılır."""
+    return [(kind, text) for kind, text, _, _ in tokenize_sql_with_offsets(sql)]
+
+
+def _closing_paren(tokens: List[Tuple[str, str]], i: int) -> int:
+    """tokens[i] '(' üçün uyğun ')' indeksini qaytarır (bağlanmayıbsa, len(tokens))."""
+    depth = 0
+    for j in range(i, len(tokens)):
+        if tokens[j][1] == '(':
+            depth += 1
+        elif tokens[j][1] == ')':
+            depth -= 1
+            if depth == 0:
+                return j
+    return len(tokens)
+
+
+def _is_read_only_statement(tokens: List[Tuple[str, str]], statements) -> bool:
+    """Tokenlər (kiçik hərflə) oxuma əmridirsə True: WITH-in hər CTE gövdəsi və əsas əmri də yoxlanılır."""
+    while tokens and tokens[0][1] == '(' and _closing_paren(tokens, 0) == len(tokens) - 1:
+        tokens = tokens[1:-1]
+    if not tokens or tokens[0][1] not in statements:
+        return False
+    if tokens[0][1] != 'with':
+        return True
+    i = 2 if len(tokens) > 1 and tokens[1][1] == 'recursive' else 1
+    while i < len(tokens):
+        # ad [(sütunlar)] AS [NOT] [MATERIALIZED] (gövdə) [SEARCH ... | CYCLE ...]
+        i += 1
+        if i < len(tokens) and tokens[i][1] == '(':
+            i = _closing_paren(tokens, i) + 1
+        if i >= len(tokens) or tokens[i][1] != 'as':
+            return False
+        i += 1
+        while i < len(tokens) and tokens[i][1] in ('not', 'materialized'):
+            i += 1
+        if i >= len(tokens) or tokens[i][1] != '(':
+            return False
+        close = _closing_paren(tokens, i)
+        if not _is_read_only_statement(tokens[i + 1:close], CTE_BODY_STATEMENTS):
+            return False
+        i = close + 1
+        while i < len(tokens) and tokens[i][1] != ',' and tokens[i][1] not in STATEMENT_KEYWORDS:
+            i += 1
+        if i < len(tokens) and tokens[i][1] == ',':
+            i += 1
+            continue
+        # CTE siyahısından sonrakı əsas əmr
+        return i < len(tokens) and tokens[i][1] in MAIN_STATEMENTS
+    return False
+
+
+def is_read_only_query(sql: str) -> bool:
+    """Sorğu tək SELECT/WITH əmridirsə True qaytarır.
+
+    Yalnız əmrin başlanğıc açar sözü, WITH-in CTE gövdələri və CTE siyahısından sonrakı əsas əmr
+    yoxlanılır — sütun və alias adları (comment, set, lock, ...) nəticəyə təsir etmir. Sorğular
+    həmçinin READ ONLY tranzaksiyada icra olunur.
+    """
+    tokens = [(kind, text.lower()) for kind, text in tokenize_sql(sql)]
+    while tokens and tokens[-1][1] == ';':
+        tokens.pop()
+    if any(kind == 'op' and text == ';' for kind, text in tokens):
+        return False
+    return _is_read_only_statement(tokens, READ_ONLY_STATEMENTS)
+
+
+def _normalize_number(text: str) -> str:
+    """Ədədi literalın yazılışını normallaşdırır (10.50 -> 10.5, 007 -> 7)."""
+    if 'e' in text.lower():
+        return text.lower()
+    if '.' in text:
+        whole, frac = text.split('.', 1)
+        whole = whole.lstrip('0') or '0'
+        frac = frac.rstrip('0') or '0'
+        return f"{whole}.{frac}"
+    return text.lstrip('0') or '0'
+
+
+def _join_tokens(parts: List[str]) -> str:
+    text = " ".join(parts)
+    text = re.sub(r"\s*([(),;])\s*", r"\1", text)
+    text = re.sub(r"\s*(::|\.)\s*", r"\1", text)
+    return text
+
+
+def canonicalize_sql(sql: str) -> str:
+    """SQL-in kanonik formasını qaytarır: şərhlər, boşluqlar, registr və ədəd yazılışı normallaşdırılır.
+
+    Sətir literalları və dırnaqlı identifikatorlar olduğu kimi saxlanılır.
+    """
+    parts = []
+    for kind, text in tokenize_sql(sql):
+        if kind in ('string', 'quoted'):
+            parts.append(text)
+        elif kind == 'number':
+            parts.append(_normalize_number(text))
+        else:
+            parts.append(text.lower())
+    while parts and parts[-1] == ';':
+        parts.pop()
+    return _join_tokens(parts)
+
+
+def fingerprint_sql(sql: str) -> str:
+    """Literalları '?' ilə əvəz edilmiş kanonik SQL (eyni formalı sorğuları qruplaşdırmaq üçün)."""
+    parts = []
+    for kind, text in tokenize_sql(sql):
+        if kind in ('string', 'number', 'param'):
+            parts.append('?')
+        elif kind == 'quoted':
+            parts.append(text)
+        else:
+            parts.append(text.lower())
+    while parts and parts[-1] == ';':
+        parts.pop()
+    text = _join_tokens(parts)
+    # IN (?, ?, ?) siyahılarını bir formaya salırıq
+    return re.sub(r"\(\?(?:,\?)+\)", "(?+)", text)
+
+
+def _identifier(kind: str, text: str) -> str:
+    if kind == 'quoted':
+        return text[1:-1].replace('""', '"')
+    return text.lower()
+
+
+def extract_cte_names(tokens: List[Tuple]) -> Set[str]:
+    """WITH blokunda təyin olunmuş CTE adlarını tapır ('ad AS (' və ya 'ad (sütunlar) AS (')."""
+    names = set()
+    for i, (kind, text, *_) in enumerate(tokens):
+        if kind not in ('word', 'quoted'):
+            continue
+        j = i + 1
+        if j < len(tokens) and tokens[j][1] == '(' and kind == 'word':
+            # Sütun siyahısını keçirik: ad (a, b) AS (
+            depth = 0
+            while j < len(tokens):
+                if tokens[j][1] == '(':
+                    depth += 1
+                elif tokens[j][1] == ')':
+                    depth -= 1
+                    if depth == 0:
+                        j += 1
+                        break
+                j += 1
+        if (j + 1 < len(tokens) and tokens[j][1].lower() == 'as' and tokens[j + 1][1] == '('
+                and (i == 0 or tokens[i - 1][1].lower() in ('with', 'recursive', ','))):
+            names.add(_identifier(kind, text))
+    return names
+
+
+def find_function_calls(sql: str) -> List[str]:
+    """Çağırılan funksiyaların adlarını (kiçik hərflə, sxemsiz) qaytarır.
+
+    Dırnaqlı ("pg_sleep"(1)) və sxemli (pg_catalog."pg_sleep"(1)) formalar da tanınır; U&"..."
+    identifikatorlarının \\XXXX və \\+XXXXXX escape-ləri açılır.
+    """
+    tokens = tokenize_sql_with_offsets(sql)
+    names = []
+    for i, (kind, text, start, _) in enumerate(tokens):
+        if kind not in ('word', 'quoted') or i + 1 >= len(tokens) or tokens[i + 1][1] != '(':
+            continue
+        name = _identifier(kind, text)
+        if (kind == 'quoted' and i >= 2 and tokens[i - 1][1] == '&' and tokens[i - 1][3] == start
+                and tokens[i - 2][1].lower() == 'u' and tokens[i - 2][3] == tokens[i - 1][2]):
+            name = re.sub(r"\\(\\|[0-9A-Fa-f]{4}|\+[0-9A-Fa-f]{6})",
+                          lambda m: '\\' if m.group(1) == '\\' else chr(int(m.group(1).lstrip('+'), 16)),
+                          name)
+        names.append(name.lower())
+    return names
+
+
+def find_table_references(sql: str) -> List[Tuple[str, int]]:
+    """FROM/JOIN-dəki baza cədvəli istinadlarını (ad, alias-dan sonrakı simvol mövqeyi) siyahısı kimi qaytarır.
+
+    CTE-lər, alt sorğular və funksiya çağırışları daxil edilmir.
+    """
+    tokens = tokenize_sql_with_offsets(sql)
+    ctes = extract_cte_names(tokens)
+    references = []
+
+    def read_table(pos: int) -> int:
+        """pos mövqeyindən bir FROM elementi oxuyur və elementdən sonrakı mövqeyi qaytarır."""
+        while pos < len(tokens) and tokens[pos][1].lower() in ('lateral', 'only'):
+            pos += 1
+        if pos >= len(tokens):
+            return pos
+        kind, text = tokens[pos][:2]
+        if text == '(' or kind not in ('word', 'quoted'):
+            return pos
+        # Funksiya çağırışı (generate_series(...)) cədvəl deyil
+        name_parts = [_identifier(kind, text)]
+        pos += 1
+        while pos + 1 < len(tokens) and tokens[pos][1] == '.' and tokens[pos + 1][0] in ('word', 'quoted'):
+            name_parts.append(_identifier(*tokens[pos + 1][:2]))
+            pos += 2
+        if pos < len(tokens) and tokens[pos][1] == '(':
+            return pos
+        name = name_parts[-1]
+        if len(name_parts) == 1 and name in ctes:
+            return pos
+        # Alias: "cədvəl AS a" və ya "cədvəl a"
+        end = tokens[pos - 1][3]
+        if pos + 1 < len(tokens) and tokens[pos][1].lower() == 'as' and tokens[pos + 1][0] in ('word', 'quoted'):
+            end = tokens[pos + 1][3]
+            pos += 2
+        elif (pos < len(tokens) and tokens[pos][0] in ('word', 'quoted')
+              and tokens[pos][1].lower() not in CLAUSE_KEYWORDS):
+            end = tokens[pos][3]
+            pos += 1
+        references.append((name, end))
+        return pos
+
+    depth = 0
+    from_depths = []  # FROM siyahısının aktiv olduğu mötərizə dərinlikləri
+    paren_owners = []  # hər açıq mötərizədən əvvəlki söz (funksiya adı)
+    i = 0
+    while i < len(tokens):
+        kind, text = tokens[i][:2]
+        lower = text.lower()
+        if text == '(':
+            depth += 1
+            paren_owners.append(tokens[i - 1][1].lower() if i and tokens[i - 1][0] == 'word' else '')
+        elif text == ')':
+            if from_depths and from_depths[-1] == depth:
+                from_depths.pop()
+            depth -= 1
+            if paren_owners:
+                paren_owners.pop()
+        elif kind == 'word' and lower == 'from' and (
+                (paren_owners and paren_owners[-1] in FROM_FUNCTIONS)
+                or (i and tokens[i - 1][1].lower() == 'distinct')):
+            # EXTRACT(YEAR FROM x), SUBSTRING(x FROM 1), IS DISTINCT FROM — cədvəl deyil
+            pass
+        elif kind == 'word' and lower in ('from', 'join'):
+            if lower == 'from':
+                from_depths.append(depth)
+            i = read_table(i + 1)
+            continue
+        elif kind == 'word' and lower in CLAUSE_KEYWORDS and from_depths and from_depths[-1] == depth:
+            from_depths.pop()
+        elif text == ',' and from_depths and from_depths[-1] == depth:
+            i = read_table(i + 1)
+            continue
+        i += 1
+    return references
+
+
+def extract_tables(sql: str) -> Set[str]:
+    """Sorğunun oxuduğu baza cədvəllərinin adlarını qaytarır (CTE-lər və alt sorğular çıxılmaqla)."""
+    return {name for name, _ in find_table_references(sql)}
+
+
+def apply_tablesample(sql: str, percent: float, tables: Optional[Set[str]] = None) -> str:
+    """Verilmiş (və ya bütün) baza cədvəllərinə TABLESAMPLE SYSTEM (percent) əlavə edir."""
+    clause = f" TABLESAMPLE SYSTEM ({float(percent):g})"
+    rewritten = sql
+    # Sondan əvvələ doğru əlavə edirik ki, əvvəlki mövqelər dəyişməsin
+    for name, end in sorted(find_table_references(sql), key=lambda ref: ref[1], reverse=True):
+        if tables is not None and name not in tables:
+            continue
+        if rewritten[end:].lstrip().lower().startswith('tablesample'):
+            continue
+        rewritten = rewritten[:end] + clause + rewritten[end:]
+    return rewritten
@@ -1,12 +1,83 @@
-from fastapi import FastAPI
+import asyncio
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+
+_STARTED = time.perf_counter()
+
+from dotenv import load_dotenv
+
+# Mühit dəyişənləri modullar öz konfiqurasiyalarını oxumazdan əvvəl yüklənir
+load_dotenv(dotenv_path='.env')
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from app.api import endpoints
 from app.api.chat_endpoints import router as chat_router
+from app.db import database, chat_database
+from app.db.pool import close_all_pools
+from app.db.query_guard import check_statement, explain_plan, query_guard
+from app.db.query_log import query_log
+from app.db.schema_catalog import schema_catalog
+from app.services import metrics
+from app.services.logging_config import configure_logging
+from app.services.sql_cache import nl_sql_cache
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+
+def _sql_still_valid(sql):
+    """Tarixçədəki SQL cari sxemdə hələ də keçərlidirmi (oxuma yoxlaması və EXPLAIN)."""
+    try:
+        check_statement(sql)
+        explain_plan(sql, query_guard.config['explain_timeout_ms'])
+        return True
+    except Exception:
+        return False
+
+
+def warm_nl_sql_cache():
+    """NL->SQL keşini chat tarixçəsindəki uğurlu sorğularla əvvəlcədən doldurur."""
+    snapshot = schema_catalog.get_snapshot()
+    if snapshot:
+        nl_sql_cache.warm_from_history(snapshot.fingerprint, _sql_still_valid)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Başlanğıcda əlaqə hovuzlarını yaradır, dayandırılarkən bağlayır.
+
+    Gemini klienti və pandas ilk sorğuda yüklənir; keşin doldurulması və
+    rollup reyestrinin yüklənməsi (yeniləmə planlaşdırıcısı ilə) başlanğıcı gözlətməmək üçün fonda aparılır.
+    """
+    database.init_db_pool()
+    chat_database.get_chat_db()
+    warm_task = None
+    if os.getenv('NL_SQL_CACHE_WARM', 'true').lower() == 'true':
+        warm_task = asyncio.create_task(asyncio.to_thread(warm_nl_sql_cache))
+    from app.db.preaggregations import preaggregations  # import zamanı yüklənmir
+    preagg_task = asyncio.create_task(preaggregations.run_scheduler())
+    app.state.startup_seconds = time.perf_counter() - _STARTED
+    logger.info("Tətbiq %.0f ms-də başladı", app.state.startup_seconds * 1000)
+    try:
+        yield
+    finally:
+        if warm_task is not None and not warm_task.done():
+            warm_task.cancel()
+        preagg_task.cancel()
+        # Növbədə qalan sorğu jurnalı yazıları hovuzlar bağlanmazdan əvvəl yazılır
+        await asyncio.to_thread(query_log.flush)
+        close_all_pools()
+
 
 app = FastAPI(
     title="Data Analizi API",
     description="Azərbaycan dilində sorğuları SQL-ə çevirən və nəticələri qaytaran API",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS konfiqurasiyası
@@ -15,12 +86,40 @@ app.add_middleware(
     allow_origins=["http://localhost:5173"], # Frontend URL-i
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Generated-SQL", "X-SQL-Cache-Hit", "X-Row-Count", "X-Result-Cache", "X-Result-Cache-Age",
+                    "X-Next-Cursor", "X-Message-Id", "X-Query-Guard", "X-Preaggregation",
+                    "X-Request-Id", "Server-Timing"],
 )
 
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """Sorğunun müddətini histoqrama yazır və mərhələ müddətlərini Server-Timing başlığında qaytarır."""
+    timings = metrics.RequestTimings()
+    token = metrics.current_timings.set(timings)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        response.headers["Server-Timing"] = timings.header_value()
+        return response
+    finally:
+        metrics.current_timings.reset(token)
+        # Kardinallığı məhdud saxlamaq üçün konkret yol əvəzinə marşrut şablonu istifadə olunur
+        route = request.scope.get("route")
+        metrics.http_request_seconds.observe(
+            time.perf_counter() - timings.started, method=request.method,
+            route=getattr(route, "path", "unmatched"), status=status,
+        )
+
 # API endpoint-lərini əsas tətbiqə daxil edirik
 app.include_router(endpoints.router, prefix="/api")
 app.include_router(chat_router, prefix="/api")
 
+@app.get("/metrics", include_in_schema=False)
+def get_metrics():
+    """Metrikaları Prometheus mətn formatında qaytarır."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def read_root():
     return {"message": "Data Analizi API-nə xoş gəlmisiniz!"}
\ No newline at end of file
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List, Dict, Any, Union
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict, Any, Literal, Union
 from datetime import datetime
 
 # Request models
@@ -14,6 +14,8 @@ class CreateVisualizationRequest(BaseModel):
     visualization_type: str
     data_json: Union[Dict[str, Any], List[Any]]  # Can be either dict or list
     chart_config: Optional[Dict[str, Any]] = None
+    # 'payload' - compressed, deduplicated copy; 'lazy' - SQL + preview, re-executed on view
+    storage_mode: Optional[Literal['payload', 'lazy']] = None
 
 class UpdateChatTitleRequest(BaseModel):
     title: str
@@ -26,6 +28,10 @@ class ChatVisualization(BaseModel):
     data_json: Union[Dict[str, Any], List[Any]]  # Can be either dict or list
     chart_config: Optional[Dict[str, Any]]
     created_at: datetime
+    payload_hash: Optional[str] = None
+    storage_mode: Optional[str] = None
+    row_count: Optional[int] = None
+    is_preview: bool = False
 
     class Config:
         from_attributes = True
@@ -66,4 +72,36 @@ class ChatDetail(BaseModel):
 class CreateMessageWithVisualizationRequest(BaseModel):
     message_text: str
     generated_sql: Optional[str] = None
-    visualization: Optional[CreateVisualizationRequest] = None
\ No newline at end of file
+    visualization: Optional[CreateVisualizationRequest] = None
+
+# Bulk import of chat history (one transaction)
+class BulkCreateMessagesRequest(BaseModel):
+    messages: List[CreateMessageWithVisualizationRequest] = Field(..., min_length=1, max_length=10000)
+
+class BulkCreateMessagesResponse(BaseModel):
+    chat_id: int
+    inserted_messages: int
+    inserted_visualizations: int
+    first_message_order: Optional[int]
+    last_message_order: Optional[int]
+
+class SearchSnippetPart(BaseModel):
+    text: str
+    highlight: bool = False
+
+class ChatSearchResult(BaseModel):
+    chat_id: int
+    chat_title: str
+    message_id: Optional[int] = None  # None - only the chat title matched
+    message_order: Optional[int] = None
+    created_at: datetime
+    rank: float
+    matched_in: Literal['message', 'title']
+    snippet: str
+    snippet_parts: List[SearchSnippetPart] = []
+
+class VisualizationData(BaseModel):
+    viz_id: int
+    storage_mode: Optional[str]
+    row_count: Optional[int]
+    data: Union[Dict[str, Any], List[Any]]
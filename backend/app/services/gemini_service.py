@@ -1,31 +1,67 @@
+import asyncio
 import os
-import google.generativeai as genai
+import threading
 from dotenv import load_dotenv
 
-load_dotenv(dotenv_path='.env')
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
-API_KEY = os.getenv("GEMINI_API_KEY")
-if not API_KEY:
-    raise ValueError("GEMINI_API_KEY tapılmadı. Zəhmət olmasa, backend/.env faylını yoxlayın.")
+# Model ilk LLM çağırışında yaradılır ki, tətbiq (və chat endpoint-ləri) açarsız da başlaya bilsin.
+# Benchmark və testlər bu dəyişənə öz modellərini təyin edə bilər.
+model = None
+_model_lock = threading.Lock()
 
-genai.configure(api_key=API_KEY)
-model = genai.GenerativeModel('gemini-2.5-flash')
+# LLM çağırışı üçün maksimum gözləmə müddəti (saniyə)
+LLM_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', '60'))
 
-def convert_natural_language_to_sql(natural_language_query, db_schema):
-    """Təbii dil sorğusunu SQL-ə çevirir."""
-    prompt = f"""
+def get_model():
+    """Gemini modelini (ilk çağırışda .env-i oxuyub klienti konfiqurasiya edərək) qaytarır."""
+    global model
+    if model is not None:
+        return model
+    with _model_lock:
+        if model is None:
+            load_dotenv(dotenv_path='.env')
+            api_key = os.getenv("GEMINI_API_KEY")
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY tapılmadı. Zəhmət olmasa, backend/.env faylını yoxlayın.")
+            # Ağır SDK yalnız lazım olduqda import olunur
+            import google.generativeai as genai
+            genai.configure(api_key=api_key)
+            model = genai.GenerativeModel(MODEL_NAME)
+    return model
+
+def build_prompt(natural_language_query, db_schema):
+    """Gemini üçün prompt mətnini hazırlayır."""
+    return f"""
     Sən Azərbaycan dilində yazılmış təbii dil sorğularını PostgreSQL koduna çevirən peşəkar bir köməkçisən.
     Sənin vəzifən YALNIZ SQL kodunu qaytarmaqdır, heç bir əlavə izahat və ya formatlama vermə.
     Verilənlər bazasının sxemi aşağıdakı kimidir:
     {db_schema}
     İstifadəçinin sualını SQL-ə çevir: "{natural_language_query}"
     """
+
+def clean_sql_response(text):
+    """Model cavabından SQL kodunu təmizləyir."""
+    if "```sql" in text:
+        text = text.replace("```sql", "").replace("```", "")
+    return text.strip()
+
+def convert_natural_language_to_sql(natural_language_query, db_schema):
+    """Təbii dil sorğusunu SQL-ə çevirir."""
+    prompt = build_prompt(natural_language_query, db_schema)
+    try:
+        response = get_model().generate_content(prompt)
+        return clean_sql_response(response.text)
+    except Exception as e:
+        return f"Gemini API xətası: {str(e)}"
+
+async def convert_natural_language_to_sql_async(natural_language_query, db_schema, timeout=None):
+    """Təbii dil sorğusunu event loop-u bloklamadan (async Gemini klienti ilə) SQL-ə çevirir."""
+    prompt = build_prompt(natural_language_query, db_schema)
     try:
-        response = model.generate_content(prompt)
-        sql_query = response.text
-        # Cavabı təmizləyirik
-        if "```sql" in sql_query:
-            sql_query = sql_query.replace("```sql", "").replace("```", "")
-        return sql_query.strip()
+        response = await asyncio.wait_for(get_model().generate_content_async(prompt), timeout or LLM_TIMEOUT)
+        return clean_sql_response(response.text)
+    except asyncio.TimeoutError:
+        return f"Gemini API xətası: cavab {timeout or LLM_TIMEOUT} saniyə ərzində alınmadı"
     except Exception as e:
-        return f"Gemini API xətası: {str(e)}"
\ No newline at end of file
+        return f"Gemini API xətası: {str(e)}"
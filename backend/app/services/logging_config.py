@@ -0,0 +1,51 @@
+import json
+import logging
+import os
+
+from app.services.query_registry import current_query
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'text').lower()  # text | json
+
+# LogRecord-un standart atributları — qalanları extra={...} ilə verilmiş sahələrdir
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestIdFilter(logging.Filter):
+    """Hər qeydə cari /api/query sorğusunun id-sini əlavə edir."""
+
+    def filter(self, record):
+        ctx = current_query.get()
+        record.request_id = ctx.request_id if ctx is not None else '-'
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """Qeydi bir sətirlik JSON kimi yazır (extra sahələr daxil)."""
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, 'request_id', '-'),
+        }
+        entry.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRS})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: str = LOG_LEVEL, log_format: str = LOG_FORMAT) -> None:
+    """Kök logger-i LOG_LEVEL və LOG_FORMAT mühit dəyişənlərinə görə qurur."""
+    handler = logging.StreamHandler()
+    handler.addFilter(RequestIdFilter())
+    if log_format == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"))
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
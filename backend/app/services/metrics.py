@@ -0,0 +1,215 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Gecikmə histogramları üçün sərhədlər (saniyə)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+BYTE_BUCKETS = (1_024, 10_240, 102_400, 1_048_576, 10_485_760, 104_857_600)
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+class Counter:
+    """Yalnız artan sayğac (Prometheus 'counter' tipi)."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}_total{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Sərhədlərə bölünmüş paylanma (Prometheus 'histogram' tipi)."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], list] = {}  # etiketlər -> [sərhəd sayları, cəm, say]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    labels = _format_labels(self.labelnames, key, ('le', _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, ('le', '+Inf'))
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Tətbiqin bütün metrikaları; /metrics üçün Prometheus mətn formatında göstərilir."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+http_request_seconds = registry.histogram(
+    'http_request_duration_seconds', 'HTTP sorğusunun tam müddəti', ('method', 'route', 'status'))
+query_stage_seconds = registry.histogram(
+    'query_stage_duration_seconds', '/api/query pipeline mərhələlərinin müddəti', ('stage',))
+chat_db_seconds = registry.histogram(
+    'chat_db_method_duration_seconds', 'ChatDatabaseManager metodlarının müddəti', ('method',))
+chat_db_errors = registry.counter(
+    'chat_db_method_errors', 'Xəta ilə bitən ChatDatabaseManager çağırışları', ('method',))
+connection_acquire_seconds = registry.histogram(
+    'db_connection_acquire_seconds', 'Hovuzdan əlaqə alınmasını gözləmə müddəti', ('pool',))
+query_rows = registry.histogram(
+    'query_rows_returned', 'SQL sorğusunun qaytardığı sətir sayı', (), ROW_BUCKETS)
+coalesced_requests = registry.counter(
+    'coalesced_requests', 'Eyni işin icrasını gözləyərək nəticəni paylaşan sorğular', ('stage',))
+response_bytes = registry.histogram(
+    'query_response_bytes', '/api/query cavabının həcmi (bayt)', ('format',), BYTE_BUCKETS)
+
+
+class RequestTimings:
+    """Bir HTTP sorğusunun mərhələ müddətləri — Server-Timing başlığı üçün."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stages: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._stages.append((stage, seconds))
+
+    def header_value(self) -> str:
+        """Server-Timing dəyəri: eyni adlı mərhələlər cəmlənir, sonda ümumi müddət."""
+        totals: Dict[str, float] = {}
+        with self._lock:
+            for stage, seconds in self._stages:
+                totals[stage] = totals.get(stage, 0.0) + seconds
+        parts = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ', '.join(parts)
+
+
+# Middleware hər sorğu üçün təyin edir; asyncio tapşırıqları və to_thread konteksti köçürür
+current_timings: ContextVar[Optional[RequestTimings]] = ContextVar('current_timings', default=None)
+
+
+@contextmanager
+def stage(name: str):
+    """Pipeline mərhələsinin müddətini histoqrama və cari sorğunun Server-Timing başlığına yazır."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        query_stage_seconds.observe(elapsed, stage=name)
+        timings = current_timings.get()
+        if timings is not None:
+            timings.add(name, elapsed)
+
+
+def timed_db_method(func):
+    """ChatDatabaseManager metodunun müddətini və xəta ilə bitməsini ölçür."""
+    name = func.__name__
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            chat_db_errors.inc(method=name)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            chat_db_seconds.observe(elapsed, method=name)
+            timings = current_timings.get()
+            if timings is not None:
+                timings.add('chat_db', elapsed)
+        if isinstance(result, dict) and 'error' in result:
+            chat_db_errors.inc(method=name)
+        return result
+    return wrapper
@@ -0,0 +1,109 @@
+import datetime
+import decimal
+import hashlib
+import json
+import os
+import zlib
+from dataclasses import dataclass
+from typing import Any, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstd olmadıqda zlib ilə sıxırıq
+    zstandard = None
+
+# Vizualizasiya məlumatının saxlanma rejimləri
+STORAGE_INLINE = 'inline'    # köhnə sətirlər: data_json birbaşa chat_visualizations-da
+STORAGE_PAYLOAD = 'payload'  # sıxılmış məlumat visualization_payloads-da, hash ilə istinad
+STORAGE_LAZY = 'lazy'        # yalnız SQL + qısa önizləmə, tam nəticə baxış zamanı yenidən icra olunur
+STORAGE_MODES = (STORAGE_PAYLOAD, STORAGE_LAZY)
+
+DEFAULT_STORAGE_MODE = os.getenv('VISUALIZATION_STORAGE_MODE', STORAGE_PAYLOAD)
+PREVIEW_ROWS = int(os.getenv('VISUALIZATION_PREVIEW_ROWS', '100'))
+ZSTD_LEVEL = int(os.getenv('VISUALIZATION_ZSTD_LEVEL', '6'))
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if hasattr(value, 'item'):  # numpy skalyarları
+        return value.item()
+    return str(value)
+
+
+def canonical_json(data: Any) -> bytes:
+    """Məlumatın kanonik JSON yazılışı (sıralanmış açarlar, boşluqsuz) — hash üçün əsasdır."""
+    return json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False,
+                      default=_json_default).encode('utf-8')
+
+
+def payload_hash(raw: bytes) -> str:
+    return hashlib.sha256(raw).hexdigest()
+
+
+def compress(raw: bytes) -> tuple:
+    """Baytları sıxır və (kodlama, sıxılmış baytlar) qaytarır."""
+    if zstandard is not None:
+        return 'zstd', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return 'zlib', zlib.compress(raw, 6)
+
+
+def decompress(encoding: str, blob: bytes) -> bytes:
+    blob = bytes(blob)
+    if encoding == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("zstd ilə sıxılmış məlumatı açmaq üçün 'zstandard' paketi quraşdırılmayıb")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    if encoding == 'zlib':
+        return zlib.decompress(blob)
+    return blob
+
+
+@dataclass
+class EncodedPayload:
+    """Saxlanmağa hazır vizualizasiya məlumatı."""
+    storage_mode: str
+    row_count: Optional[int]
+    payload_hash: Optional[str] = None
+    encoding: Optional[str] = None
+    blob: Optional[bytes] = None
+    raw_size: int = 0
+    preview_json: Optional[str] = None
+
+
+def encode_visualization_data(data: Any, storage_mode: Optional[str] = None,
+                              source_sql: Optional[str] = None,
+                              preview_rows: int = PREVIEW_ROWS) -> EncodedPayload:
+    """data_json-u seçilmiş rejimə görə hazırlayır: payload (hash + sıxma) və ya lazy (SQL + önizləmə).
+
+    Yenidən icra ediləcək SQL olmadıqda lazy rejim payload rejiminə düşür.
+    """
+    mode = storage_mode or DEFAULT_STORAGE_MODE
+    if mode not in STORAGE_MODES:
+        raise ValueError(f"Naməlum saxlanma rejimi: {mode}")
+    row_count = len(data) if isinstance(data, list) else None
+
+    if mode == STORAGE_LAZY and source_sql and isinstance(data, list):
+        preview = data[:preview_rows]
+        return EncodedPayload(
+            storage_mode=STORAGE_LAZY,
+            row_count=row_count,
+            preview_json=json.dumps(preview, ensure_ascii=False, default=_json_default),
+        )
+
+    raw = canonical_json(data)
+    encoding, blob = compress(raw)
+    return EncodedPayload(
+        storage_mode=STORAGE_PAYLOAD,
+        row_count=row_count,
+        payload_hash=payload_hash(raw),
+        encoding=encoding,
+        blob=blob,
+        raw_size=len(raw),
+    )
+
+
+def decode_payload(encoding: str, blob: bytes) -> Any:
+    return json.loads(decompress(encoding, blob))
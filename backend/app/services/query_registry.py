@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DEADLINE = float(os.getenv('QUERY_DEADLINE_SECONDS', '120'))
+MAX_DEADLINE = float(os.getenv('QUERY_MAX_DEADLINE_SECONDS', '600'))
+DISCONNECT_POLL_INTERVAL = float(os.getenv('QUERY_DISCONNECT_POLL_INTERVAL', '0.5'))
+
+# Ləğv səbəbləri
+CANCEL_CLIENT = 'client_request'  # DELETE /api/query/{request_id}
+CANCEL_DISCONNECT = 'disconnect'  # müştəri bağlantını kəsdi
+CANCEL_DEADLINE = 'deadline'      # sorğunun müddəti bitdi
+
+
+class QueryCancelledError(Exception):
+    """Sorğu ləğv edildikdə (müştəri, bağlantı kəsilməsi və ya müddət) qaldırılır."""
+
+
+@dataclass
+class QueryContext:
+    """Bir /api/query çağırışının id-si, son müddəti və hazırda istifadə etdiyi baza əlaqələri."""
+    request_id: str
+    deadline: float  # time.monotonic() üzrə
+    question: str = ""
+    created_at: float = field(default_factory=time.time)
+    cancel_reason: Optional[str] = None
+    task: Optional[asyncio.Task] = None
+    connections: set = field(default_factory=set)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_reason is not None
+
+    def remaining(self) -> float:
+        return max(0.0, self.deadline - time.monotonic())
+
+    def describe(self) -> Dict[str, Any]:
+        with self._lock:
+            backend_pids = [conn.info.backend_pid for conn in self.connections if not conn.closed]
+        return {
+            "request_id": self.request_id,
+            "question": self.question,
+            "age_seconds": round(time.time() - self.created_at, 3),
+            "remaining_seconds": round(self.remaining(), 3),
+            "backend_pids": backend_pids,
+            "cancel_reason": self.cancel_reason,
+        }
+
+
+# SQL-i thread-də icra edən kod cari sorğunu buradan tapır (asyncio.to_thread konteksti köçürür)
+current_query: ContextVar[Optional[QueryContext]] = ContextVar('current_query', default=None)
+
+
+def remaining_ms(default_ms: int) -> int:
+    """Cari sorğunun qalan müddətini (millisaniyə) default-dan çox olmamaq şərtilə qaytarır."""
+    ctx = current_query.get()
+    if ctx is None:
+        return default_ms
+    return max(1, min(default_ms, int(ctx.remaining() * 1000)))
+
+
+@contextmanager
+def cancellable_connection(conn):
+    """psycopg2 əlaqəsini cari sorğuya bağlayır ki, ləğv zamanı icra olunan əmr dayandırılsın."""
+    ctx = current_query.get()
+    if ctx is None:
+        yield conn
+        return
+    if ctx.cancelled:
+        raise QueryCancelledError(f"Sorğu ləğv edilib ({ctx.cancel_reason})")
+    with ctx._lock:
+        ctx.connections.add(conn)
+    try:
+        yield conn
+    finally:
+        with ctx._lock:
+            ctx.connections.discard(conn)
+
+
+class QueryRegistry:
+    """İcra olunan sorğuların reyestri: ləğv, son müddət və sayğaclar."""
+
+    def __init__(self):
+        self._queries: Dict[str, QueryContext] = {}
+        self._lock = threading.Lock()
+        self._counters = {
+            "started": 0,
+            "completed": 0,
+            "failed": 0,
+            "db_cancels": 0,
+            "cancelled": {CANCEL_CLIENT: 0, CANCEL_DISCONNECT: 0, CANCEL_DEADLINE: 0},
+        }
+
+    def register(self, request_id: Optional[str] = None, question: str = "",
+                 timeout: Optional[float] = None) -> QueryContext:
+        """Yeni sorğunu qeydə alır; eyni id ilə aktiv sorğu varsa ValueError qaldırır."""
+        timeout = min(timeout or DEFAULT_DEADLINE, MAX_DEADLINE)
+        ctx = QueryContext(request_id=request_id or uuid.uuid4().hex,
+                           deadline=time.monotonic() + timeout, question=question)
+        with self._lock:
+            if ctx.request_id in self._queries:
+                raise ValueError(f"'{ctx.request_id}' id-li sorğu artıq icra olunur")
+            self._queries[ctx.request_id] = ctx
+            self._counters["started"] += 1
+        return ctx
+
+    def get(self, request_id: str) -> Optional[QueryContext]:
+        with self._lock:
+            return self._queries.get(request_id)
+
+    def finish(self, ctx: QueryContext, failed: bool = False) -> None:
+        """Sorğunu reyestrdən çıxarır."""
+        with self._lock:
+            if self._queries.pop(ctx.request_id, None) is None:
+                return
+            if ctx.cancelled:
+                self._counters["cancelled"][ctx.cancel_reason] += 1
+            elif failed:
+                self._counters["failed"] += 1
+            else:
+                self._counters["completed"] += 1
+
+    def cancel(self, ctx: QueryContext, reason: str) -> bool:
+        """LLM/pipeline tapşırığını dayandırır və bazada icra olunan əmrə ləğv siqnalı göndərir."""
+        with ctx._lock:
+            if ctx.cancel_reason is not None:
+                return False
+            ctx.cancel_reason = reason
+            connections = list(ctx.connections)
+        if ctx.task is not None and not ctx.task.done():
+            ctx.task.cancel()
+        for conn in connections:
+            # Protokol səviyyəsində CancelRequest (pg_cancel_backend ilə eyni təsir), thread-safe
+            try:
+                conn.cancel()
+                with self._lock:
+                    self._counters["db_cancels"] += 1
+            except Exception as e:
+                logger.warning("Baza əmri ləğv edilə bilmədi: %s", e)
+        return True
+
+    def cancel_statements(self, ctx: Optional[QueryContext]) -> int:
+        """Sorğunu ləğv edilmiş saymadan yalnız bazada icra olunan əmrlərini dayandırır (mərhələ müddəti bitdikdə)."""
+        if ctx is None:
+            return 0
+        with ctx._lock:
+            connections = list(ctx.connections)
+        cancelled = 0
+        for conn in connections:
+            try:
+                conn.cancel()
+                cancelled += 1
+            except Exception as e:
+                logger.warning("Baza əmri ləğv edilə bilmədi: %s", e)
+        with self._lock:
+            self._counters["db_cancels"] += cancelled
+        return cancelled
+
+    def cancel_by_id(self, request_id: str, reason: str = CANCEL_CLIENT) -> bool:
+        ctx = self.get(request_id)
+        return ctx is not None and self.cancel(ctx, reason)
+
+    async def run(self, ctx: QueryContext, coro, http_request=None):
+        """Pipeline-ı ayrıca tapşırıqda, son müddət və bağlantı izləməsi ilə icra edir.
+
+        Ləğv edildikdə QueryCancelledError, müddət bitdikdə asyncio.TimeoutError qaldırır.
+        """
+        token = current_query.set(ctx)
+        try:
+            # Tapşırıq cari konteksti (current_query daxil) köçürür
+            ctx.task = asyncio.ensure_future(coro)
+        finally:
+            current_query.reset(token)
+
+        watcher = None
+        if http_request is not None:
+            watcher = asyncio.create_task(self._watch_disconnect(ctx, http_request))
+        try:
+            done, _ = await asyncio.wait({ctx.task}, timeout=ctx.remaining())
+            if not done:
+                self.cancel(ctx, CANCEL_DEADLINE)
+                raise asyncio.TimeoutError()
+            if ctx.task.cancelled() or (ctx.cancelled and ctx.task.exception() is not None):
+                raise QueryCancelledError(f"Sorğu ləğv edildi ({ctx.cancel_reason})")
+            return ctx.task.result()
+        except asyncio.CancelledError:
+            # Endpoint-in özü dayandırılır (məs. server bağlanır) — icra olunan işi də dayandırırıq
+            self.cancel(ctx, CANCEL_DISCONNECT)
+            raise
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+
+    async def _watch_disconnect(self, ctx: QueryContext, http_request):
+        while not ctx.task.done():
+            if await http_request.is_disconnected():
+                self.cancel(ctx, CANCEL_DISCONNECT)
+                return
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+    def active(self):
+        with self._lock:
+            queries = list(self._queries.values())
+        return [ctx.describe() for ctx in queries]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "active": len(self._queries),
+                **{key: (dict(value) if isinstance(value, dict) else value)
+                   for key, value in self._counters.items()},
+            }
+
+
+query_registry = QueryRegistry()
@@ -0,0 +1,88 @@
+import io
+import json
+import math
+from typing import Optional
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_MEDIA_TYPE = "application/vnd.apache.parquet"
+JSON_MEDIA_TYPE = "application/json"
+
+FORMAT_MEDIA_TYPES = {
+    "json": JSON_MEDIA_TYPE,
+    "arrow": ARROW_STREAM_MEDIA_TYPE,
+    "parquet": PARQUET_MEDIA_TYPE,
+}
+
+
+class UnsupportedFormatError(Exception):
+    """Tələb olunan nəticə formatı mövcud olmadıqda qaldırılır."""
+
+
+def negotiate_format(accept: Optional[str], requested: Optional[str] = None) -> str:
+    """Açıq göstərilmiş format və ya Accept başlığına əsasən cavab formatını seçir."""
+    if requested:
+        requested = requested.lower()
+        if requested not in FORMAT_MEDIA_TYPES:
+            raise UnsupportedFormatError(f"Naməlum format: {requested}")
+        return requested
+    for part in (accept or "").split(","):
+        media_type = part.split(";", 1)[0].strip().lower()
+        if media_type == ARROW_STREAM_MEDIA_TYPE:
+            return "arrow"
+        if media_type == PARQUET_MEDIA_TYPE:
+            return "parquet"
+    return "json"
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        return pyarrow
+    except ImportError:
+        raise UnsupportedFormatError("Arrow/Parquet formatı üçün 'pyarrow' paketi quraşdırılmayıb")
+
+
+def _to_text(value):
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return None
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=str)
+    return str(value)
+
+
+def dataframe_to_arrow_table(df):
+    """DataFrame-i sütun əsaslı Arrow cədvəlinə çevirir (sətir-sətir dict yaratmadan).
+
+    Bir tipə gətirilə bilməyən obyekt sütunları (məs. fərqli tipli jsonb skalyarları) mətn kimi yazılır.
+    """
+    pa = _pyarrow()
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                df[column] = df[column].map(_to_text)
+        return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def dataframe_to_arrow_ipc(df) -> bytes:
+    """DataFrame-i Arrow IPC stream formatında baytlara çevirir."""
+    pa = _pyarrow()
+    table = dataframe_to_arrow_table(df)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def dataframe_to_parquet(df, compression: str = "zstd") -> bytes:
+    """DataFrame-i yükləmə üçün Parquet faylına çevirir."""
+    _pyarrow()
+    import pyarrow.parquet as pq
+
+    buffer = io.BytesIO()
+    pq.write_table(dataframe_to_arrow_table(df), buffer, compression=compression)
+    return buffer.getvalue()
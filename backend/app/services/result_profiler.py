@@ -0,0 +1,236 @@
+import datetime
+import decimal
+import math
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+
+def _py(value):
+    """numpy/pandas skalyarlarını JSON üçün adi Python tiplərinə çevirir."""
+    if value is None:
+        return None
+    if isinstance(value, (np.integer,)):
+        return int(value)
+    if isinstance(value, (np.floating, float)):
+        return None if math.isnan(value) or math.isinf(value) else float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, pd.Timestamp):
+        return value.isoformat()
+    return value
+
+
+def _first_valid(series: pd.Series):
+    index = series.first_valid_index()
+    return None if index is None else series.loc[index]
+
+
+def _numeric_view(series: pd.Series) -> Optional[pd.Series]:
+    """Sütun ədədidirsə, onun float/int görünüşünü qaytarır (Decimal obyekt sütunları da daxil)."""
+    if pd.api.types.is_bool_dtype(series):
+        return None
+    if pd.api.types.is_numeric_dtype(series):
+        return series
+    if series.dtype == object and isinstance(_first_valid(series), decimal.Decimal):
+        return pd.to_numeric(series, errors='coerce')
+    return None
+
+
+def _is_date(series: pd.Series) -> bool:
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return True
+    return series.dtype == object and isinstance(_first_valid(series), (datetime.date, datetime.datetime))
+
+
+def classify_columns(df: pd.DataFrame, numeric: Dict[str, pd.Series]) -> Dict[str, List[str]]:
+    """Sütunları dtype-lara əsasən ədədi, tarix, kateqoriya və mətn qruplarına ayırır."""
+    info = {"numeric": [], "date": [], "category": [], "text": []}
+    for col in df.columns:
+        series = df[col]
+        non_null = int(series.count())
+        if non_null == 0:
+            continue
+        if col in numeric:
+            info["numeric"].append(col)
+        elif _is_date(series):
+            info["date"].append(col)
+        elif series.nunique(dropna=True) <= min(50, max(10, non_null * 0.8)):
+            info["category"].append(col)
+        else:
+            info["text"].append(col)
+    return info
+
+
+def compute_statistics(df: pd.DataFrame, info: Dict[str, List[str]],
+                       numeric: Dict[str, pd.Series]) -> Dict[str, Any]:
+    """Ədədi və kateqoriya sütunları üçün vektorlaşdırılmış statistikanı hesablayır."""
+    stats = {
+        "totalRows": int(len(df)),
+        "totalColumns": int(len(df.columns)),
+        "dataTypes": {},
+        "numericStats": {},
+        "categoryStats": {},
+    }
+
+    if info["numeric"]:
+        frame = pd.DataFrame({col: numeric[col] for col in info["numeric"]})
+        aggregated = frame.agg(['sum', 'mean', 'min', 'max', 'count'])
+        for col in info["numeric"]:
+            stats["numericStats"][col] = {
+                "sum": _py(aggregated.at['sum', col]),
+                "avg": _py(aggregated.at['mean', col]),
+                "min": _py(aggregated.at['min', col]),
+                "max": _py(aggregated.at['max', col]),
+                "count": _py(aggregated.at['count', col]),
+            }
+            stats["dataTypes"][col] = 'numeric'
+
+    for col in info["category"]:
+        counts = df[col].value_counts(dropna=True)
+        stats["categoryStats"][col] = {
+            "uniqueCount": int(counts.size),
+            "topValues": [{"value": _py(value), "count": int(count)}
+                          for value, count in counts.head(5).items()],
+        }
+        stats["dataTypes"][col] = 'categorical'
+
+    for col in info["date"]:
+        stats["dataTypes"][col] = 'date'
+    for col in info["text"]:
+        stats["dataTypes"][col] = 'text'
+    return stats
+
+
+def choose_visualization(row_count: int, info: Dict[str, List[str]]) -> Dict[str, Any]:
+    """Nəticənin strukturuna görə vizualizasiya növünü və konfiqurasiyasını seçir."""
+    numeric, dates, categories = info["numeric"], info["date"], info["category"]
+    config: Dict[str, Any] = {
+        "primaryNumericColumn": numeric[0] if numeric else None,
+        "primaryCategoryColumn": categories[0] if categories else None,
+        "primaryDateColumn": dates[0] if dates else None,
+    }
+
+    if row_count == 0:
+        return {"type": "empty", "config": config}
+    if dates and numeric:
+        config.update({"x": dates[0], "y": numeric})
+        return {"type": "timeseries", "config": config}
+    if categories and numeric and row_count <= 20:
+        config.update({"category": categories[0], "value": numeric[0]})
+        chart_type = "pie" if len(categories) == 1 and row_count <= 8 else "bar"
+        return {"type": chart_type, "config": config}
+    if len(numeric) >= 2 and row_count > 20:
+        config.update({"x": numeric[0], "y": numeric[1]})
+        return {"type": "scatter", "config": config}
+    if row_count <= 50 and numeric:
+        config.update({"rankBy": numeric[0]})
+        return {"type": "ranking", "config": config}
+    return {"type": "table", "config": config}
+
+
+# Qrafik nöqtələrinin azaldılması üsulları
+DOWNSAMPLE_LTTB = 'lttb'        # Largest-Triangle-Three-Buckets: xəttin formasını saxlayır
+DOWNSAMPLE_MINMAX = 'minmax'    # hər intervalın minimum və maksimumu: pik qiymətlər itmir
+DOWNSAMPLE_UNIFORM = 'uniform'  # bərabər addımlı seçmə
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """LTTB alqoritmi ilə saxlanılacaq nöqtələrin indekslərini qaytarır (x artan sırada olmalıdır)."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    every = (n - 2) / (threshold - 2)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0] = 0
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        # Əvvəlki seçilmiş nöqtə, cari interval nöqtəsi və növbəti intervalın ortası ilə üçbucağın sahəsi
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[i + 1] = a
+    indices[-1] = n - 1
+    return indices
+
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Hər intervaldan minimum və maksimum nöqtəni saxlayır (ilk və son nöqtə daxil)."""
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+    buckets = np.array_split(np.arange(1, n - 1), (threshold - 2) // 2)
+    keep = [0, n - 1]
+    for bucket in buckets:
+        if len(bucket):
+            values = y[bucket]
+            keep.extend((bucket[int(np.argmin(values))], bucket[int(np.argmax(values))]))
+    return np.unique(keep)
+
+
+def _axis_values(series: pd.Series) -> np.ndarray:
+    """Sütunu alqoritmlər üçün float massivinə çevirir (tarixlər nanosaniyə ilə)."""
+    if _is_date(series):
+        return pd.to_datetime(series, errors='coerce').astype('int64').to_numpy(dtype=float)
+    return pd.to_numeric(series, errors='coerce').to_numpy(dtype=float)
+
+
+def build_chart_series(df: pd.DataFrame, visualization: Dict[str, Any], max_points: int,
+                       method: Optional[str] = None) -> pd.DataFrame:
+    """Qrafik üçün ən çoxu max_points sətirdən ibarət seriya hazırlayır.
+
+    Üsul verilməyibsə, zaman seriyası üçün LTTB, nöqtə qrafiki üçün min-max istifadə olunur.
+    """
+    chart_type = visualization["type"]
+    config = visualization["config"]
+    if chart_type in ("timeseries", "scatter"):
+        df = df.sort_values(config["x"])
+    elif chart_type == "ranking":
+        df = df.sort_values(config["rankBy"], ascending=False)
+    if len(df) <= max_points:
+        return df
+    if chart_type in ("ranking", "table"):
+        return df.head(max_points)
+
+    if chart_type in ("timeseries", "scatter"):
+        method = method or (DOWNSAMPLE_LTTB if chart_type == "timeseries" else DOWNSAMPLE_MINMAX)
+        y_column = config["y"][0] if isinstance(config["y"], list) else config["y"]
+        x = _axis_values(df[config["x"]])
+        y = _axis_values(df[y_column])
+        valid = ~(np.isnan(x) | np.isnan(y))
+        if not valid.all():
+            df, x, y = df[valid], x[valid], y[valid]
+        if method == DOWNSAMPLE_LTTB:
+            return df.iloc[lttb_indices(x, y, max_points)]
+        if method == DOWNSAMPLE_MINMAX:
+            return df.iloc[minmax_indices(y, max_points)]
+
+    # Bərabər addımlı seçmə (ilk və son nöqtə saxlanılır)
+    positions = np.unique(np.linspace(0, len(df) - 1, max_points).round().astype(int))
+    return df.iloc[positions]
+
+
+def profile_result(df: pd.DataFrame) -> Dict[str, Any]:
+    """DataFrame üçün sütun məlumatı, statistika və vizualizasiya seçimini qaytarır.
+
+    Giriş DataFrame dəyişdirilmir (keşdən gələn nəticələr paylaşılır).
+    """
+    numeric = {}
+    for col in df.columns:
+        view = _numeric_view(df[col])
+        if view is not None:
+            numeric[col] = view
+
+    info = classify_columns(df, numeric)
+    visualization = choose_visualization(len(df), info)
+    return {
+        "visualization_type": visualization["type"],
+        "visualization_config": visualization["config"],
+        "column_info": {**info, "total": int(len(df.columns))},
+        "statistics": compute_statistics(df, info, numeric),
+    }
@@ -0,0 +1,215 @@
+import math
+import os
+import re
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from app.db.schema_catalog import SchemaSnapshot, TableInfo, render_schema_text
+
+
+# Azərbaycan hərflərini ASCII qarşılıqlarına endiririk ki, "müştəri" və "musteri" eyni olsun
+AZ_TRANSLITERATION = str.maketrans({
+    'ə': 'e', 'ı': 'i', 'ö': 'o', 'ü': 'u', 'ş': 's', 'ç': 'c', 'ğ': 'g',
+    'Ə': 'e', 'I': 'i', 'İ': 'i', 'Ö': 'o', 'Ü': 'u', 'Ş': 's', 'Ç': 'c', 'Ğ': 'g',
+})
+
+# Sual Azərbaycan dilində, sxem isə adətən ingiliscə olduğu üçün kiçik lüğət (kök -> terminlər)
+AZ_GLOSSARY = {
+    'musteri': ['customer', 'client'],
+    'hesab': ['account'],
+    'emeliyyat': ['transaction'],
+    'kocurme': ['transfer', 'transaction'],
+    'odenis': ['payment'],
+    'filial': ['branch'],
+    'kredit': ['loan', 'credit'],
+    'borc': ['loan', 'debt'],
+    'kart': ['card'],
+    'balans': ['balance'],
+    'qaliq': ['balance'],
+    'mebleg': ['amount'],
+    'mebleq': ['amount'],
+    'tarix': ['date'],
+    'ay': ['month', 'date'],
+    'il': ['year', 'date'],
+    'emekdas': ['employee', 'staff'],
+    'isci': ['employee'],
+    'depozit': ['deposit'],
+    'emanet': ['deposit'],
+    'faiz': ['interest', 'rate'],
+    'valyuta': ['currency'],
+    'seher': ['city'],
+    'unvan': ['address'],
+    'mehsul': ['product'],
+    'gelir': ['income', 'revenue'],
+    'xerc': ['expense'],
+    'komissiya': ['fee', 'commission'],
+    'status': ['status'],
+    'nov': ['type'],
+}
+
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_text(text: str) -> str:
+    """Mətni kiçik hərflərə və ASCII formasına salır."""
+    return (text or "").translate(AZ_TRANSLITERATION).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    """Mətni sözlərə bölür (alt xətt və camelCase də ayrılır)."""
+    text = re.sub(r"([a-z])([A-Z])", r"\1 \2", text or "")
+    return WORD_RE.findall(normalize_text(text))
+
+
+def char_ngrams(token: str, n: int = 3) -> List[str]:
+    """Sözün sərhəd işarələri ilə simvol n-qramlarını qaytarır."""
+    padded = f"#{token}#"
+    if len(padded) <= n:
+        return [padded]
+    return [padded[i:i + n] for i in range(len(padded) - n + 1)]
+
+
+def expand_question_tokens(tokens: List[str]) -> List[str]:
+    """Sual sözlərinə lüğətdən ingilis terminlərini əlavə edir (şəkilçilər nəzərə alınır)."""
+    expanded = list(tokens)
+    for token in tokens:
+        for stem, terms in AZ_GLOSSARY.items():
+            if token.startswith(stem) and (len(stem) >= 4 or token == stem):
+                expanded.extend(terms)
+    return expanded
+
+
+def _features(tokens: List[str]) -> Dict[str, float]:
+    """Sözlərdən həm tam söz, həm də simvol trigram xüsusiyyətləri yaradır."""
+    features: Dict[str, float] = defaultdict(float)
+    for token in tokens:
+        features[f"w:{token}"] += 1.0
+        for gram in char_ngrams(token):
+            features[f"g:{gram}"] += 0.5
+    return features
+
+
+@dataclass
+class SchemaSelection:
+    """Prompt üçün seçilmiş sxem hissəsi."""
+    text: str
+    tables: List[str]
+    fallback: bool
+    scores: Dict[str, float] = field(default_factory=dict)
+
+
+class SchemaIndex:
+    """Bir sxem versiyası üçün cədvəl/sütun adları və şərhləri üzərində n-qram indeksi."""
+
+    TABLE_NAME_WEIGHT = 3.0
+    COLUMN_NAME_WEIGHT = 1.0
+    COMMENT_WEIGHT = 1.0
+
+    def __init__(self, snapshot: SchemaSnapshot):
+        self.snapshot = snapshot
+        self.fingerprint = snapshot.fingerprint
+        self.full_text = snapshot.prompt_text
+        self._vectors: Dict[str, Dict[str, float]] = {}
+        self._norms: Dict[str, float] = {}
+        self._idf: Dict[str, float] = {}
+        self._neighbours: Dict[str, Set[str]] = defaultdict(set)
+        self._build()
+
+    def _table_features(self, table: TableInfo) -> Dict[str, float]:
+        features: Dict[str, float] = defaultdict(float)
+        weighted_sources = [(tokenize(table.name), self.TABLE_NAME_WEIGHT),
+                            (tokenize(table.comment or ""), self.COMMENT_WEIGHT)]
+        for col in table.columns:
+            weighted_sources.append((tokenize(col.name), self.COLUMN_NAME_WEIGHT))
+            weighted_sources.append((tokenize(col.comment or ""), self.COMMENT_WEIGHT))
+        for tokens, weight in weighted_sources:
+            for key, value in _features(tokens).items():
+                features[key] += value * weight
+        return features
+
+    def _build(self):
+        doc_freq: Dict[str, int] = defaultdict(int)
+        for name, table in self.snapshot.tables.items():
+            vector = self._table_features(table)
+            self._vectors[name] = vector
+            for key in vector:
+                doc_freq[key] += 1
+            for ref in table.foreign_keys.values():
+                ref_table = ref.split('.', 1)[0]
+                if ref_table in self.snapshot.tables and ref_table != name:
+                    self._neighbours[name].add(ref_table)
+                    self._neighbours[ref_table].add(name)
+
+        total = max(len(self._vectors), 1)
+        self._idf = {key: math.log(1 + total / df) for key, df in doc_freq.items()}
+        for name, vector in self._vectors.items():
+            self._norms[name] = math.sqrt(sum((v * self._idf[k]) ** 2 for k, v in vector.items())) or 1.0
+
+    def score(self, question: str) -> Dict[str, float]:
+        """Hər cədvəl üçün sualla kosinus oxşarlığını hesablayır."""
+        query = _features(expand_question_tokens(tokenize(question)))
+        query_norm = math.sqrt(sum((v * self._idf.get(k, 0.0)) ** 2 for k, v in query.items())) or 1.0
+        scores = {}
+        for name, vector in self._vectors.items():
+            dot = sum(qv * vector[k] * self._idf[k] ** 2 for k, qv in query.items() if k in vector)
+            scores[name] = dot / (self._norms[name] * query_norm)
+        return scores
+
+    def select(self, question: str, top_k: int = 5, min_score: float = 0.05,
+               include_neighbours: bool = True) -> SchemaSelection:
+        """Ən uyğun top-k cədvəli və onların FK qonşularını seçir; əminlik azdırsa tam sxemi qaytarır."""
+        scores = self.score(question)
+        ranked = sorted(scores, key=scores.get, reverse=True)
+        selected = [name for name in ranked[:top_k] if scores[name] > 0]
+
+        if not selected or scores[selected[0]] < min_score:
+            return SchemaSelection(self.full_text, sorted(self.snapshot.tables), True, scores)
+
+        chosen = list(selected)
+        if include_neighbours:
+            for name in selected:
+                for neighbour in sorted(self._neighbours.get(name, ())):
+                    if neighbour not in chosen:
+                        chosen.append(neighbour)
+
+        if len(chosen) >= len(self.snapshot.tables):
+            return SchemaSelection(self.full_text, sorted(self.snapshot.tables), True, scores)
+
+        subset = {name: self.snapshot.tables[name] for name in chosen}
+        return SchemaSelection(render_schema_text(subset), chosen, False, scores)
+
+
+class SchemaRetriever:
+    """Sxem versiyası dəyişdikdə indeksi yenidən quran, sual üçün sxem konteksti seçən servis."""
+
+    def __init__(self, top_k: int = 5, min_score: float = 0.05, enabled: bool = True):
+        self.top_k = top_k
+        self.min_score = min_score
+        self.enabled = enabled
+        self._index: Optional[SchemaIndex] = None
+        self._lock = threading.Lock()
+
+    def get_index(self, snapshot: SchemaSnapshot) -> SchemaIndex:
+        """Verilmiş sxem versiyası üçün indeksi qaytarır (lazım olduqda qurur)."""
+        index = self._index
+        if index is not None and index.fingerprint == snapshot.fingerprint:
+            return index
+        with self._lock:
+            if self._index is None or self._index.fingerprint != snapshot.fingerprint:
+                self._index = SchemaIndex(snapshot)
+            return self._index
+
+    def select(self, question: str, snapshot: SchemaSnapshot) -> SchemaSelection:
+        """Sual üçün prompt-a daxil ediləcək sxem hissəsini qaytarır."""
+        if not self.enabled:
+            return SchemaSelection(snapshot.prompt_text, sorted(snapshot.tables), True)
+        return self.get_index(snapshot).select(question, self.top_k, self.min_score)
+
+
+schema_retriever = SchemaRetriever(
+    top_k=int(os.getenv('SCHEMA_RETRIEVAL_TOP_K', '5')),
+    min_score=float(os.getenv('SCHEMA_RETRIEVAL_MIN_SCORE', '0.05')),
+    enabled=os.getenv('SCHEMA_RETRIEVAL_ENABLED', 'true').lower() == 'true',
+)
@@ -0,0 +1,110 @@
+import asyncio
+import contextvars
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+from app.services import metrics
+from app.services.query_registry import (
+    CANCEL_DISCONNECT, DEFAULT_DEADLINE, QueryContext, current_query, query_registry,
+)
+
+
+class _Flight:
+    """Bir açar üçün icra olunan iş: öz sorğu konteksti, tapşırığı və gözləyənlərin sayı."""
+
+    def __init__(self, ctx: QueryContext):
+        self.ctx = ctx
+        self.task: asyncio.Task = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Eyni açarlı paralel işləri bir icraya birləşdirir (in-flight deduplikasiya).
+
+    Açar üçün iş artıq icra olunursa, yeni çağırış onu təkrarlamır — eyni tapşırığın nəticəsini
+    (və ya istisnasını) gözləyir. Tapşırıq heç bir sorğuya bağlı olmayan öz QueryContext-i ilə
+    icra olunur: baza əlaqələri, statement_timeout və ləğv ona aiddir. Gözləyənlərdən biri ləğv
+    edilsə, digərləri nəticəni almağa davam edir; sonuncu gözləyən ayrıldıqda iş dayandırılır.
+    İş bitən kimi açar silinir, yəni nəticə keşlənmir.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, _Flight] = {}
+        self._executed = 0
+        self._coalesced = 0
+        self._cancelled = 0
+
+    async def run(self, key: Hashable, coro_factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """(nəticə, paylaşılıbmı) qaytarır; paylaşılıb — nəticə başqa sorğunun icrasından götürülüb."""
+        waiter = current_query.get()
+        flight = self._inflight.get(key)
+        shared = flight is not None
+        if shared:
+            self._coalesced += 1
+            metrics.coalesced_requests.inc(stage=self.name)
+            if waiter is not None:
+                # Sonra qoşulan sorğunun müddəti daha uzundursa, iş də onu gözləyir
+                flight.ctx.deadline = max(flight.ctx.deadline, waiter.deadline)
+        else:
+            self._executed += 1
+            flight = self._start(key, coro_factory, waiter)
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task), shared
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self._cancel(key, flight, waiter)
+
+    def _start(self, key: Hashable, coro_factory, waiter) -> _Flight:
+        flight = _Flight(QueryContext(
+            request_id=waiter.request_id if waiter is not None else uuid.uuid4().hex,
+            deadline=waiter.deadline if waiter is not None else time.monotonic() + DEFAULT_DEADLINE,
+            question=waiter.question if waiter is not None else "",
+        ))
+        # Tapşırıq başladan sorğunun kontekstini deyil, işin öz kontekstini köçürür
+        context = contextvars.copy_context()
+        context.run(current_query.set, flight.ctx)
+        flight.task = flight.ctx.task = context.run(asyncio.ensure_future, coro_factory())
+        flight.task.add_done_callback(lambda done: self._forget(key, flight))
+        self._inflight[key] = flight
+        return flight
+
+    def _cancel(self, key: Hashable, flight: _Flight, waiter) -> None:
+        """Gözləyən qalmadıqda işi (LLM çağırışı, bazadakı əmr) dayandırır."""
+        self._forget(key, flight)
+        self._cancelled += 1
+        reason = waiter.cancel_reason if waiter is not None and waiter.cancelled else CANCEL_DISCONNECT
+        query_registry.cancel(flight.ctx, reason)
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._inflight.get(key) is flight:
+            del self._inflight[key]
+        task = flight.task
+        if task.done() and not task.cancelled():
+            # Gözləyən qalmayıbsa, istisna "never retrieved" kimi loglanmasın
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self._executed + self._coalesced
+        return {
+            "in_flight": len(self._inflight),
+            "executed": self._executed,
+            "coalesced": self._coalesced,
+            "cancelled": self._cancelled,
+            "coalesced_ratio": round(self._coalesced / total, 4) if total else 0.0,
+        }
+
+
+# NL->SQL (Gemini) və SQL icrası mərhələləri üçün
+nl_sql_flight = SingleFlight("llm")
+sql_flight = SingleFlight("sql")
+
+FLIGHTS = {flight.name: flight for flight in (nl_sql_flight, sql_flight)}
+
+
+def single_flight_stats() -> Dict[str, Dict[str, Any]]:
+    return {name: flight.stats() for name, flight in FLIGHTS.items()}
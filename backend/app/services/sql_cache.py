@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+from app.services.schema_retriever import normalize_text
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_question(question: str) -> str:
+    """Sualı keş açarı üçün normallaşdırır (hərf registri, boşluqlar, Azərbaycan hərfləri)."""
+    text = unicodedata.normalize('NFKC', question or "")
+    # Azərbaycan dilində böyük 'I' kiçik 'ı'-ya, 'İ' isə 'i'-yə uyğundur
+    text = text.replace('I', 'ı').replace('İ', 'i')
+    text = normalize_text(text)
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?.!")
+
+
+class NLSQLCache:
+    """Normallaşdırılmış sual + sxem versiyası üzrə generasiya olunmuş SQL keşi (LRU + TTL)."""
+
+    def __init__(self, max_entries: int = 1000, ttl: float = 86400.0,
+                 sqlite_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+        if sqlite_path:
+            self._open_sqlite(sqlite_path)
+
+    def _open_sqlite(self, path: str):
+        """Restartlardan sonra da qalan davamlı keş səviyyəsini açır."""
+        try:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS nl_sql_cache (
+                    cache_key TEXT PRIMARY KEY,
+                    sql_query TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._db.commit()
+        except Exception as e:
+            logger.warning("NL->SQL keşinin SQLite faylı açıla bilmədi: %s", e)
+            self._db = None
+
+    @staticmethod
+    def make_key(question: str, schema_fingerprint: str) -> str:
+        raw = f"{schema_fingerprint}|{normalize_question(question)}"
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def _store_memory(self, key: str, sql_query: str, created_at: float):
+        self._entries[key] = (sql_query, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def get(self, question: str, schema_fingerprint: str) -> Optional[str]:
+        """Keşdə varsa SQL-i qaytarır, yoxdursa None."""
+        key = self.make_key(question, schema_fingerprint)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT sql_query, created_at FROM nl_sql_cache WHERE cache_key = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] < self.ttl:
+                    self._store_memory(key, row[0], row[1])
+                    self._hits += 1
+                    self._disk_hits += 1
+                    return row[0]
+
+            self._misses += 1
+            return None
+
+    def set(self, question: str, schema_fingerprint: str, sql_query: str,
+            created_at: Optional[float] = None):
+        """SQL-i keşə yazır."""
+        key = self.make_key(question, schema_fingerprint)
+        created_at = created_at or time.time()
+        with self._lock:
+            self._store_memory(key, sql_query, created_at)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO nl_sql_cache (cache_key, sql_query, created_at) VALUES (?, ?, ?)",
+                        (key, sql_query, created_at)
+                    )
+                    self._db.commit()
+                except Exception as e:
+                    logger.warning("NL->SQL keşinə yazılarkən xəta: %s", e)
+
+    def invalidate(self, question: str, schema_fingerprint: str) -> bool:
+        """Sual üçün keşlənmiş SQL-i (yaddaşdan və diskdən) silir; qeyd var idisə True qaytarır."""
+        key = self.make_key(question, schema_fingerprint)
+        with self._lock:
+            removed = self._entries.pop(key, None) is not None
+            if self._db is not None:
+                try:
+                    cursor = self._db.execute("DELETE FROM nl_sql_cache WHERE cache_key = ?", (key,))
+                    self._db.commit()
+                    removed = removed or cursor.rowcount > 0
+                except Exception as e:
+                    logger.warning("NL->SQL keşindən silinərkən xəta: %s", e)
+            if removed:
+                self._invalidations += 1
+        return removed
+
+    def clear(self):
+        """Yaddaşdakı və diskdəki bütün qeydləri silir."""
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM nl_sql_cache")
+                self._db.commit()
+
+    def warm_from_history(self, schema_fingerprint: str, validate: Callable[[str], bool],
+                          limit: int = 500) -> int:
+        """chat_messages tarixçəsindəki uğurla icra olunmuş SQL-lərlə keşi doldurur.
+
+        Yalnız nəticəsi saxlanmış (chat_visualizations sətri olan) mesajlar götürülür; sxem dəyişmiş
+        ola bilər, ona görə hər SQL validate() ilə (oxuma yoxlaması və EXPLAIN) yenidən yoxlanılır.
+        """
+        from app.db.chat_database import get_db_connection
+
+        try:
+            with get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT message_text, generated_sql, created_at
+                    FROM (
+                        SELECT DISTINCT ON (m.message_text) m.message_text, m.generated_sql, m.created_at
+                        FROM chat_messages m
+                        WHERE m.generated_sql IS NOT NULL AND m.generated_sql <> ''
+                          AND EXISTS (SELECT 1 FROM chat_visualizations v WHERE v.message_id = m.message_id)
+                        ORDER BY m.message_text, m.created_at DESC
+                    ) latest
+                    ORDER BY created_at DESC
+                    LIMIT %s
+                """, (limit,))
+                rows = cursor.fetchall()
+        except Exception as e:
+            logger.warning("NL->SQL keşi tarixçədən doldurula bilmədi: %s", e)
+            return 0
+
+        # Ən köhnədən yeniyə yazırıq ki, LRU sırasında yenilər sonda qalsın
+        warmed = 0
+        for message_text, generated_sql, _ in reversed(rows):
+            if validate(generated_sql):
+                self.set(message_text, schema_fingerprint, generated_sql)
+                warmed += 1
+        logger.info("NL->SQL keşi tarixçədən dolduruldu: %d qeyd (%d keçərsiz)", warmed, len(rows) - warmed)
+        return warmed
+
+    def stats(self) -> Dict[str, Any]:
+        """Keşin hit/miss sayğaclarını qaytarır."""
+        with self._lock:
+            total = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "persistent": self._db is not None,
+                "hits": self._hits,
+                "disk_hits": self._disk_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+                "hit_ratio": round(self._hits / total, 4) if total else 0.0,
+            }
+
+
+nl_sql_cache = NLSQLCache(
+    max_entries=int(os.getenv('NL_SQL_CACHE_MAX_ENTRIES', '1000')),
+    ttl=float(os.getenv('NL_SQL_CACHE_TTL', '86400')),
+    sqlite_path=os.getenv('NL_SQL_CACHE_SQLITE_PATH') or None,
+)
@@ -0,0 +1,102 @@
+import asyncio
+import os
+from typing import Any, Callable, Dict, Optional
+
+from app.services.query_registry import current_query, query_registry
+
+
+class StageLimiter:
+    """Sorğu pipeline-nın bir mərhələsi üçün eyni vaxtda işləyən iş sayını və müddətini məhdudlaşdırır."""
+
+    def __init__(self, name: str, max_concurrency: int, timeout: Optional[float] = None):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active = 0
+        self._waiting = 0
+        self._completed = 0
+        self._timeouts = 0
+
+    async def _acquire(self) -> None:
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        self._active += 1
+
+    def _release(self) -> None:
+        self._active -= 1
+        self._completed += 1
+        self._semaphore.release()
+
+    async def run(self, coro_factory: Callable[[], Any], timeout: Optional[float] = None):
+        """Semaforu tutub coroutine-i icra edir; müddət bitərsə asyncio.TimeoutError qaldırır."""
+        await self._acquire()
+        try:
+            return await asyncio.wait_for(coro_factory(), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            raise
+        finally:
+            self._release()
+
+    async def run_blocking(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs):
+        """Bloklayan funksiyanı (psycopg2, pandas) ayrıca thread-də, limit daxilində icra edir.
+
+        Thread dayandırıla bilmir: müddət bitdikdə və ya çağırış ləğv edildikdə cari sorğunun bazadakı
+        əmrləri ləğv olunur, yer (semafor) isə thread həqiqətən bitənə qədər tutulur — əks halda limit
+        bazadakı paralel əmrlərin sayını məhdudlaşdırmır.
+        """
+        await self._acquire()
+        future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            self._timeouts += 1
+            query_registry.cancel_statements(current_query.get())
+            raise
+        finally:
+            if future.done():
+                self._release()
+            else:
+                future.add_done_callback(self._release_abandoned)
+
+    def _release_abandoned(self, future: asyncio.Future) -> None:
+        if not future.cancelled():
+            # Nəticəni gözləyən yoxdur — istisna "never retrieved" kimi loglanmasın
+            future.exception()
+        self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "timeout_seconds": self.timeout,
+            "active": self._active,
+            "waiting": self._waiting,
+            "completed": self._completed,
+            "timeouts": self._timeouts,
+        }
+
+
+def _limiter(name: str, default_concurrency: int, default_timeout: float) -> StageLimiter:
+    prefix = f"STAGE_{name.upper()}"
+    return StageLimiter(
+        name,
+        max_concurrency=int(os.getenv(f"{prefix}_CONCURRENCY", str(default_concurrency))),
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT", str(default_timeout))),
+    )
+
+
+# Mərhələlər üzrə limitlər (SQL limiti baza hovuzunun ölçüsündən böyük olmamalıdır)
+schema_stage = _limiter("schema", 4, 30)
+llm_stage = _limiter("llm", 16, 60)
+sql_stage = _limiter("sql", 8, 120)
+
+STAGES = {stage.name: stage for stage in (schema_stage, llm_stage, sql_stage)}
+
+
+def stage_stats() -> Dict[str, Dict[str, Any]]:
+    """Bütün mərhələlərin cari yükünü qaytarır."""
+    return {name: stage.stats() for name, stage in STAGES.items()}
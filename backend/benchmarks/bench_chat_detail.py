@@ -0,0 +1,92 @@
+"""get_chat_detail: köhnə N+1 yükləyici ilə tək sorğulu (json_agg) yükləyicinin müqayisəsi.
+
+Lokal 'chat_history' bazasında 10, 100 və 1000 mesajlı müvəqqəti chatlər yaradılır,
+ölçmədən sonra silinir.
+
+    python -m benchmarks.bench_chat_detail --sizes 10 100 1000 --iterations 20
+"""
+import argparse
+import json
+import statistics
+import time
+
+import psycopg2.extras
+
+from app.db import chat_database
+from app.db.chat_database import chat_db, get_db_connection
+
+SAMPLE_VIZ = [{"branch": f"Filial {i}", "amount": i * 10.5} for i in range(20)]
+
+
+def seed_chat(message_count):
+    """Hər mesajında bir vizualizasiya olan müvəqqəti chat yaradır."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("INSERT INTO chats (title) VALUES (%s) RETURNING chat_id",
+                       (f"benchmark {message_count}",))
+        chat_id = cursor.fetchone()[0]
+        message_rows = [(chat_id, f"sual {i}", "SELECT 1", i + 1) for i in range(message_count)]
+        message_ids = psycopg2.extras.execute_values(cursor, """
+            INSERT INTO chat_messages (chat_id, message_text, generated_sql, message_order)
+            VALUES %s RETURNING message_id
+        """, message_rows, fetch=True)
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO chat_visualizations (message_id, visualization_type, data_json)
+            VALUES %s
+        """, [(row[0], "bar", json.dumps(SAMPLE_VIZ)) for row in message_ids])
+        conn.commit()
+    return chat_id
+
+
+def legacy_get_chat_detail(chat_id):
+    """Əvvəlki yükləyici: chat + mesajlar + hər mesaj üçün ayrıca vizualizasiya sorğusu."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cursor.execute("SELECT chat_id, title, created_at, updated_at FROM chats WHERE chat_id = %s",
+                       (chat_id,))
+        chat_data = dict(cursor.fetchone())
+        cursor.execute("""
+            SELECT message_id, chat_id, message_text, generated_sql, message_order, created_at
+            FROM chat_messages WHERE chat_id = %s ORDER BY message_order ASC
+        """, (chat_id,))
+        chat_data['messages'] = []
+        for message in cursor.fetchall():
+            message_data = dict(message)
+            cursor.execute("""
+                SELECT viz_id, message_id, visualization_type, data_json, chart_config, created_at
+                FROM chat_visualizations WHERE message_id = %s ORDER BY created_at ASC
+            """, (message['message_id'],))
+            message_data['visualizations'] = [dict(v) for v in cursor.fetchall()]
+            chat_data['messages'].append(message_data)
+    return chat_data
+
+
+def measure(func, chat_id, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func(chat_id)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    chat_database.init_db_pool()
+    print(f"{'messages':>10}{'N+1 ms':>12}{'single ms':>12}{'speedup':>10}")
+    for size in args.sizes:
+        chat_id = seed_chat(size)
+        try:
+            legacy = measure(legacy_get_chat_detail, chat_id, args.iterations)
+            single = measure(chat_db.get_chat_detail, chat_id, args.iterations)
+            print(f"{size:>10}{legacy:>12.2f}{single:>12.2f}{legacy / single:>9.1f}x")
+        finally:
+            chat_db.delete_chat(chat_id)
+
+
+if __name__ == "__main__":
+    main()
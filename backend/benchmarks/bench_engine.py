@@ -0,0 +1,73 @@
+"""Hər sorğuda yeni baza əlaqəsi açılması ilə ümumi hovuzdan əlaqə götürülməsi arasındakı fərqi ölçür.
+
+İstifadə (backend qovluğundan, lokal 'retail banking' bazası ilə):
+
+    python -m benchmarks.bench_engine --iterations 200 --sql "SELECT 1 AS x"
+"""
+import argparse
+import statistics
+import time
+
+import pandas as pd
+import psycopg2
+
+from app.db import database
+from app.db.pool import close_all_pools
+
+
+def _summary(samples):
+    samples = sorted(samples)
+    return {
+        "mean_ms": statistics.mean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[int(len(samples) * 0.95) - 1] * 1000,
+    }
+
+
+def run_per_query_connection(sql, iterations):
+    """Köhnə davranış: hər sorğu üçün yeni əlaqə."""
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        conn = psycopg2.connect(**database.DB_CONFIG)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql)
+            pd.DataFrame.from_records(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+        finally:
+            conn.close()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def run_pooled(sql, iterations):
+    """Yeni davranış: execute_sql_query_df ümumi hovuzdan əlaqə götürür."""
+    database.init_db_pool()
+    # İlk əlaqənin açılmasını ölçməyə daxil etmirik
+    database.execute_sql_query_df(sql)
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        database.execute_sql_query_df(sql)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--sql", default="SELECT 1 AS x")
+    args = parser.parse_args()
+
+    before = _summary(run_per_query_connection(args.sql, args.iterations))
+    after = _summary(run_pooled(args.sql, args.iterations))
+    close_all_pools()
+
+    print(f"{'':<22}{'mean':>10}{'p50':>10}{'p95':>10}  (ms)")
+    for label, result in (("connection per query", before), ("pooled connection", after)):
+        print(f"{label:<22}{result['mean_ms']:>10.2f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}")
+    print(f"per-query overhead removed: {before['mean_ms'] - after['mean_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
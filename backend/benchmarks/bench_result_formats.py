@@ -0,0 +1,61 @@
+"""Nəticə formatlarının müqayisəsi: JSON (records) ilə Arrow IPC və Parquet — serializasiya vaxtı və həcm.
+
+Bazaya ehtiyac yoxdur, tipik sorğu nəticəsinə oxşar sintetik DataFrame yaradılır.
+
+    python -m benchmarks.bench_result_formats --rows 10000 100000 1000000
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+import pandas as pd
+from fastapi.encoders import jsonable_encoder
+
+from app.services import result_formats
+
+
+def make_frame(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "transaction_id": np.arange(rows, dtype=np.int64),
+        "account_id": rng.integers(1, 50_000, rows),
+        "amount": rng.normal(250.0, 120.0, rows).round(2),
+        "currency": rng.choice(["AZN", "USD", "EUR"], rows),
+        "branch_name": rng.choice([f"Filial {i}" for i in range(40)], rows),
+        "transaction_date": pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 365 * 24 * 3600, rows), unit="s"),
+    })
+
+
+def timed(func):
+    started = time.perf_counter()
+    payload = func()
+    return time.perf_counter() - started, len(payload)
+
+
+def json_records(df):
+    """Mövcud yol: to_dict(orient='records') + FastAPI-nin jsonable_encoder-i + json.dumps."""
+    return json.dumps(jsonable_encoder(df.to_dict(orient="records"))).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    formats = {
+        "json (records)": json_records,
+        "arrow ipc": result_formats.dataframe_to_arrow_ipc,
+        "parquet (zstd)": result_formats.dataframe_to_parquet,
+    }
+
+    print(f"{'rows':>10}  {'format':<16}{'time ms':>12}{'size MB':>12}")
+    for rows in args.rows:
+        df = make_frame(rows)
+        for label, func in formats.items():
+            seconds, size = timed(lambda: func(df))
+            print(f"{rows:>10}  {label:<16}{seconds * 1000:>12.1f}{size / 1_048_576:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Vizualizasiya məlumatının saxlanması: inline JSONB ilə hash + sıxılmış payload və lazy (SQL + önizləmə).
+
+Bazaya ehtiyac yoxdur: tipik sorğu nəticəsinə oxşar sintetik sətirlər üzərində həcm, yazma (kodlama)
+və oxuma (açma) vaxtı ölçülür. --repeat eyni nəticənin neçə mesajda təkrarlandığını modelləşdirir.
+
+    python -m benchmarks.bench_visualization_storage --rows 100 1000 10000 --repeat 5
+"""
+import argparse
+import json
+import time
+
+from app.services import payload_store
+from benchmarks.bench_result_formats import make_frame
+
+
+def timed(func, iterations=5):
+    best = None
+    result = None
+    for _ in range(iterations):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1_000, 10_000])
+    parser.add_argument("--repeat", type=int, default=5, help="eyni nəticəni saxlayan mesaj sayı")
+    parser.add_argument("--preview-rows", type=int, default=payload_store.PREVIEW_ROWS)
+    args = parser.parse_args()
+
+    print(f"kodlama: {'zstd' if payload_store.zstandard is not None else 'zlib'}, təkrar: {args.repeat}")
+    print(f"{'rows':>8}  {'mode':<10}{'stored KB':>12}{'write ms':>12}{'read ms':>12}")
+    for rows in args.rows:
+        data = json.loads(make_frame(rows).to_json(orient="records", date_format="iso"))
+
+        # inline: hər mesaj öz JSON nüsxəsini saxlayır
+        write_s, raw = timed(lambda: json.dumps(data).encode("utf-8"))
+        read_s, _ = timed(lambda: json.loads(raw))
+        print(f"{rows:>8}  {'inline':<10}{len(raw) * args.repeat / 1024:>12.1f}"
+              f"{write_s * 1000:>12.2f}{read_s * 1000:>12.2f}")
+
+        # payload: bir sıxılmış nüsxə, qalan mesajlar yalnız hash saxlayır
+        write_s, encoded = timed(lambda: payload_store.encode_visualization_data(data, payload_store.STORAGE_PAYLOAD))
+        read_s, _ = timed(lambda: payload_store.decode_payload(encoded.encoding, encoded.blob))
+        stored = len(encoded.blob) + 64 * args.repeat
+        print(f"{rows:>8}  {'payload':<10}{stored / 1024:>12.1f}{write_s * 1000:>12.2f}{read_s * 1000:>12.2f}")
+
+        # lazy: yalnız önizləmə saxlanılır, tam nəticə baxış zamanı SQL ilə yenidən alınır
+        write_s, encoded = timed(lambda: payload_store.encode_visualization_data(
+            data, payload_store.STORAGE_LAZY, "SELECT 1", preview_rows=args.preview_rows))
+        read_s, _ = timed(lambda: json.loads(encoded.preview_json))
+        stored = len(encoded.preview_json.encode("utf-8")) * args.repeat
+        print(f"{rows:>8}  {'lazy':<10}{stored / 1024:>12.1f}{write_s * 1000:>12.2f}"
+              f"{read_s * 1000:>12.2f}  (+ SQL icrası)")
+
+
+if __name__ == "__main__":
+    main()
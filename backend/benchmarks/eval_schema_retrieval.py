@@ -0,0 +1,108 @@
+"""Sxem seçimi mərhələsinin oflayn qiymətləndirilməsi: qənaət olunan prompt tokenləri və lazımi cədvəllərin recall-u.
+
+Keyslər faylı JSONL formatındadır, hər sətirdə sual və SQL üçün lazım olan cədvəllər:
+
+    {"question": "Filiallar üzrə kredit məbləği", "tables": ["loans", "branches"]}
+
+Sxem canlı bazadan götürülə bilər, ya da əvvəlcədən JSON-a yazılmış nüsxədən:
+
+    python -m benchmarks.eval_schema_retrieval --dump-schema schema.json
+    python -m benchmarks.eval_schema_retrieval --cases cases.jsonl --schema-json schema.json --top-k 5
+"""
+import argparse
+import json
+from dataclasses import asdict
+
+from app.db.schema_catalog import ColumnInfo, SchemaSnapshot, TableInfo, render_schema_text
+from app.services.schema_retriever import SchemaIndex
+
+
+def estimate_tokens(text):
+    """Təxmini token sayı (orta hesabla ~4 simvol = 1 token)."""
+    return max(1, len(text) // 4)
+
+
+def load_live_snapshot():
+    from app.db import database
+    from app.db.schema_catalog import schema_catalog
+
+    database.init_db_pool()
+    return schema_catalog.get_snapshot(force_refresh=True)
+
+
+def dump_snapshot(snapshot, path):
+    payload = {"fingerprint": snapshot.fingerprint,
+               "tables": [asdict(table) for table in snapshot.tables.values()]}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+
+
+def load_snapshot(path):
+    with open(path, encoding="utf-8") as f:
+        payload = json.load(f)
+    tables = {}
+    for raw in payload["tables"]:
+        columns = [ColumnInfo(**col) for col in raw.pop("columns")]
+        tables[raw["name"]] = TableInfo(columns=columns, **raw)
+    return SchemaSnapshot(payload.get("fingerprint", path), tables, 0.0, render_schema_text(tables))
+
+
+def evaluate(snapshot, cases, top_k, min_score):
+    index = SchemaIndex(snapshot)
+    full_tokens = estimate_tokens(snapshot.prompt_text)
+    rows = []
+    for case in cases:
+        selection = index.select(case["question"], top_k=top_k, min_score=min_score)
+        needed = set(case["tables"])
+        found = needed & set(selection.tables)
+        rows.append({
+            "question": case["question"],
+            "recall": len(found) / len(needed) if needed else 1.0,
+            "missing": sorted(needed - found),
+            "fallback": selection.fallback,
+            "prompt_tokens": estimate_tokens(selection.text),
+        })
+
+    n = max(len(rows), 1)
+    pruned_tokens = sum(r["prompt_tokens"] for r in rows) / n
+    return {
+        "cases": len(rows),
+        "top_k": top_k,
+        "mean_recall": sum(r["recall"] for r in rows) / n,
+        "full_recall_rate": sum(1 for r in rows if r["recall"] == 1.0) / n,
+        "fallback_rate": sum(1 for r in rows if r["fallback"]) / n,
+        "full_schema_tokens": full_tokens,
+        "mean_prompt_tokens": pruned_tokens,
+        "tokens_saved_pct": 100 * (1 - pruned_tokens / full_tokens),
+        "details": rows,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cases", help="JSONL faylı (question, tables)")
+    parser.add_argument("--schema-json", help="Sxemin JSON nüsxəsi (verilməsə, canlı bazadan)")
+    parser.add_argument("--dump-schema", help="Canlı sxemi bu fayla yazıb çıxır")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--min-score", type=float, default=0.05)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    if args.dump_schema:
+        dump_snapshot(load_live_snapshot(), args.dump_schema)
+        return
+    if not args.cases:
+        parser.error("--cases tələb olunur")
+
+    snapshot = load_snapshot(args.schema_json) if args.schema_json else load_live_snapshot()
+    with open(args.cases, encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+
+    report = evaluate(snapshot, cases, args.top_k, args.min_score)
+    if not args.verbose:
+        report.pop("details")
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
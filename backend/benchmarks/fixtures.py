@@ -0,0 +1,243 @@
+"""Benchmark üçün lokal Postgres fixture-ları: sintetik "retail banking" sxemi və chat tarixçəsi.
+
+Məlumat ayrıca bazalara yazılır (default: retail_banking_bench və chat_history_bench), işlək bazalara
+toxunulmur. Eyni --scale və --seed ilə hər dəfə eyni məlumat alınır.
+
+    python -m benchmarks.fixtures --scale 1 --chats 200 --messages-per-chat 20
+    python -m benchmarks.fixtures --drop   # bazaları silir
+"""
+import argparse
+import random
+from pathlib import Path
+
+import psycopg2
+from psycopg2 import sql
+
+from app.db import chat_database, database
+
+RETAIL_BENCH_DB = 'retail_banking_bench'
+CHAT_BENCH_DB = 'chat_history_bench'
+CHAT_SCHEMA_FILE = Path(__file__).resolve().parents[2] / 'chatsitory_queries.sql'
+
+# scale=1 üçün sətir sayları
+BASE_ROWS = {
+    'branches': 40,
+    'customers': 20_000,
+    'accounts': 40_000,
+    'transactions': 500_000,
+    'loans': 8_000,
+}
+
+RETAIL_SCHEMA = """
+DROP TABLE IF EXISTS transactions, loans, accounts, customers, branches CASCADE;
+
+CREATE TABLE branches (
+    branch_id SERIAL PRIMARY KEY,
+    branch_name VARCHAR(100) NOT NULL,
+    city VARCHAR(50) NOT NULL,
+    opened_at DATE NOT NULL
+);
+
+CREATE TABLE customers (
+    customer_id SERIAL PRIMARY KEY,
+    first_name VARCHAR(50) NOT NULL,
+    last_name VARCHAR(50) NOT NULL,
+    birth_date DATE NOT NULL,
+    city VARCHAR(50) NOT NULL,
+    branch_id INTEGER NOT NULL REFERENCES branches(branch_id),
+    created_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE accounts (
+    account_id SERIAL PRIMARY KEY,
+    customer_id INTEGER NOT NULL REFERENCES customers(customer_id),
+    account_type VARCHAR(20) NOT NULL,
+    currency CHAR(3) NOT NULL,
+    balance NUMERIC(14, 2) NOT NULL,
+    opened_at DATE NOT NULL
+);
+
+CREATE TABLE transactions (
+    transaction_id BIGSERIAL PRIMARY KEY,
+    account_id INTEGER NOT NULL REFERENCES accounts(account_id),
+    transaction_type VARCHAR(20) NOT NULL,
+    amount NUMERIC(14, 2) NOT NULL,
+    transaction_date TIMESTAMP NOT NULL
+);
+
+CREATE TABLE loans (
+    loan_id SERIAL PRIMARY KEY,
+    customer_id INTEGER NOT NULL REFERENCES customers(customer_id),
+    branch_id INTEGER NOT NULL REFERENCES branches(branch_id),
+    loan_type VARCHAR(20) NOT NULL,
+    principal NUMERIC(14, 2) NOT NULL,
+    interest_rate NUMERIC(5, 2) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    issued_at DATE NOT NULL
+);
+"""
+
+# Sətirlər server tərəfində generate_series ilə yaradılır; setseed eyni məlumatı təmin edir
+RETAIL_DATA = """
+SELECT setseed(%(seed)s);
+
+INSERT INTO branches (branch_name, city, opened_at)
+SELECT 'Filial ' || g,
+       (ARRAY['Bakı', 'Gəncə', 'Sumqayıt', 'Mingəçevir', 'Şəki', 'Lənkəran'])[1 + (g %% 6)],
+       DATE '2000-01-01' + (g * 97 %% 7000)
+FROM generate_series(1, %(branches)s) g;
+
+INSERT INTO customers (first_name, last_name, birth_date, city, branch_id, created_at)
+SELECT (ARRAY['Anar', 'Leyla', 'Murad', 'Aysel', 'Rauf', 'Nigar', 'Elvin', 'Günel'])[1 + (g %% 8)],
+       (ARRAY['Məmmədov', 'Əliyeva', 'Həsənov', 'Quliyeva', 'Hüseynov', 'İsmayılova'])[1 + (g %% 6)],
+       DATE '1950-01-01' + (random() * 18000)::int,
+       (ARRAY['Bakı', 'Gəncə', 'Sumqayıt', 'Mingəçevir', 'Şəki', 'Lənkəran'])[1 + (g %% 6)],
+       1 + (random() * (%(branches)s - 1))::int,
+       TIMESTAMP '2015-01-01' + random() * INTERVAL '3500 days'
+FROM generate_series(1, %(customers)s) g;
+
+INSERT INTO accounts (customer_id, account_type, currency, balance, opened_at)
+SELECT 1 + (random() * (%(customers)s - 1))::int,
+       (ARRAY['cari', 'əmanət', 'kart'])[1 + (g %% 3)],
+       (ARRAY['AZN', 'AZN', 'AZN', 'USD', 'EUR'])[1 + (g %% 5)],
+       round((random() * 50000)::numeric, 2),
+       DATE '2015-01-01' + (random() * 3500)::int
+FROM generate_series(1, %(accounts)s) g;
+
+INSERT INTO transactions (account_id, transaction_type, amount, transaction_date)
+SELECT 1 + (random() * (%(accounts)s - 1))::int,
+       (ARRAY['mədaxil', 'məxaric', 'köçürmə'])[1 + (g %% 3)],
+       round((random() * 2000)::numeric, 2),
+       TIMESTAMP '2022-01-01' + random() * INTERVAL '1000 days'
+FROM generate_series(1, %(transactions)s) g;
+
+INSERT INTO loans (customer_id, branch_id, loan_type, principal, interest_rate, status, issued_at)
+SELECT 1 + (random() * (%(customers)s - 1))::int,
+       1 + (random() * (%(branches)s - 1))::int,
+       (ARRAY['istehlak', 'ipoteka', 'biznes', 'avto'])[1 + (g %% 4)],
+       round((1000 + random() * 99000)::numeric, 2),
+       round((8 + random() * 20)::numeric, 2),
+       (ARRAY['aktiv', 'aktiv', 'bağlanıb', 'gecikmiş'])[1 + (g %% 4)],
+       DATE '2018-01-01' + (random() * 2500)::int
+FROM generate_series(1, %(loans)s) g;
+
+CREATE INDEX ON customers(branch_id);
+CREATE INDEX ON accounts(customer_id);
+CREATE INDEX ON transactions(account_id);
+CREATE INDEX ON loans(customer_id);
+ANALYZE;
+"""
+
+CHAT_QUESTIONS = [
+    "Filiallar üzrə müştəri sayı",
+    "Aylar üzrə əməliyyat məbləği",
+    "Ən böyük balansa malik 10 müştəri",
+    "Kredit növləri üzrə orta faiz dərəcəsi",
+    "Valyutalar üzrə hesab sayı",
+]
+
+
+def _server_config():
+    """Bazaların yaradılması üçün 'postgres' bazasına əlaqə parametrləri."""
+    return dict(database.DB_CONFIG, database='postgres')
+
+
+def recreate_database(name, drop_only=False):
+    conn = psycopg2.connect(**_server_config())
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+            if not drop_only:
+                cursor.execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+    finally:
+        conn.close()
+
+
+def use_bench_databases(retail_db=RETAIL_BENCH_DB, chat_db_name=CHAT_BENCH_DB):
+    """Tətbiqin bazalarını benchmark bazalarına yönəldir (hovuzlar yaradılmazdan əvvəl çağırılmalıdır)."""
+    database.DB_CONFIG['database'] = retail_db
+    chat_database.DB_CONFIG['database'] = chat_db_name
+
+
+def row_counts(scale):
+    return {table: max(1, int(rows * scale)) for table, rows in BASE_ROWS.items()}
+
+
+def seed_retail(scale, seed):
+    counts = row_counts(scale)
+    conn = psycopg2.connect(**database.DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(RETAIL_SCHEMA)
+            cursor.execute(RETAIL_DATA, dict(counts, seed=(seed % 1000) / 1000))
+        conn.commit()
+    finally:
+        conn.close()
+    return counts
+
+
+def seed_chats(chats, messages_per_chat, seed):
+    """Chat tarixçəsini bulk_create_messages ilə doldurur; yaradılmış chat id-lərini qaytarır."""
+    conn = psycopg2.connect(**chat_database.DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(CHAT_SCHEMA_FILE.read_text(encoding='utf-8'))
+        conn.commit()
+    finally:
+        conn.close()
+
+    from app.db.chat_database import chat_db
+    from benchmarks.stub_llm import WORKLOAD
+
+    rng = random.Random(seed)
+    chat_database.init_db_pool()
+    chat_ids = []
+    for i in range(chats):
+        chat = chat_db.create_chat(f"bench {i}")
+        messages = []
+        for j in range(messages_per_chat):
+            question = rng.choice(CHAT_QUESTIONS)
+            rows = [{"label": f"Filial {k}", "value": round(rng.random() * 1000, 2)}
+                    for k in range(rng.randint(5, 50))]
+            messages.append({
+                "message_text": f"{question} ({j})",
+                "generated_sql": WORKLOAD.get(question),
+                "visualization": {"visualization_type": "bar", "data_json": rows,
+                                  "chart_config": {"x": "label", "y": "value"}},
+            })
+        result = chat_db.bulk_create_messages(chat["chat_id"], messages)
+        if result is None or "error" in result:
+            raise RuntimeError(f"Chat tarixçəsi yaradıla bilmədi: {result}")
+        chat_ids.append(chat["chat_id"])
+    return chat_ids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=float, default=1.0, help="sətir sayları üçün vurğu")
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--messages-per-chat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--retail-db", default=RETAIL_BENCH_DB)
+    parser.add_argument("--chat-db", default=CHAT_BENCH_DB)
+    parser.add_argument("--drop", action="store_true", help="benchmark bazalarını silir")
+    args = parser.parse_args()
+
+    if args.drop:
+        recreate_database(args.retail_db, drop_only=True)
+        recreate_database(args.chat_db, drop_only=True)
+        print("Benchmark bazaları silindi")
+        return
+
+    for name in (args.retail_db, args.chat_db):
+        recreate_database(name)
+    use_bench_databases(args.retail_db, args.chat_db)
+    counts = seed_retail(args.scale, args.seed)
+    print("retail:", ", ".join(f"{table}={rows}" for table, rows in counts.items()))
+    chat_ids = seed_chats(args.chats, args.messages_per_chat, args.seed)
+    print(f"chat: {len(chat_ids)} chat, {len(chat_ids) * args.messages_per_chat} mesaj")
+
+
+if __name__ == "__main__":
+    main()
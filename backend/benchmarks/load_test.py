@@ -0,0 +1,96 @@
+"""/api/query üçün paralel yük testi: köhnə bloklayan pipeline ilə yeni async pipeline-ın müqayisəsi.
+
+Gemini lokal stub ilə əvəz olunur (sabit gecikmə, sabit SQL), SQL isə lokal 'retail banking'
+bazasında icra olunur. Tətbiq prosesdaxili ASGI transportu ilə çağırılır; köhnə pipeline əsas
+tətbiqə toxunmadan ayrıca test tətbiqində qurulur.
+
+    pip install -r requirements-dev.txt
+    python -m benchmarks.load_test --requests 200 --concurrency 32 --llm-latency 0.3 --sql "SELECT 1 AS x"
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from app.main import app
+from app.db import database, chat_database
+from app.db.schema_catalog import schema_catalog
+from app.services import gemini_service
+from app.api.endpoints import QueryRequest
+from benchmarks.stub_llm import StubModel
+
+
+def create_blocking_app() -> FastAPI:
+    """Əvvəlki davranışı (async endpoint daxilində bloklayan çağırışlar) təkrarlayan ayrıca tətbiq."""
+    blocking_app = FastAPI(title="Blocking pipeline benchmark")
+
+    @blocking_app.post("/api/query")
+    async def blocking_query(request: QueryRequest):
+        db_schema = database.get_db_schema()
+        sql_query = gemini_service.convert_natural_language_to_sql(request.query, db_schema)
+        result = database.execute_sql_query(sql_query)
+        if isinstance(result, dict) and "error" in result:
+            raise HTTPException(status_code=400, detail=result["error"])
+        return {"generated_sql": sql_query, "data": result}
+
+    return blocking_app
+
+
+async def run_load(client, path, total, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            # Hər sorğu fərqlidir ki, NL->SQL keşi nəticəni təhrif etməsin
+            response = await client.post(path, json={"query": f"yük testi sorğusu {i}"})
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "throughput_rps": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def main_async(args):
+    gemini_service.model = StubModel(latency=args.llm_latency, sql=args.sql)
+    database.init_db_pool()
+    chat_database.init_db_pool()
+    schema_catalog.get_snapshot(force_refresh=True)
+
+    results = {}
+    for label, target in (("blocking (before)", create_blocking_app()), ("async (after)", app)):
+        transport = httpx.ASGITransport(app=target)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            results[label] = await run_load(client, "/api/query", args.requests, args.concurrency)
+
+    print(f"{'':<20}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+    for label, r in results.items():
+        print(f"{label:<20}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--sql", default="SELECT 1 AS x")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
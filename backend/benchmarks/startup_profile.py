@@ -0,0 +1,100 @@
+"""Tətbiqin soyuq başlama vaxtı və import profili (python -X importtime).
+
+Hər ölçmə ayrıca prosesdə aparılır: app.main import olunur və lifespan başlanğıc/dayanma mərhələsi
+icra edilir. Ağır modulların (pandas, Gemini SDK) import zamanı yüklənmədiyi də yoxlanılır; hədd
+aşıldıqda proses 1 kodu ilə bitir (CI-da yoxlama kimi istifadə oluna bilər).
+
+    python -m benchmarks.startup_profile --runs 5 --top 20
+    python -m benchmarks.startup_profile --max-import-ms 1500
+
+Eyni yoxlamalar (import zamanı) testlərdədir: tests/test_startup.py.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Başlanğıcda yüklənməməli olan modullar
+LAZY_MODULES = ("pandas", "numpy", "google.generativeai", "pyarrow")
+
+COLD_START_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+import asyncio
+
+async def startup():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "startup_ms": (ready - started) * 1000,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def run_python(code, *flags):
+    env = dict(os.environ, NL_SQL_CACHE_WARM="false", LOG_LEVEL="WARNING")
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=BACKEND_DIR, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def cold_start(runs):
+    samples = []
+    for _ in range(runs):
+        result = run_python(COLD_START_SCRIPT % (LAZY_MODULES,))
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return samples
+
+
+def import_profile():
+    """-X importtime çıxışını (modul, öz vaxtı µs, kumulyativ µs) siyahısına çevirir."""
+    result = run_python("import app.main", "-X", "importtime")
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((name, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--max-import-ms", type=float, help="median import vaxtı üçün hədd")
+    args = parser.parse_args()
+
+    samples = cold_start(args.runs)
+    import_ms = statistics.median(s["import_ms"] for s in samples)
+    startup_ms = statistics.median(s["startup_ms"] for s in samples)
+    print(f"import app.main: {import_ms:.0f} ms, lifespan başlanğıcı daxil: {startup_ms:.0f} ms "
+          f"(median, {args.runs} ölçmə)")
+
+    rows = import_profile()
+    print(f"\n{'modul':<50}{'öz ms':>10}{'kumulyativ ms':>16}")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{name:<50}{self_us / 1000:>10.1f}{cumulative_us / 1000:>16.1f}")
+
+    failures = []
+    loaded = sorted({name for s in samples for name in s["loaded"]})
+    if loaded:
+        failures.append(f"başlanğıcda yüklənməməli modullar import olunub: {', '.join(loaded)}")
+    if args.max_import_ms is not None and import_ms > args.max_import_ms:
+        failures.append(f"import vaxtı {import_ms:.0f} ms > {args.max_import_ms:.0f} ms")
+    for failure in failures:
+        print(f"\nXƏTA: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Gemini modelinin deterministik lokal əvəzi (benchmark-lar üçün API açarı lazım deyil)."""
+import asyncio
+import hashlib
+import random
+import time
+
+# Sintetik "retail banking" sxemi (benchmarks.fixtures) üzərində tipik suallar və onların SQL-i
+WORKLOAD = {
+    "Filiallar üzrə müştəri sayı": """
+        SELECT b.branch_name, COUNT(c.customer_id) AS customer_count
+        FROM branches b LEFT JOIN customers c ON c.branch_id = b.branch_id
+        GROUP BY b.branch_name ORDER BY customer_count DESC""",
+    "Aylar üzrə əməliyyat məbləği": """
+        SELECT date_trunc('month', transaction_date) AS month, SUM(amount) AS total_amount
+        FROM transactions GROUP BY 1 ORDER BY 1""",
+    "Ən böyük balansa malik 10 müştəri": """
+        SELECT c.first_name, c.last_name, SUM(a.balance) AS total_balance
+        FROM customers c JOIN accounts a ON a.customer_id = c.customer_id
+        GROUP BY c.customer_id, c.first_name, c.last_name
+        ORDER BY total_balance DESC LIMIT 10""",
+    "Kredit növləri üzrə orta faiz dərəcəsi": """
+        SELECT loan_type, AVG(interest_rate) AS avg_rate, COUNT(*) AS loan_count
+        FROM loans GROUP BY loan_type""",
+    "Valyutalar üzrə hesab sayı": """
+        SELECT currency, COUNT(*) AS account_count, SUM(balance) AS total_balance
+        FROM accounts GROUP BY currency""",
+    "Son əməliyyatlar": """
+        SELECT transaction_id, account_id, transaction_type, amount, transaction_date
+        FROM transactions ORDER BY transaction_date DESC LIMIT 5000""",
+}
+WORKLOAD = {question: " ".join(sql.split()) for question, sql in WORKLOAD.items()}
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Suala görə sabit SQL qaytarır; gecikmə latency ± jitter, suala görə deterministikdir.
+
+    Tanınmayan sual iş yükündəki SQL-lərdən birinə (sualın hash-i ilə) bağlanır.
+    sql verildikdə bütün suallar üçün həmin SQL qaytarılır.
+    """
+
+    def __init__(self, latency=0.2, jitter=0.0, sql=None, workload=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.sql = sql
+        self.workload = workload or WORKLOAD
+        self._queries = list(self.workload.values())
+        self.calls = 0
+
+    def _question(self, prompt):
+        # build_prompt sualı sonuncu dırnaqlar arasına yazır
+        parts = prompt.rsplit('"', 2)
+        return parts[1] if len(parts) == 3 else prompt
+
+    def _answer(self, prompt):
+        self.calls += 1
+        question = self._question(prompt)
+        digest = int(hashlib.sha256(question.encode('utf-8')).hexdigest(), 16)
+        delay = self.latency + self.jitter * (random.Random(digest).random() * 2 - 1)
+        if self.sql is not None:
+            sql = self.sql
+        else:
+            sql = self.workload.get(question) or self._queries[digest % len(self._queries)]
+        return max(0.0, delay), StubResponse(sql)
+
+    def generate_content(self, prompt):
+        delay, response = self._answer(prompt)
+        time.sleep(delay)
+        return response
+
+    async def generate_content_async(self, prompt):
+        delay, response = self._answer(prompt)
+        await asyncio.sleep(delay)
+        return response
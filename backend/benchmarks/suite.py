@@ -0,0 +1,201 @@
+"""/api/query və chat endpoint-ləri üçün təkrarlana bilən benchmark dəsti.
+
+Əvvəlcə fixture bazaları doldurulur (python -m benchmarks.fixtures), sonra tətbiq prosesdaxili ASGI
+transportu ilə paralel klientlərlə çağırılır. Gemini deterministik stub ilə əvəz olunur. Hər endpoint
+üçün p50/p95/p99 gecikmə, ötürmə qabiliyyəti, xəta sayı və pik RSS ölçülür; nəticə JSON faylına
+yazılır ki, commit-lər arasında müqayisə etmək mümkün olsun.
+
+    pip install -r requirements-dev.txt
+    python -m benchmarks.suite --requests 500 --concurrency 32 --llm-latency 0.3 --output bench.json
+    python -m benchmarks.suite --compare bench-main.json --output bench-branch.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks import fixtures
+from benchmarks.stub_llm import WORKLOAD, StubModel
+
+# Tarixçədən keş doldurulması ölçüləri təhrif etməsin
+os.environ.setdefault("NL_SQL_CACHE_WARM", "false")
+
+SCENARIOS = ("query_llm", "query_cached", "chats_list", "chat_detail", "messages_page", "message_create",
+             "chat_search")
+
+
+def percentile(sorted_samples, pct):
+    """Xətti interpolyasiya ilə faizli (sorted_samples artan sırada olmalıdır)."""
+    if not sorted_samples:
+        return 0.0
+    position = (len(sorted_samples) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (position - lower)
+
+
+def peak_rss_mb():
+    """Prosesin indiyədək pik RSS-i (Linux-da ru_maxrss KB, macOS-da bayt ilə verilir)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return None
+
+
+def build_request(scenario, i, rng, chat_ids):
+    """Ssenarinin i-ci sorğusu üçün (metod, yol, JSON gövdə) qaytarır."""
+    questions = list(WORKLOAD)
+    if scenario == "query_llm":
+        # Hər sual fərqlidir ki, NL->SQL keşi LLM mərhələsini ötürməsin
+        return "POST", "/api/query", {"query": f"{rng.choice(questions)} #{i}"}
+    if scenario == "query_cached":
+        return "POST", "/api/query", {"query": rng.choice(questions)}
+    chat_id = rng.choice(chat_ids)
+    if scenario == "chat_search":
+        # Sualın ilk sözünün prefiksi — yan paneldə yazarkən göndərilən sorğuya bənzəyir
+        return "GET", f"/api/chats/search?q={rng.choice(questions).split()[0][:4]}&limit=20", None
+    if scenario == "chats_list":
+        return "GET", "/api/chats?limit=50", None
+    if scenario == "chat_detail":
+        return "GET", f"/api/chats/{chat_id}", None
+    if scenario == "messages_page":
+        return "GET", f"/api/chats/{chat_id}/messages?limit=50", None
+    if scenario == "message_create":
+        return "POST", f"/api/chats/{chat_id}/messages", {"message_text": f"benchmark mesajı {i}",
+                                                        "generated_sql": "SELECT 1"}
+    raise ValueError(f"Naməlum ssenari: {scenario}")
+
+
+async def run_scenario(client, scenario, total, concurrency, seed, chat_ids):
+    rng = random.Random(f"{seed}:{scenario}")
+    requests = [build_request(scenario, i, rng, chat_ids) for i in range(total)]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    rss_before = peak_rss_mb()
+
+    async def one(method, path, body):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(*request) for request in requests))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "throughput_rps": round(total / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "errors": errors,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "rss_growth_mb": round(peak_rss_mb() - rss_before, 1),
+    }
+
+
+async def main_async(args):
+    fixtures.use_bench_databases(args.retail_db, args.chat_db)
+    from app.main import app
+    from app.db import database, chat_database
+    from app.db.schema_catalog import schema_catalog
+    from app.services import gemini_service
+
+    stub = StubModel(latency=args.llm_latency, jitter=args.llm_jitter)
+    gemini_service.model = stub
+    database.init_db_pool()
+    chat_database.init_db_pool()
+    schema_catalog.get_snapshot(force_refresh=True)
+
+    page = chat_database.chat_db.get_chats_page(limit=200)
+    chat_ids = [chat["chat_id"] for chat in page.get("chats", [])]
+    if not chat_ids:
+        raise SystemExit("Chat tarixçəsi boşdur — əvvəlcə 'python -m benchmarks.fixtures' işə salın")
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in args.scenarios:
+            # İlk sorğular (engine, keşlər) ölçüyə daxil edilmir
+            await run_scenario(client, scenario, min(args.warmup, args.requests), args.concurrency,
+                               args.seed + 1, chat_ids)
+            results[scenario] = await run_scenario(client, scenario, args.requests, args.concurrency,
+                                                   args.seed, chat_ids)
+            r = results[scenario]
+            print(f"{scenario:<16}{r['throughput_rps']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+                  f"{r['p99_ms']:>10.1f}{r['errors']:>8}{r['peak_rss_mb']:>10.1f}")
+
+    return {
+        "commit": git_commit(),
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "llm_calls": stub.calls,
+        "results": results,
+    }
+
+
+def compare(baseline, current):
+    """İki nəticə faylını ssenari üzrə müqayisə edir (müsbət faiz = yavaşlama)."""
+    print(f"\n{'ssenari':<16}{'p50 Δ%':>10}{'p95 Δ%':>10}{'p99 Δ%':>10}{'req/s Δ%':>10}")
+    for scenario, r in current["results"].items():
+        base = baseline.get("results", {}).get(scenario)
+        if base is None:
+            continue
+
+        def delta(key):
+            return 100 * (r[key] - base[key]) / base[key] if base[key] else 0.0
+        print(f"{scenario:<16}{delta('p50_ms'):>+10.1f}{delta('p95_ms'):>+10.1f}{delta('p99_ms'):>+10.1f}"
+              f"{delta('throughput_rps'):>+10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--llm-jitter", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--retail-db", default=fixtures.RETAIL_BENCH_DB)
+    parser.add_argument("--chat-db", default=fixtures.CHAT_BENCH_DB)
+    parser.add_argument("--output", help="nəticənin yazılacağı JSON faylı")
+    parser.add_argument("--compare", help="müqayisə üçün əvvəlki nəticə faylı")
+    args = parser.parse_args()
+
+    print(f"{'ssenari':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'RSS MB':>10}")
+    report = asyncio.run(main_async(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nNəticə yazıldı: {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Köhnə (inline) chat_visualizations sətirlərini visualization_payloads cədvəlinə köçürür.
+
+Hər sətrin data_json-u kanonik JSON-a çevrilib hash-lənir, sıxılmış şəkildə bir dəfə saxlanılır,
+sətir isə hash-ə istinad edir (data_json NULL olur). Partiyalarla işləyir, hər partiya ayrıca
+tranzaksiyadır — yarıda dayansa, təkrar işə salmaq təhlükəsizdir.
+
+    python -m migrations.migrate_visualization_payloads --batch-size 500
+    python -m migrations.migrate_visualization_payloads --dry-run
+    python -m migrations.migrate_visualization_payloads --gc   # istinadsız payload-ları silir
+"""
+import argparse
+
+import psycopg2
+import psycopg2.extras
+
+from app.db import chat_database
+from app.db.chat_database import delete_orphan_payloads, get_db_connection
+from app.services.payload_store import STORAGE_INLINE, STORAGE_PAYLOAD, canonical_json, compress, payload_hash
+
+
+def migrate_batch(cursor, after_id, batch_size, dry_run):
+    """viz_id > after_id olan bir partiyanı köçürür; (son viz_id, sətir sayı, json bayt, sıxılmış bayt) qaytarır."""
+    cursor.execute("""
+        SELECT viz_id, data_json
+        FROM chat_visualizations
+        WHERE storage_mode = %s AND data_json IS NOT NULL AND viz_id > %s
+        ORDER BY viz_id
+        LIMIT %s
+    """, (STORAGE_INLINE, after_id, batch_size))
+    rows = cursor.fetchall()
+    if not rows:
+        return None, 0, 0, 0
+
+    payloads = {}
+    updates = []
+    raw_bytes = 0
+    for viz_id, data in rows:
+        raw = canonical_json(data)
+        digest = payload_hash(raw)
+        raw_bytes += len(raw)
+        if digest not in payloads:
+            encoding, blob = compress(raw)
+            row_count = len(data) if isinstance(data, list) else None
+            payloads[digest] = (digest, encoding, psycopg2.Binary(blob), len(raw), len(blob), row_count)
+        updates.append((viz_id, digest, payloads[digest][5], STORAGE_PAYLOAD))
+    stored_bytes = sum(row[4] for row in payloads.values())
+
+    if not dry_run:
+        psycopg2.extras.execute_values(cursor, """
+            INSERT INTO visualization_payloads
+            (payload_hash, encoding, payload, raw_size, stored_size, row_count)
+            VALUES %s
+            ON CONFLICT (payload_hash) DO NOTHING
+        """, list(payloads.values()))
+        psycopg2.extras.execute_values(cursor, """
+            UPDATE chat_visualizations v
+            SET payload_hash = u.payload_hash, storage_mode = u.storage_mode,
+                row_count = u.row_count, data_json = NULL
+            FROM (VALUES %s) AS u(viz_id, payload_hash, row_count, storage_mode)
+            WHERE v.viz_id = u.viz_id
+        """, updates, template="(%s, %s, %s::integer, %s)")
+    return rows[-1][0], len(rows), raw_bytes, stored_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--dry-run", action="store_true", help="yazmadan yalnız qənaəti hesablayır")
+    parser.add_argument("--gc", action="store_true", help="istinadsız payload-ları silir")
+    args = parser.parse_args()
+
+    chat_database.init_db_pool()
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if args.gc:
+            deleted = delete_orphan_payloads(cursor)
+            conn.commit()
+            print(f"Silinmiş payload sayı: {deleted}")
+            return
+
+        after_id, total_rows, total_raw, total_stored = 0, 0, 0, 0
+        while True:
+            last_id, count, raw_bytes, stored_bytes = migrate_batch(cursor, after_id, args.batch_size, args.dry_run)
+            if last_id is None:
+                break
+            if args.dry_run:
+                conn.rollback()
+            else:
+                conn.commit()
+            after_id = last_id
+            total_rows += count
+            total_raw += raw_bytes
+            total_stored += stored_bytes
+            print(f"viz_id <= {last_id}: {total_rows} sətir")
+
+    ratio = total_raw / total_stored if total_stored else 0
+    print(f"Köçürülən sətir: {total_rows}, JSON: {total_raw / 1_048_576:.2f} MB, "
+          f"sıxılmış (təkrarsız): {total_stored / 1_048_576:.2f} MB, nisbət: {ratio:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
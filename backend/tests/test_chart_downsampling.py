@@ -0,0 +1,86 @@
+import datetime
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from app.db.chart_queries import (  # noqa: E402
+    build_scatter_sql, build_timeseries_sql, choose_time_unit, parse_summary, scatter_bins,
+)
+from app.services.result_profiler import (  # noqa: E402
+    build_chart_series, lttb_indices, minmax_indices, profile_result,
+)
+
+
+def _signal(n):
+    x = np.arange(n, dtype=float)
+    y = np.sin(x / 50) * 100 + (x % 97)
+    y[n // 3] = 10_000  # pik
+    y[2 * n // 3] = -10_000  # çuxur
+    return x, y
+
+
+@pytest.mark.parametrize("n, threshold", [(10_000, 500), (1_001, 3), (999, 998)])
+def test_lttb_keeps_exact_count_and_endpoints(n, threshold):
+    x, y = _signal(n)
+    indices = lttb_indices(x, y, threshold)
+    assert len(indices) == threshold
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert (np.diff(indices) > 0).all()
+
+
+def test_lttb_keeps_extreme_points():
+    x, y = _signal(10_000)
+    kept = set(lttb_indices(x, y, 200))
+    assert {10_000 // 3, 2 * 10_000 // 3} <= kept
+
+
+def test_lttb_returns_everything_below_threshold():
+    x, y = _signal(50)
+    assert list(lttb_indices(x, y, 100)) == list(range(50))
+
+
+@pytest.mark.parametrize("n, threshold", [(10_000, 500), (10_000, 501), (101, 4)])
+def test_minmax_bounds_count_and_keeps_endpoints_and_extremes(n, threshold):
+    _, y = _signal(n)
+    indices = minmax_indices(y, threshold)
+    assert len(indices) <= threshold
+    assert indices[0] == 0 and indices[-1] == n - 1
+    assert {int(np.argmax(y)), int(np.argmin(y))} <= set(indices)
+
+
+@pytest.mark.parametrize("method", [None, "lttb", "minmax", "uniform"])
+def test_chart_series_never_exceeds_max_points(method):
+    start = datetime.datetime(2024, 1, 1)
+    df = pd.DataFrame({"ts": [start + datetime.timedelta(minutes=i) for i in range(5_000)],
+                       "amount": np.arange(5_000, dtype=float)})
+    visualization = {"type": "timeseries", "config": profile_result(df.head(30))["visualization_config"]}
+    series = build_chart_series(df, visualization, 300, method)
+    assert len(series) <= 300
+    assert series["ts"].iloc[0] == df["ts"].iloc[0] and series["ts"].iloc[-1] == df["ts"].iloc[-1]
+
+
+@pytest.mark.parametrize("days, max_points, unit", [(0.1, 500, "minute"), (1, 500, "hour"), (30, 500, "day"), (3650, 500, "month")])
+def test_time_unit_keeps_buckets_under_max_points(days, max_points, unit):
+    start = datetime.datetime(2020, 1, 1)
+    assert choose_time_unit(start, start + datetime.timedelta(days=days), max_points) == unit
+
+
+def test_pushdown_sql_shapes():
+    sql = build_timeseries_sql("SELECT * FROM t;", "created_at", ["amount"], "day")
+    assert "date_trunc('day', \"created_at\")" in sql and "GROUP BY 1" in sql
+    with pytest.raises(ValueError):
+        build_timeseries_sql("SELECT 1", "x", ["y"], "day'); DROP TABLE t; --")
+
+    scatter = build_scatter_sql("SELECT * FROM t", "x", "y", (0, 10), (5, 5), 400)
+    assert scatter.count("width_bucket") == 1  # y oxunun bütün qiymətləri eynidir
+    assert f", {scatter_bins(400)})" in scatter
+
+
+def test_non_finite_bounds_are_rejected():
+    with pytest.raises(ValueError):
+        build_scatter_sql("SELECT * FROM t", "x", "y", (0, float("inf")), (0, 1), 400)
+    summary = parse_summary({"total_rows": 3, "x_min": 0, "x_max": 1, "y0_sum": float("nan"),
+                             "y0_avg": 1.0, "y0_min": float("-inf"), "y0_max": 2.0, "y0_count": 3}, ["y"])
+    assert summary["numeric_stats"]["y"]["sum"] is None and summary["numeric_stats"]["y"]["min"] is None
@@ -0,0 +1,201 @@
+import datetime
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from app.db import chat_database  # noqa: E402
+from app.db.chat_database import ChatDatabaseManager, build_prefix_tsquery  # noqa: E402
+from app.services.payload_store import canonical_json, compress, payload_hash  # noqa: E402
+
+
+class _ScriptedConnection:
+    """Hər execute üçün növbəti hazır nəticəni qaytaran saxta əlaqə; icra olunan sorğuları yadda saxlayır."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.executed = []
+
+    def cursor(self, cursor_factory=None):
+        return self
+
+    def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+        self._result = self.results.pop(0)
+
+    def fetchone(self):
+        return self._result[0] if self._result else None
+
+    def fetchall(self):
+        return self._result
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+@pytest.fixture
+def connect(monkeypatch):
+    def install(*results):
+        conn = _ScriptedConnection(*results)
+
+        @contextmanager
+        def connection():
+            yield conn
+
+        monkeypatch.setattr(chat_database, "get_db_connection", connection)
+        return conn
+
+    return install
+
+
+def test_prefix_tsquery_splits_terms():
+    assert build_prefix_tsquery("hesab fil") == "hesab:* & fil:*"
+
+
+def test_prefix_tsquery_keeps_dotted_capital_i_in_one_term():
+    assert build_prefix_tsquery("İstifadəçi İLLİK") == "istifadəçi:* & illik:*"
+
+
+def test_prefix_tsquery_empty_text():
+    assert build_prefix_tsquery("  ?! ") is None
+
+
+def _viz(viz_id, message_id, payload_hash=None, data_json=None, storage_mode="payload"):
+    return {"viz_id": viz_id, "message_id": message_id, "visualization_type": "bar", "data_json": data_json,
+            "chart_config": {}, "payload_hash": payload_hash, "storage_mode": storage_mode, "row_count": None}
+
+
+def test_chat_detail_loads_messages_and_payloads_in_two_queries(connect):
+    rows = [{"branch": "Nəsimi", "total": 12}]
+    raw = canonical_json(rows)
+    digest = payload_hash(raw)
+    encoding, blob = compress(raw)
+    messages = [
+        {"message_id": 1, "message_order": 1, "visualizations": [_viz(10, 1, digest)]},
+        {"message_id": 2, "message_order": 2, "visualizations": [_viz(11, 2, digest)]},
+        {"message_id": 3, "message_order": 3, "visualizations": [_viz(12, 3, None, [{"x": 1}], "lazy")]},
+        {"message_id": 4, "message_order": 4, "visualizations": []},
+    ]
+    conn = connect([{"chat_id": 7, "title": "Filiallar", "messages": messages}],
+                   [{"payload_hash": digest, "encoding": encoding, "payload": blob}])
+
+    chat = ChatDatabaseManager().get_chat_detail(7)
+
+    # Mesaj sayından asılı olmayaraq: chat + mesajlar bir sorğu, payload-lar bir sorğu
+    assert len(conn.executed) == 2
+    assert conn.executed[1][1] == ([digest],)
+    visualizations = [viz for message in chat["messages"] for viz in message["visualizations"]]
+    assert [viz["data_json"] for viz in visualizations] == [rows, rows, [{"x": 1}]]
+    assert [viz["is_preview"] for viz in visualizations] == [False, False, True]
+
+
+def test_chat_detail_without_payloads_skips_payload_query(connect):
+    conn = connect([{"chat_id": 7, "title": "Boş", "messages": []}])
+    assert ChatDatabaseManager().get_chat_detail(7)["messages"] == []
+    assert len(conn.executed) == 1
+
+
+def test_missing_chat(connect):
+    connect([])
+    assert ChatDatabaseManager().get_chat_detail(404) is None
+
+
+def test_chat_exists_is_a_single_exists_query(connect):
+    conn = connect([(True,)])
+    assert ChatDatabaseManager().chat_exists(7) is True
+    assert len(conn.executed) == 1 and "EXISTS" in conn.executed[0][0]
+
+
+def test_chat_cursor_round_trip():
+    updated_at = datetime.datetime(2024, 3, 5, 14, 30, 15, 123456, tzinfo=datetime.timezone.utc)
+    token = ChatDatabaseManager.encode_chat_cursor({"updated_at": updated_at, "chat_id": 42})
+    assert token.isascii() and "/" not in token and "+" not in token
+    assert ChatDatabaseManager.decode_chat_cursor(token) == (updated_at, 42)
+
+
+@pytest.mark.parametrize("token", ["", "bm90LWpzb24", "eyJ1IjogIngiLCAiaWQiOiAxfQ=="])
+def test_invalid_chat_cursor(token):
+    with pytest.raises(ValueError):
+        ChatDatabaseManager.decode_chat_cursor(token)
+
+
+def _chat(chat_id, minute):
+    return {"chat_id": chat_id, "title": f"Chat {chat_id}", "message_count": 1,
+            "updated_at": datetime.datetime(2024, 3, 5, 14, minute, tzinfo=datetime.timezone.utc)}
+
+
+def test_chats_page_fetches_one_extra_row_and_continues_after_cursor(connect):
+    conn = connect([_chat(3, 30), _chat(2, 20), _chat(1, 10)])
+    page = ChatDatabaseManager().get_chats_page(limit=2)
+    assert [chat["chat_id"] for chat in page["chats"]] == [3, 2]
+    assert conn.executed[0][1] == (3,)
+
+    conn = connect([_chat(1, 10)])
+    page = ChatDatabaseManager().get_chats_page(limit=2, cursor_token=page["next_cursor"])
+    assert conn.executed[0][1] == (_chat(2, 20)["updated_at"], 2, 3)
+    assert [chat["chat_id"] for chat in page["chats"]] == [1] and page["next_cursor"] is None
+
+
+def test_messages_page_cursor_is_the_last_message_order(connect):
+    rows = [{"message_id": i, "message_order": i, "visualizations": []} for i in (4, 5, 6)]
+    conn = connect(rows)
+    page = ChatDatabaseManager().get_messages_page(7, limit=2, after_order=3)
+    assert conn.executed[0][1] == (True, 7, 3, 3)
+    assert [m["message_order"] for m in page["messages"]] == [4, 5] and page["next_cursor"] == "5"
+
+
+def test_message_with_visualization_is_one_statement(connect):
+    rows = [{"branch": "Nəsimi", "total": 12}]
+    conn = connect([{"message_id": 5, "chat_id": 7, "message_order": 3,
+                     "visualizations": [{"viz_id": 9, "message_id": 5, "storage_mode": "payload"}]}])
+
+    message = ChatDatabaseManager().create_message_with_visualization(
+        7, "Filiallar üzrə", "SELECT 1", {"visualization_type": "bar", "data_json": rows, "chart_config": {}})
+
+    assert len(conn.executed) == 1 and conn.committed
+    params = conn.executed[0][1]
+    assert params["has_viz"] is True and params["payload_hash"] == payload_hash(canonical_json(rows))
+    assert message["visualizations"][0]["data_json"] == rows
+
+
+def test_message_for_missing_chat(connect):
+    connect([])
+    assert ChatDatabaseManager().create_message_with_visualization(404, "?") is None
+
+
+def test_bulk_import_allocates_orders_once_and_dedupes_payloads(connect, monkeypatch):
+    calls = []
+
+    def execute_values(cursor, sql, rows, template=None, page_size=100, fetch=False):
+        calls.append((sql, list(rows)))
+        if fetch:
+            return [(order, 100 + order) for *_, order in rows]
+
+    monkeypatch.setattr(chat_database.psycopg2.extras, "execute_values", execute_values)
+    conn = connect([(12,)])
+    same = {"visualization_type": "bar", "data_json": [{"x": 1}]}
+    messages = [
+        {"message_text": "a", "generated_sql": "SELECT 1", "visualization": same},
+        {"message_text": "b"},
+        {"message_text": "c", "generated_sql": "SELECT 1", "visualization": dict(same)},
+    ]
+
+    result = ChatDatabaseManager().bulk_create_messages(7, messages)
+
+    assert conn.executed[0][1] == (3, 3, 7) and conn.committed
+    assert result == {"chat_id": 7, "inserted_messages": 3, "inserted_visualizations": 2,
+                      "first_message_order": 10, "last_message_order": 12}
+    message_rows, payload_rows, viz_rows = (rows for _, rows in calls)
+    assert [row[3] for row in message_rows] == [10, 11, 12]
+    assert len(payload_rows) == 1
+    assert [row[0] for row in viz_rows] == [110, 112]
+
+
+def test_bulk_import_into_missing_chat_rolls_back(connect):
+    conn = connect([])
+    assert ChatDatabaseManager().bulk_create_messages(404, [{"message_text": "a"}]) is None
+    assert conn.rolled_back
@@ -0,0 +1,60 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from app.db.index_advisor import IndexCandidate, _is_covered, analyze_plan, filter_columns  # noqa: E402
+
+COLUMNS = {"branch_id", "amount", "created_at", "name"}
+TABLES = {"transactions": {"rows": 100000.0, "columns": COLUMNS}}
+
+
+def test_filter_columns_splits_equality_and_ranges():
+    text = "((branch_id = 5) AND (amount > '100'::numeric) AND (t.created_at >= '2024-01-01'::date))"
+    assert filter_columns(text, COLUMNS) == (["branch_id"], ["amount", "created_at"])
+
+
+def test_filter_columns_ignores_function_arguments_and_unknown_columns():
+    text = "((lower((name)::text) = 'x'::text) AND (status = 'ok'::text) AND (branch_id = ANY ('{1,2}'::integer[])))"
+    assert filter_columns(text, COLUMNS) == (["branch_id"], [])
+
+
+def _seq_scan(filter_text, actual_rows, removed, cost=900.0):
+    return {"Node Type": "Seq Scan", "Relation Name": "transactions", "Filter": filter_text,
+            "Actual Rows": actual_rows, "Rows Removed by Filter": removed, "Total Cost": cost}
+
+
+def test_selective_seq_scan_becomes_candidate():
+    plan = {"Node Type": "Aggregate", "Total Cost": 1000.0,
+            "Plans": [_seq_scan("((branch_id = 5) AND (amount > 10))", 10, 990)]}
+    [(table, columns, reason, share)] = analyze_plan(plan, TABLES, work_mem=4 * 1024 * 1024, max_selectivity=0.1)
+    assert (table, columns) == ("transactions", ("branch_id", "amount"))
+    assert "1.00%" in reason and share == pytest.approx(0.9 * 0.99)
+
+
+def test_unselective_seq_scan_is_skipped():
+    plan = _seq_scan("(branch_id = 5)", 600, 400)
+    assert analyze_plan(plan, TABLES, work_mem=4 * 1024 * 1024, max_selectivity=0.1) == []
+
+
+def test_spilled_sort_over_seq_scan_becomes_candidate():
+    scan = {"Node Type": "Seq Scan", "Relation Name": "transactions", "Total Cost": 900.0}
+    sort = {"Node Type": "Sort", "Total Cost": 950.0, "Sort Key": ["t.created_at DESC"],
+            "Sort Space Type": "Disk", "Plans": [scan]}
+    [(table, columns, reason, _)] = analyze_plan(sort, TABLES, work_mem=4 * 1024 * 1024, max_selectivity=0.1)
+    assert (table, columns, reason) == ("transactions", ("created_at DESC",), "sıralama diskə düşür")
+
+
+def test_sort_above_join_is_skipped():
+    scan = {"Node Type": "Seq Scan", "Relation Name": "transactions", "Total Cost": 900.0}
+    join = {"Node Type": "Hash Join", "Plans": [scan, dict(scan)]}
+    sort = {"Node Type": "Sort", "Total Cost": 5000.0, "Sort Key": ["created_at"],
+            "Sort Space Type": "Disk", "Plans": [join]}
+    assert analyze_plan(sort, TABLES, work_mem=4 * 1024 * 1024, max_selectivity=0.1) == []
+
+
+def test_candidate_ddl_and_coverage():
+    candidate = IndexCandidate("transactions", ("branch_id", "created_at DESC"))
+    assert candidate.ddl == ("CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_transactions_branch_id_created_at "
+                             "ON transactions (branch_id, created_at DESC);")
+    assert _is_covered(candidate.columns, [("branch_id", "created_at", "amount")])
+    assert not _is_covered(candidate.columns, [("created_at", "branch_id")])
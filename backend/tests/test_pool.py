@@ -0,0 +1,94 @@
+import psycopg2.extensions
+import pytest
+
+from app.db import pool as pool_module
+from app.db.pool import ConnectionPool, PoolNotInitializedError, PoolTimeoutError, get_pool
+
+
+class _Info:
+    transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class _Connection:
+    def __init__(self, fail_rollback=False):
+        self.closed = 0
+        self.info = _Info()
+        self.rollbacks = 0
+        self.fail_rollback = fail_rollback
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise psycopg2.InterfaceError("connection already closed")
+        self.rollbacks += 1
+        self.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+class _FakePool:
+    """ThreadedConnectionPool-un baza açmayan əvəzi."""
+
+    def __init__(self, minconn, maxconn, **db_config):
+        self._pool = []
+        self.closed_on_put = []
+
+    def getconn(self):
+        return self._pool.pop() if self._pool else _Connection()
+
+    def putconn(self, conn, close=False):
+        if close:
+            self.closed_on_put.append(conn)
+        else:
+            self._pool.append(conn)
+
+    def closeall(self):
+        self._pool.clear()
+
+
+@pytest.fixture
+def make_pool(monkeypatch):
+    monkeypatch.setattr(pool_module.pg_pool, "ThreadedConnectionPool", _FakePool)
+    return lambda **options: ConnectionPool("test", {}, **{"minconn": 0, **options})
+
+
+def test_connections_are_reused(make_pool):
+    pool = make_pool(maxconn=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    stats = pool.stats()
+    assert stats["acquired_total"] == 2 and stats["in_use"] == 0 and stats["idle"] == 1
+
+
+def test_acquire_times_out_when_pool_is_exhausted(make_pool):
+    pool = make_pool(maxconn=1, acquire_timeout=0.01)
+    with pool.connection():
+        with pytest.raises(PoolTimeoutError):
+            with pool.connection():
+                pass
+    assert pool.stats()["acquire_timeouts"] == 1
+    with pool.connection():
+        pass
+
+
+def test_open_transaction_is_rolled_back_on_return(make_pool):
+    pool = make_pool()
+    with pool.connection() as conn:
+        conn.info.transaction_status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+    assert conn.rollbacks == 1
+
+
+def test_broken_connection_is_discarded_after_error(make_pool):
+    pool = make_pool()
+    broken = _Connection(fail_rollback=True)
+    pool._pool._pool.append(broken)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            assert conn is broken
+            raise RuntimeError("query failed")
+    assert pool._pool.closed_on_put == [broken]
+    assert pool.stats()["connections_discarded"] == 1
+
+
+def test_unknown_pool_name():
+    with pytest.raises(PoolNotInitializedError):
+        get_pool("missing")
@@ -0,0 +1,126 @@
+import time
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from app.db import database  # noqa: E402
+from app.db.preaggregations import Dimension, PreaggregationManager, Rollup, parse_aggregate_query  # noqa: E402
+
+MONTH = Dimension("created_at", "month")
+BRANCH = Dimension("branch_id")
+
+
+def _manager(refreshed_at=None):
+    rollup = Rollup("transactions_abc", "transactions", (MONTH, BRANCH), (("sum", "amount"), ("count", "amount")),
+                    column_types={"sum_amount": "numeric"}, source_types={"amount": "numeric"}, row_count=100,
+                    refreshed_at=time.time() if refreshed_at is None else refreshed_at)
+    manager = PreaggregationManager({"enabled": True, "schema": "preagg", "max_staleness": 3600})
+    manager._rollups = {rollup.name: rollup}
+    return manager
+
+
+def test_parse_aggregate_query_collects_dimensions_and_measures():
+    query = parse_aggregate_query(
+        "SELECT date_trunc('month', t.created_at) AS month, AVG(t.amount) FROM transactions t "
+        "WHERE t.branch_id = 3 AND t.created_at >= '2024-01-01'::date GROUP BY 1 ORDER BY month;")
+    assert (query.table, query.alias) == ("transactions", "t")
+    assert query.group_by == [MONTH]
+    assert query.rollup_dimensions() == {MONTH, BRANCH}
+    assert query.rollup_measures() == {("sum", "amount"), ("count", "amount")}
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM transactions",
+    "SELECT branch_id FROM transactions GROUP BY branch_id",
+    "SELECT branch_id, SUM(amount) FROM transactions t JOIN branches b ON b.id = t.branch_id GROUP BY branch_id",
+    "SELECT branch_id, SUM(amount) FROM transactions",
+    "SELECT lower(status), COUNT(*) FROM transactions GROUP BY 1",
+    "SELECT branch_id, SUM(amount) FROM transactions WHERE amount > $1 GROUP BY branch_id",
+])
+def test_unsupported_shapes_are_not_parsed(sql):
+    assert parse_aggregate_query(sql) is None
+
+
+def test_rewrite_reaggregates_from_rollup():
+    manager = _manager()
+    rewritten, info = manager.rewrite(
+        "SELECT date_trunc('month', created_at) AS month, branch_id, SUM(amount) AS total, COUNT(amount) AS n "
+        "FROM transactions WHERE created_at >= '2024-01-01'::date GROUP BY 1, 2 ORDER BY total DESC LIMIT 5")
+
+    assert info["rollup"] == "transactions_abc" and info["rewritten_sql"] == rewritten
+    assert 'FROM "preagg"."transactions_abc"' in rewritten
+    assert "SUM(sum_amount)::numeric AS total" in rewritten.replace('"', '')
+    assert "COALESCE(SUM(count_amount), 0)::bigint AS n" in rewritten.replace('"', '')
+    assert "(created_at_month >= '2024-01-01'::date)" in rewritten.replace('"', '')
+    assert "GROUP BY created_at_month, branch_id" in rewritten.replace('"', '')
+    assert rewritten.endswith("LIMIT 5") and manager.stats()["rewrites"] == 1
+
+
+def test_rewrite_avg_from_sum_and_count():
+    rewritten, _ = _manager().rewrite(
+        "SELECT date_trunc('month', created_at), AVG(amount) FROM transactions GROUP BY 1")
+    plain = rewritten.replace('"', '')
+    assert "SUM(sum_amount)::numeric / NULLIF(SUM(count_amount), 0)" in plain
+    assert plain.endswith("GROUP BY created_at_month")
+
+
+@pytest.mark.parametrize("sql", [
+    # Filtr ay intervalının ortasından başlayır
+    "SELECT date_trunc('month', created_at), SUM(amount) FROM transactions WHERE created_at >= '2024-01-15' "
+    "GROUP BY 1",
+    # Rollup-da MAX(amount) yoxdur
+    "SELECT branch_id, MAX(amount) FROM transactions GROUP BY branch_id",
+    # Rollup-da gün intervalı yoxdur
+    "SELECT date_trunc('day', created_at), COUNT(*) FROM transactions GROUP BY 1",
+    # Rollup-da status ölçüsü yoxdur
+    "SELECT branch_id, SUM(amount) FROM transactions WHERE status = 'ok' GROUP BY branch_id",
+    "SELECT account_id, SUM(amount) FROM accounts GROUP BY account_id",
+])
+def test_rewrite_rejects_queries_the_rollup_cannot_answer(sql):
+    assert _manager().rewrite(sql) is None
+
+
+def test_stale_rollup_is_used_only_when_staleness_is_allowed():
+    manager = _manager(refreshed_at=time.time() - 7200)
+    sql = "SELECT branch_id, COUNT(*) FROM transactions GROUP BY branch_id"
+    assert manager.rewrite(sql) is None
+    assert manager.rewrite(sql, require_fresh=False) is not None
+
+
+class _LockedConnection:
+    """Advisory kilidi başqa prosesdə olan saxta əlaqə."""
+
+    def __init__(self):
+        self.executed = []
+        self.rolled_back = False
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+
+    def fetchone(self):
+        return (False,)
+
+    def rollback(self):
+        self.rolled_back = True
+
+
+def test_refresh_is_skipped_while_another_process_holds_the_lock(monkeypatch):
+    conn = _LockedConnection()
+
+    @contextmanager
+    def connection():
+        yield conn
+
+    monkeypatch.setattr(database, "get_db_connection", connection)
+    manager = _manager(refreshed_at=0.0)
+    rollup = manager._rollups["transactions_abc"]
+
+    assert manager.refresh(rollup) is rollup
+    assert rollup.refreshed_at == 0.0 and conn.rolled_back
+    assert conn.executed == ["SELECT pg_try_advisory_xact_lock(hashtext(%s))"]
+    assert manager.stats()["refresh_skipped"] == 1
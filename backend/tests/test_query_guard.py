@@ -0,0 +1,31 @@
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from app.db.query_guard import QueryRejectedError, check_statement  # noqa: E402
+
+
+@pytest.mark.parametrize("sql", [
+    'SELECT "pg_sleep"(10)',
+    'SELECT pg_catalog."pg_sleep"(1)',
+    "SELECT pg_catalog.pg_sleep_for('5 minutes')",
+    "SELECT pg_sleep_until(now() + interval '1 hour')",
+    "SELECT dblink_connect('host=evil')",
+    "SELECT dblink_send_query('c', 'DELETE FROM t')",
+    "SELECT dblink_open('c', 'SELECT 1')",
+    "SELECT pg_advisory_lock_shared(1)",
+    "SELECT pg_try_advisory_lock(1)",
+    "SELECT lo_get(16409)",
+    "SELECT query_to_xml('SELECT pg_sleep(10)', true, false, '')",
+])
+def test_blocked_functions_are_rejected(sql):
+    with pytest.raises(QueryRejectedError):
+        check_statement(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT count(*), lower(name) FROM customers",
+    'SELECT "sleep_minutes", pg_sleep_count FROM stats',
+])
+def test_ordinary_queries_pass(sql):
+    check_statement(sql)
@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+
+import pytest
+
+pytest.importorskip("psycopg2")
+
+from app.db import query_log as query_log_module  # noqa: E402
+from app.db.query_log import QueryLog, fingerprint_hash  # noqa: E402
+from app.db.sql_utils import fingerprint_sql  # noqa: E402
+
+
+class _Connection:
+    def cursor(self):
+        return self
+
+    def commit(self):
+        self.committed = True
+
+
+@pytest.fixture
+def written(monkeypatch):
+    """execute_values ilə göndərilən sətirləri toplayır."""
+    rows = []
+
+    @contextmanager
+    def connection():
+        yield _Connection()
+
+    monkeypatch.setattr(query_log_module, "get_db_connection", connection)
+    monkeypatch.setattr(query_log_module.psycopg2.extras, "execute_values",
+                        lambda cursor, sql, values: rows.extend(values))
+    return rows
+
+
+def _log(**config):
+    # Fon axını testin gedişində flush etməsin
+    return QueryLog(dict({"enabled": True, "flush_interval": 3600, "batch_size": 1000}, **config))
+
+
+def test_flush_writes_fingerprint_and_tables(written):
+    log = _log()
+    log.record("SELECT * FROM Accounts WHERE id = 5", 1, 12.34567, {"root": "Index Scan"}, request_id="r1")
+
+    assert log.flush() == 1 and log.flush() == 0
+    [row] = written
+    fingerprint = fingerprint_sql("SELECT * FROM Accounts WHERE id = 5")
+    assert row[:4] == (fingerprint_hash(fingerprint), fingerprint, "SELECT * FROM Accounts WHERE id = 5",
+                       ["accounts"])
+    assert row[4:10] == (1, 12.346, False, "ok", '{"root": "Index Scan"}', "r1")
+    assert log.stats()["written"] == 1 and log.stats()["pending"] == 0
+
+
+def test_disabled_log_records_nothing():
+    log = QueryLog({"enabled": False})
+    log.record("SELECT 1", 1, 1.0)
+    assert log.stats()["recorded"] == 0
+
+
+def test_pending_entries_are_bounded():
+    log = _log(max_pending=2)
+    for i in range(3):
+        log.record(f"SELECT {i}", 1, 1.0, request_id=str(i))
+    assert log.stats()["pending"] == 2 and log.stats()["dropped"] == 1
+
+
+def test_failed_flush_keeps_entries(monkeypatch):
+    @contextmanager
+    def unavailable():
+        raise RuntimeError("baza əlçatan deyil")
+        yield
+
+    monkeypatch.setattr(query_log_module, "get_db_connection", unavailable)
+    log = _log(max_pending=2)
+    log.record("SELECT 1", 1, 1.0, request_id="a")
+    log.record("SELECT 2", 1, 1.0, request_id="b")
+
+    assert log.flush() == 0
+    assert log.stats()["pending"] == 2 and log.stats()["failed_flushes"] == 1
@@ -0,0 +1,90 @@
+import pytest
+
+from app.db import database
+from app.db.database import ResultCache
+
+
+class _Frame:
+    """memory_usage(...).sum() ölçüsü məlum olan DataFrame əvəzi."""
+
+    def __init__(self, size):
+        self.size = size
+
+    def memory_usage(self, index=True, deep=True):
+        return self
+
+    def sum(self):
+        return self.size
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _Clock()
+    monkeypatch.setattr(database.time, "time", fake)
+    return fake
+
+
+def test_least_recently_used_entries_are_evicted_by_bytes(clock):
+    cache = ResultCache(max_bytes=300, ttl=60, max_entry_fraction=0.5)
+    cache.put("a", _Frame(100), frozenset({"accounts"}))
+    cache.put("b", _Frame(100), frozenset({"accounts"}))
+    assert cache.get("a") is not None  # "a" yenidən istifadə olunur, "b" ən köhnə olur
+    cache.put("c", _Frame(150), frozenset({"cards"}))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["bytes"] == 250 and stats["evictions"] == 1
+
+
+def test_oversized_result_is_not_cached(clock):
+    cache = ResultCache(max_bytes=1000, ttl=60, max_entry_fraction=0.25)
+    cache.put("big", _Frame(251), frozenset())
+    assert cache.get("big") is None and cache.stats()["bytes"] == 0
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(max_bytes=1000, ttl=60)
+    frame = _Frame(10)
+    cache.put("a", frame, frozenset({"accounts"}))
+    clock.now += 59
+    assert cache.get("a") == (frame, 59)
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0 and cache.stats()["bytes"] == 0
+
+
+def test_invalidation_removes_only_entries_reading_the_table(clock):
+    cache = ResultCache(max_bytes=1000, ttl=60)
+    cache.put("joined", _Frame(10), frozenset({"accounts", "customers"}))
+    cache.put("customers", _Frame(10), frozenset({"customers"}))
+    cache.put("cards", _Frame(10), frozenset({"cards"}))
+
+    assert cache.invalidate_tables(["Accounts"]) == 1
+    assert cache.get("joined") is None
+    assert cache.get("customers") is not None and cache.get("cards") is not None
+    assert cache.invalidate_tables(["customers"]) == 1
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_equivalent_sql_shares_one_entry(monkeypatch, clock):
+    executed = []
+    monkeypatch.setattr(database, "result_cache", ResultCache(max_bytes=1000, ttl=60))
+    monkeypatch.setattr(database, "rewrite_for_preaggregations", lambda sql: None)
+    monkeypatch.setattr(database, "execute_sql_query_df",
+                        lambda sql, limit=None, offset=None: executed.append(sql) or _Frame(10))
+
+    _, first = database.execute_sql_query_cached("SELECT *  FROM Accounts WHERE id = 10.50")
+    _, second = database.execute_sql_query_cached("select * from accounts -- şərh\n where id = 10.5;")
+
+    assert (first["hit"], second["hit"]) == (False, True)
+    assert len(executed) == 1
+    assert database.result_cache.invalidate_tables(["accounts"]) == 1
@@ -0,0 +1,60 @@
+import datetime
+import decimal
+import io
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq  # noqa: E402
+
+from app.services.result_formats import (  # noqa: E402
+    UnsupportedFormatError, dataframe_to_arrow_ipc, dataframe_to_parquet, negotiate_format,
+)
+
+
+def _query_frame():
+    """execute_sql_query_df-in qurduğu kimi: psycopg2 sətirləri, coerce_float=True."""
+    rows = [
+        (1, decimal.Decimal("10.50"), datetime.datetime(2024, 1, 1, 12), "Bakı", None, True,
+         datetime.date(2024, 1, 1), {"kanal": "mobil"}),
+        (2, decimal.Decimal("3.125"), datetime.datetime(2024, 1, 2), None, 2.5, False, None, 7),
+    ]
+    columns = ["id", "amount", "created_at", "city", "score", "active", "opened_on", "meta"]
+    return pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+
+EXPECTED = [
+    {"id": 1, "amount": 10.5, "created_at": datetime.datetime(2024, 1, 1, 12), "city": "Bakı", "score": None,
+     "active": True, "opened_on": datetime.date(2024, 1, 1), "meta": '{"kanal": "mobil"}'},
+    {"id": 2, "amount": 3.125, "created_at": datetime.datetime(2024, 1, 2), "city": None, "score": 2.5,
+     "active": False, "opened_on": None, "meta": "7"},
+]
+
+
+def test_arrow_ipc_round_trip_of_mixed_dtypes():
+    table = pa.ipc.open_stream(dataframe_to_arrow_ipc(_query_frame())).read_all()
+    assert table.schema.field("id").type == pa.int64()
+    assert table.schema.field("created_at").type == pa.timestamp("us")
+    assert table.schema.field("opened_on").type == pa.date32()
+    assert table.to_pylist() == EXPECTED
+
+
+def test_parquet_round_trip_of_mixed_dtypes():
+    table = pq.read_table(io.BytesIO(dataframe_to_parquet(_query_frame())))
+    assert table.to_pylist() == EXPECTED
+
+
+@pytest.mark.parametrize("accept, requested, expected", [
+    (None, None, "json"),
+    ("application/vnd.apache.arrow.stream", None, "arrow"),
+    ("application/json, application/vnd.apache.parquet;q=0.9", None, "parquet"),
+    ("application/vnd.apache.arrow.stream", "JSON", "json"),
+])
+def test_negotiate_format(accept, requested, expected):
+    assert negotiate_format(accept, requested) == expected
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(UnsupportedFormatError):
+        negotiate_format(None, "csv")
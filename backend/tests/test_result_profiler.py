@@ -0,0 +1,54 @@
+import datetime
+import decimal
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+
+from app.services.result_profiler import profile_result  # noqa: E402
+
+
+def test_decimal_and_date_columns_make_a_timeseries():
+    df = pd.DataFrame({
+        "day": [datetime.date(2024, 1, d) for d in range(1, 31)],
+        "amount": [decimal.Decimal("1.50") * d for d in range(1, 31)],
+    })
+    profile = profile_result(df)
+
+    assert profile["visualization_type"] == "timeseries"
+    assert profile["visualization_config"]["x"] == "day"
+    assert profile["column_info"]["numeric"] == ["amount"] and profile["column_info"]["date"] == ["day"]
+    stats = profile["statistics"]["numericStats"]["amount"]
+    assert stats == {"sum": 697.5, "avg": 23.25, "min": 1.5, "max": 45.0, "count": 30}
+    # Keşdən gələn DataFrame dəyişdirilmir
+    assert isinstance(df["amount"].iloc[0], decimal.Decimal)
+
+
+@pytest.mark.parametrize("rows, expected", [(5, "pie"), (15, "bar")])
+def test_small_category_results_pick_pie_or_bar(rows, expected):
+    df = pd.DataFrame({"branch": [f"Filial {i % 5}" for i in range(rows)], "customers": range(rows)})
+    profile = profile_result(df)
+    assert profile["visualization_type"] == expected
+    assert profile["statistics"]["categoryStats"]["branch"]["uniqueCount"] == 5
+
+
+def test_two_numeric_columns_with_many_rows_make_a_scatter():
+    df = pd.DataFrame({"balance": range(100), "age": [20 + i % 50 for i in range(100)]})
+    profile = profile_result(df)
+    assert profile["visualization_type"] == "scatter"
+    assert profile["visualization_config"]["x"] == "balance"
+
+
+def test_booleans_and_nulls():
+    df = pd.DataFrame({"active": [True, False, True], "score": [1.0, float("nan"), 3.0], "empty": [None] * 3})
+    profile = profile_result(df)
+    assert profile["column_info"]["numeric"] == ["score"]
+    assert profile["column_info"]["category"] == ["active"]
+    assert profile["statistics"]["numericStats"]["score"]["count"] == 2
+    assert "empty" not in profile["statistics"]["dataTypes"]
+
+
+def test_empty_result():
+    profile = profile_result(pd.DataFrame({"id": []}))
+    assert profile["visualization_type"] == "empty"
+    assert profile["statistics"]["totalRows"] == 0
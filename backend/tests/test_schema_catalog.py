@@ -0,0 +1,97 @@
+from contextlib import contextmanager
+
+import pytest
+
+from app.db import schema_catalog as catalog_module
+from app.db.schema_catalog import COLUMNS_QUERY, CONSTRAINTS_QUERY, FINGERPRINT_QUERY, SchemaCatalog
+
+COLUMNS = [
+    ("accounts", "account_id", "integer", "NO", None, None, "Müştəri hesabları"),
+    ("accounts", "customer_id", "integer", "NO", None, None, "Müştəri hesabları"),
+    ("customers", "customer_id", "integer", "NO", None, "Müştəri", None),
+]
+CONSTRAINTS = [
+    ("p", "accounts", "account_id", None, None),
+    ("p", "customers", "customer_id", None, None),
+    ("f", "accounts", "customer_id", "customers", "customer_id"),
+]
+
+
+class _FakeDatabase:
+    """Kataloq sorğularına sabit cavab verən və sorğuları sayan saxta baza."""
+
+    def __init__(self):
+        self.fingerprint = "v1"
+        self.fail = False
+        self.queries = []
+
+    @contextmanager
+    def connection(self):
+        if self.fail:
+            raise ConnectionError("baza əlçatan deyil")
+        yield self
+
+    def cursor(self):
+        return self
+
+    def execute(self, sql):
+        self.queries.append(sql)
+        self._result = {FINGERPRINT_QUERY: [(self.fingerprint,)], COLUMNS_QUERY: COLUMNS,
+                        CONSTRAINTS_QUERY: CONSTRAINTS}[sql]
+
+    def fetchone(self):
+        return self._result[0]
+
+    def fetchall(self):
+        return self._result
+
+
+@pytest.fixture
+def database(monkeypatch):
+    fake = _FakeDatabase()
+    monkeypatch.setattr(catalog_module, "get_db_connection", fake.connection)
+    return fake
+
+
+def test_snapshot_models_keys_and_prompt(database):
+    snapshot = SchemaCatalog().get_snapshot()
+    assert snapshot.table_names == ["accounts", "customers"]
+    accounts = snapshot.tables["accounts"]
+    assert accounts.primary_key == ["account_id"]
+    assert accounts.foreign_keys == {"customer_id": "customers.customer_id"}
+    assert "FK -> customers.customer_id" in snapshot.prompt_text
+    assert "Comment: Müştəri hesabları" in snapshot.prompt_text
+    # Cədvəl sayından asılı olmayaraq sabit sayda sorğu
+    assert len(database.queries) == 3
+
+
+def test_snapshot_is_reused_until_check_interval(database):
+    catalog = SchemaCatalog(ttl=300, check_interval=300)
+    first = catalog.get_snapshot()
+    database.queries.clear()
+    assert catalog.get_snapshot() is first
+    assert database.queries == []
+
+
+def test_fingerprint_change_reloads_snapshot(database):
+    catalog = SchemaCatalog(ttl=300, check_interval=0)
+    first = catalog.get_snapshot()
+    assert catalog.get_snapshot() is first
+
+    database.fingerprint = "v2"
+    second = catalog.get_snapshot()
+    assert second is not first and second.fingerprint == "v2"
+
+
+def test_failed_refresh_keeps_previous_snapshot(database):
+    catalog = SchemaCatalog(ttl=300, check_interval=0)
+    first = catalog.get_snapshot()
+    database.fail = True
+    assert catalog.get_snapshot(force_refresh=True) is first
+
+
+def test_invalidate_forces_reload(database):
+    catalog = SchemaCatalog(ttl=300, check_interval=300)
+    first = catalog.get_snapshot()
+    catalog.invalidate()
+    assert catalog.get_snapshot() is not first
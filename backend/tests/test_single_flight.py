@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+from app.services.query_registry import QueryContext, current_query, query_registry
+from app.services.single_flight import SingleFlight
+
+
+def _requester(flight, key, factory, request_id, deadline=60.0):
+    """Öz QueryContext-i ilə flight.run çağıran sorğunu (tapşırıq kimi) başladır."""
+    ctx = QueryContext(request_id=request_id, deadline=time.monotonic() + deadline)
+
+    async def run():
+        current_query.set(ctx)
+        return await flight.run(key, factory)
+
+    return ctx, asyncio.ensure_future(run())
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight("test")
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return 42
+
+        results = await asyncio.gather(*[flight.run("k", work) for _ in range(5)])
+        assert [result for result, _ in results] == [42] * 5
+        assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+        assert len(calls) == 1
+        assert flight.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*[flight.run("k", work) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+
+    asyncio.run(scenario())
+
+
+def test_work_runs_in_its_own_query_context():
+    async def scenario():
+        flight = SingleFlight("test")
+        seen = []
+
+        async def work():
+            seen.append(current_query.get())
+            return "ok"
+
+        first, task = _requester(flight, "k", work, "first")
+        await task
+        assert seen[0] is not None and seen[0] is not first
+        assert seen[0].request_id == "first"
+
+    asyncio.run(scenario())
+
+
+def test_first_requester_cancelled_while_second_waits():
+    async def scenario():
+        flight = SingleFlight("test")
+        started = asyncio.Event()
+        release = asyncio.Event()
+        flight_contexts = []
+
+        async def work():
+            flight_contexts.append(current_query.get())
+            started.set()
+            await release.wait()
+            return "result"
+
+        first, first_task = _requester(flight, "k", work, "first")
+        await started.wait()
+        second, second_task = _requester(flight, "k", work, "second")
+        await asyncio.sleep(0)
+
+        # Birinci sorğu ləğv edilir (DELETE / bağlantı kəsilməsi): iş davam etməlidir
+        first.task = first_task
+        query_registry.cancel(first, "client_request")
+        await asyncio.gather(first_task, return_exceptions=True)
+        assert first_task.cancelled()
+        assert not flight_contexts[0].cancelled
+
+        release.set()
+        assert await second_task == ("result", True)
+        assert flight.stats()["cancelled"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_last_waiter_leaving_cancels_the_work():
+    async def scenario():
+        flight = SingleFlight("test")
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+        flight_contexts = []
+
+        async def work():
+            flight_contexts.append(current_query.get())
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        only, task = _requester(flight, "k", work, "only")
+        await started.wait()
+        only.task = task
+        query_registry.cancel(only, "client_request")
+        await asyncio.gather(task, return_exceptions=True)
+
+        await asyncio.wait_for(cancelled.wait(), 1)
+        assert flight_contexts[0].cancel_reason == "client_request"
+        assert flight.stats() == {"in_flight": 0, "executed": 1, "coalesced": 0, "cancelled": 1,
+                                  "coalesced_ratio": 0.0}
+
+    asyncio.run(scenario())
@@ -0,0 +1,51 @@
+import pytest
+
+from app.db.sql_utils import find_function_calls, is_read_only_query
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT comment FROM reviews",
+    "SELECT c.set, c.lock, c.do, c.call FROM config c;",
+    "SELECT refresh AS security, reset FROM t",
+    "WITH recent AS (SELECT * FROM transactions) SELECT count(*) FROM recent",
+    "WITH x AS MATERIALIZED (VALUES (1)) SELECT * FROM x",
+    "WITH RECURSIVE a (n) AS (SELECT 1), b AS (TABLE a) (SELECT * FROM b) UNION ALL SELECT 2",
+    "WITH RECURSIVE t (id) AS (SELECT 1) SEARCH DEPTH FIRST BY id SET ord SELECT * FROM t",
+    "SELECT ';' AS separator",
+])
+def test_read_only_queries_are_allowed(sql):
+    assert is_read_only_query(sql)
+
+
+@pytest.mark.parametrize("sql", [
+    "DELETE FROM reviews",
+    "UPDATE t SET a = 1",
+    "SELECT 1; DROP TABLE t",
+    "COMMENT ON TABLE t IS 'x'",
+    "WITH gone AS (DELETE FROM t RETURNING *) SELECT * FROM gone",
+    "WITH x AS NOT MATERIALIZED (UPDATE t SET a = 1 RETURNING a) SELECT * FROM x",
+    "WITH t AS (SELECT 1) DELETE FROM users",
+    "WITH t AS (SELECT 1) UPDATE users SET a = 1",
+    "WITH a AS (SELECT 1), b AS (WITH c AS (SELECT 1) DELETE FROM t RETURNING *) SELECT 1",
+    "WITH t AS (SELECT 1) INSERT INTO users SELECT * FROM t",
+    "",
+])
+def test_write_statements_are_rejected(sql):
+    assert not is_read_only_query(sql)
+
+
+@pytest.mark.parametrize("sql, name", [
+    ("SELECT pg_sleep(10)", "pg_sleep"),
+    ('SELECT "pg_sleep"(10)', "pg_sleep"),
+    ('SELECT pg_catalog."pg_sleep"(1)', "pg_sleep"),
+    ("SELECT pg_catalog . pg_sleep /* x */ (1)", "pg_sleep"),
+    ('SELECT U&"pg\\005Fsleep"(1)', "pg_sleep"),
+    ("SELECT * FROM dblink_connect('host=x')", "dblink_connect"),
+])
+def test_function_calls_are_found_in_any_spelling(sql, name):
+    assert name in find_function_calls(sql)
+
+
+def test_strings_and_columns_are_not_function_calls():
+    assert find_function_calls("SELECT 'pg_sleep(1)', pg_sleep FROM t") == []
+
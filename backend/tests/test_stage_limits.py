@@ -0,0 +1,63 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services.query_registry import QueryContext, current_query
+from app.services.stage_limits import StageLimiter
+
+
+class _Connection:
+    """conn.cancel() çağırışında bloklanan "əmri" dayandıran saxta baza əlaqəsi."""
+
+    def __init__(self):
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        self.cancelled.set()
+
+
+def test_timed_out_thread_keeps_its_slot_and_cancels_statements():
+    async def scenario():
+        stage = StageLimiter("test", max_concurrency=1, timeout=0.05)
+        ctx = QueryContext(request_id="r1", deadline=time.monotonic() + 60)
+        conn = _Connection()
+        ctx.connections.add(conn)
+        current_query.set(ctx)
+
+        def slow_query():
+            conn.cancelled.wait(5)
+            return "done"
+
+        with pytest.raises(asyncio.TimeoutError):
+            await stage.run_blocking(slow_query)
+        assert stage.stats()["timeouts"] == 1
+        assert conn.cancelled.wait(1)
+
+        # Thread bitənə qədər yer tutulur; sonra növbəti iş keçir
+        await asyncio.sleep(0.05)
+        assert stage.stats()["active"] == 0
+        assert await stage.run_blocking(lambda: "next") == "next"
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_held_until_abandoned_thread_returns():
+    async def scenario():
+        stage = StageLimiter("test", max_concurrency=1, timeout=0.02)
+        release = threading.Event()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await stage.run_blocking(release.wait, 5)
+        assert stage.stats()["active"] == 1
+
+        waiter = asyncio.ensure_future(stage.run_blocking(lambda: "next", timeout=5))
+        await asyncio.sleep(0.05)
+        assert not waiter.done() and stage.stats()["waiting"] == 1
+
+        release.set()
+        assert await waiter == "next"
+        assert stage.stats()["active"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,39 @@
+"""Soyuq başlama reqressiyaları: app.main ayrıca prosesdə import olunur (əl ilə profil: benchmarks.startup_profile)."""
+import json
+import os
+import statistics
+
+import pytest
+
+for _module in ("fastapi", "psycopg2", "dotenv"):
+    pytest.importorskip(_module)
+
+from benchmarks.startup_profile import LAZY_MODULES, run_python  # noqa: E402
+
+# Import zamanı yüklənməməli modullar: ağır kitabxanalar, Gemini SDK və rollup modulu
+EAGER_FORBIDDEN = LAZY_MODULES + ("app.db.preaggregations",)
+IMPORT_BUDGET_MS = float(os.getenv("STARTUP_IMPORT_BUDGET_MS", "1500"))
+
+IMPORT_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import app.main
+print(json.dumps({
+    "import_ms": (time.perf_counter() - started) * 1000,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def _import_app():
+    result = run_python(IMPORT_SCRIPT % (EAGER_FORBIDDEN,))
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_heavy_modules_are_not_imported_eagerly():
+    assert _import_app()["loaded"] == []
+
+
+def test_import_time_within_budget():
+    import_ms = statistics.median(_import_app()["import_ms"] for _ in range(3))
+    assert import_ms < IMPORT_BUDGET_MS, f"import app.main {import_ms:.0f} ms > {IMPORT_BUDGET_MS:.0f} ms"
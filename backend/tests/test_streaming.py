@@ -0,0 +1,82 @@
+import datetime
+import decimal
+import json
+from contextlib import contextmanager
+
+from app.api.endpoints import _iter_ndjson
+from app.db import database
+
+
+class _StreamConnection:
+    """Adlı (server-side) cursor-u təqlid edən saxta əlaqə; icra olunan əmrləri yadda saxlayır."""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+        self.executed = []
+        self.cursor_names = []
+        self.fetch_sizes = []
+        self.description = [("id",), ("amount",)]
+
+    def cursor(self, name=None):
+        self.cursor_names.append(name)
+        return self
+
+    def execute(self, sql):
+        self.executed.append(sql)
+
+    def fetchmany(self, size):
+        self.fetch_sizes.append(size)
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+def _patch_connection(monkeypatch, conn):
+    @contextmanager
+    def connection():
+        yield conn
+
+    monkeypatch.setattr(database, "get_db_connection", connection)
+    monkeypatch.setattr(database, "rewrite_for_preaggregations", lambda sql: None)
+
+
+def test_stream_yields_columns_then_bounded_batches(monkeypatch):
+    conn = _StreamConnection((i, i * 10) for i in range(5))
+    _patch_connection(monkeypatch, conn)
+
+    parts = list(database.stream_sql_query("SELECT id, amount FROM t", batch_size=2, limit=5))
+
+    assert parts[0] == ["id", "amount"]
+    assert [len(batch) for batch in parts[1:]] == [2, 2, 1]
+    assert set(conn.fetch_sizes) == {2}
+    assert conn.cursor_names[-1].startswith("stream_")
+    assert conn.executed[0] == "SET TRANSACTION READ ONLY"
+    assert conn.executed[-1].endswith("LIMIT 5")
+
+
+def test_ndjson_lines_meta_rows_end():
+    finished = []
+    batches = iter([[(1, decimal.Decimal("2.50"))], [(2, datetime.date(2024, 1, 31))]])
+    lines = [json.loads(line) for line in
+             _iter_ndjson("SELECT 1", ["id", "value"], batches, False,
+                          on_finish=lambda rows, status: finished.append((rows, status)))]
+
+    assert [line["type"] for line in lines] == ["meta", "rows", "rows", "end"]
+    assert lines[1]["rows"] == [{"id": 1, "value": 2.5}]
+    assert lines[2]["rows"] == [{"id": 2, "value": "2024-01-31"}] and lines[2]["rows_so_far"] == 2
+    assert lines[-1]["total_rows"] == 2
+    assert finished == [(2, "ok")]
+
+
+def test_ndjson_error_mid_stream_ends_with_error_line():
+    def batches():
+        yield [(1,)]
+        raise RuntimeError("canceling statement due to statement timeout")
+
+    finished = []
+    lines = [json.loads(line) for line in
+             _iter_ndjson("SELECT 1", ["id"], batches(), False,
+                          on_finish=lambda rows, status: finished.append((rows, status)))]
+
+    assert [line["type"] for line in lines] == ["meta", "rows", "error"]
+    assert lines[-1]["rows_so_far"] == 1
+    assert finished == [(1, "error")]
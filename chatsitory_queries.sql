@@ -2,8 +2,11 @@
 CREATE TABLE IF NOT EXISTS chats (
     chat_id SERIAL PRIMARY KEY,
     title VARCHAR(255) NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    last_message_order INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
-    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    search_vector TSVECTOR GENERATED ALWAYS AS (to_tsvector('simple', title)) STORED
 );
 
 
@@ -15,30 +18,79 @@ CREATE TABLE IF NOT EXISTS chat_messages (
     generated_sql TEXT,
     message_order INTEGER NOT NULL,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    search_vector TSVECTOR GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', message_text), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(generated_sql, '')), 'C')
+    ) STORED,
     UNIQUE(chat_id, message_order)
 );
 
 
 
+-- Create visualization_payloads table
+-- Content-addressed result data: sha256 of the canonical JSON, stored once, compressed (zstd/zlib)
+CREATE TABLE IF NOT EXISTS visualization_payloads (
+    payload_hash CHAR(64) PRIMARY KEY,
+    encoding VARCHAR(16) NOT NULL,
+    payload BYTEA NOT NULL,
+    raw_size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    row_count INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+
+
 -- Create chat_visualizations table
+-- storage_mode: 'inline' (data_json holds the data), 'payload' (payload_hash),
+-- 'lazy' (data_json holds a preview, source_sql is re-executed on view)
 CREATE TABLE IF NOT EXISTS chat_visualizations (
     viz_id SERIAL PRIMARY KEY,
     message_id INTEGER NOT NULL REFERENCES chat_messages(message_id) ON DELETE CASCADE,
     visualization_type VARCHAR(50) NOT NULL,
-    data_json JSONB NOT NULL,
+    data_json JSONB,
     chart_config JSONB,
+    payload_hash CHAR(64) REFERENCES visualization_payloads(payload_hash),
+    storage_mode VARCHAR(16) NOT NULL DEFAULT 'inline',
+    source_sql TEXT,
+    row_count INTEGER,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
 );
 
 
 
+-- Create query_log table
+-- One row per /api/query execution against the retail banking database
+-- (fingerprint = canonical SQL with literals replaced by '?'; read by: python -m app.db.index_advisor)
+CREATE TABLE IF NOT EXISTS query_log (
+    log_id BIGSERIAL PRIMARY KEY,
+    fingerprint_hash CHAR(32) NOT NULL,
+    fingerprint TEXT NOT NULL,
+    executed_sql TEXT NOT NULL,
+    tables TEXT[] NOT NULL DEFAULT '{}',
+    row_count INTEGER,
+    execution_ms DOUBLE PRECISION NOT NULL,
+    result_cache_hit BOOLEAN NOT NULL DEFAULT FALSE,
+    status VARCHAR(16) NOT NULL DEFAULT 'ok',
+    plan_summary JSONB,
+    request_id VARCHAR(64),
+    executed_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+
+
 
 
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_chats_created_at ON chats(created_at DESC);
+-- Keyset pagination for the sidebar: ORDER BY updated_at DESC, chat_id DESC
+CREATE INDEX IF NOT EXISTS idx_chats_updated_at ON chats(updated_at DESC, chat_id DESC);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_chat_id ON chat_messages(chat_id);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_order ON chat_messages(chat_id, message_order);
 CREATE INDEX IF NOT EXISTS idx_chat_visualizations_message_id ON chat_visualizations(message_id);
+-- Full-text search GIN indexes are created in the search migration below (after the columns exist)
+CREATE INDEX IF NOT EXISTS idx_query_log_executed_at ON query_log(executed_at DESC);
+CREATE INDEX IF NOT EXISTS idx_query_log_fingerprint ON query_log(fingerprint_hash, executed_at DESC);
 
 
 
@@ -61,4 +113,73 @@ CREATE TRIGGER update_chats_updated_at
     EXECUTE FUNCTION update_updated_at_column();
 
 
+-- Migration for existing databases: denormalized message count on chats
+-- (kept up to date by the application in the same transaction as the message insert)
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS message_count INTEGER NOT NULL DEFAULT 0;
+
+-- Backfill without touching updated_at (the trigger would otherwise reset it)
+ALTER TABLE chats DISABLE TRIGGER update_chats_updated_at;
+UPDATE chats c
+SET message_count = counts.cnt
+FROM (
+    SELECT chat_id, COUNT(*) AS cnt
+    FROM chat_messages
+    GROUP BY chat_id
+) counts
+WHERE counts.chat_id = c.chat_id
+  AND c.message_count <> counts.cnt;
+ALTER TABLE chats ENABLE TRIGGER update_chats_updated_at;
+
+
+-- Migration: per-chat message_order counter (allocated with UPDATE ... RETURNING)
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS last_message_order INTEGER NOT NULL DEFAULT 0;
+
+ALTER TABLE chats DISABLE TRIGGER update_chats_updated_at;
+UPDATE chats c
+SET last_message_order = orders.max_order
+FROM (
+    SELECT chat_id, MAX(message_order) AS max_order
+    FROM chat_messages
+    GROUP BY chat_id
+) orders
+WHERE orders.chat_id = c.chat_id
+  AND c.last_message_order < orders.max_order;
+ALTER TABLE chats ENABLE TRIGGER update_chats_updated_at;
+
+
+
+-- Migration: content-addressed visualization payloads
+-- (existing inline rows are moved by: python -m migrations.migrate_visualization_payloads)
+CREATE TABLE IF NOT EXISTS visualization_payloads (
+    payload_hash CHAR(64) PRIMARY KEY,
+    encoding VARCHAR(16) NOT NULL,
+    payload BYTEA NOT NULL,
+    raw_size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    row_count INTEGER,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+ALTER TABLE chat_visualizations ALTER COLUMN data_json DROP NOT NULL;
+ALTER TABLE chat_visualizations ADD COLUMN IF NOT EXISTS payload_hash CHAR(64) REFERENCES visualization_payloads(payload_hash);
+ALTER TABLE chat_visualizations ADD COLUMN IF NOT EXISTS storage_mode VARCHAR(16) NOT NULL DEFAULT 'inline';
+ALTER TABLE chat_visualizations ADD COLUMN IF NOT EXISTS source_sql TEXT;
+ALTER TABLE chat_visualizations ADD COLUMN IF NOT EXISTS row_count INTEGER;
+CREATE INDEX IF NOT EXISTS idx_chat_visualizations_payload_hash ON chat_visualizations(payload_hash);
+
+
+
+-- Migration: full-text search over chat titles, questions and generated SQL
+-- 'simple' config: no Azerbaijani stemmer ships with PostgreSQL, so words are only lower-cased
+-- (adding a STORED generated column rewrites the table once)
+ALTER TABLE chats ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (to_tsvector('simple', title)) STORED;
+ALTER TABLE chat_messages ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', message_text), 'A') ||
+        setweight(to_tsvector('simple', COALESCE(generated_sql, '')), 'C')
+    ) STORED;
+CREATE INDEX IF NOT EXISTS idx_chats_search ON chats USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_chat_messages_search ON chat_messages USING GIN (search_vector);
+
+
 select * from chat_visualizations;
\ No newline at end of file
@@ -15,6 +15,7 @@ import { VisualizationRenderer } from './visualizations/VisualizationRenderer';
 // Import hooks and context
 import { useDataAnalysis } from '../hooks/useDataAnalysis';
 import { useChat } from '../contexts/ChatContext';
+import { chatService } from '../services/chatService';
 
 const API_BASE_URL = 'http://localhost:8000';
 
@@ -124,6 +125,22 @@ const Dashboard = () => {
           };
           setResults(reconstructedResults);
           setCurrentQuery(lastMessage.message_text);
+
+          // Only a preview is stored for this result - load the full data on view
+          if (lastViz.is_preview) {
+            chatService.getVisualizationData(lastViz.viz_id)
+              .then(({ data }) => {
+                setResults(prev => prev && prev.generated_sql === lastMessage.generated_sql ? {
+                  ...prev,
+                  data,
+                  statistics: analyzeAndProcessData({
+                    data,
+                    generated_sql: lastMessage.generated_sql
+                  }).statistics
+                } : prev);
+              })
+              .catch(() => {});
+          }
         } catch (error) {
           console.error('Error reconstructing results:', error);
           setResults(null);
@@ -280,7 +297,7 @@ const Dashboard = () => {
                       <h3 className="text-lg font-semibold text-gray-800">Chat Mesajları:</h3>
                       
                       {activeChatDetail.messages.map((message, index) => (
-                        <div key={message.message_id} className="bg-white border rounded-xl p-6 shadow-sm">
+                        <div key={message.message_id} id={`message-${message.message_id}`} className="bg-white border rounded-xl p-6 shadow-sm">
                           {/* Message Header */}
                           <div className="flex items-start gap-3 mb-4">
                             <div className="bg-blue-600 rounded-full p-2 flex-shrink-0">
@@ -339,6 +356,11 @@ const Dashboard = () => {
                                       <span className="text-sm font-medium text-gray-700">
                                         Vizualizasiya: {viz.visualization_type}
                                       </span>
+                                      {viz.is_preview && (
+                                        <span className="text-xs text-gray-500">
+                                          (önizləmə: {viz.data_json?.length ?? 0} / {viz.row_count ?? '?'} sətir)
+                                        </span>
+                                      )}
                                     </div>
                                     
                                     {/* Statistics Cards for this visualization */}
@@ -1,8 +1,19 @@
-import React, { useState } from 'react';
-import { History, Database, Loader } from 'lucide-react';
+import React, { useState, useEffect } from 'react';
+import { History, Database, Loader, Search, X } from 'lucide-react';
 import NewChatButton from './NewChatButton';
 import ChatListItem from './ChatListItem';
 import { useChat } from '../contexts/ChatContext';
+import { chatService } from '../services/chatService';
+
+// Scroll to the matching message once the selected chat has rendered
+const scrollToMessage = (messageId, attempts = 20) => {
+  const element = document.getElementById(`message-${messageId}`);
+  if (element) {
+    element.scrollIntoView({ behavior: 'smooth', block: 'center' });
+  } else if (attempts > 0) {
+    setTimeout(() => scrollToMessage(messageId, attempts - 1), 100);
+  }
+};
 
 const Sidebar = ({ availableTables = [] }) => {
   const {
@@ -14,10 +25,73 @@ const Sidebar = ({ availableTables = [] }) => {
     selectChat,
     deleteChat,
     updateChatTitle,
-    clearActiveChat
+    clearActiveChat,
+    loadMoreChats,
+    hasMoreChats
   } = useChat();
 
   const [creatingChat, setCreatingChat] = useState(false);
+  const [searchQuery, setSearchQuery] = useState('');
+  const [searchResults, setSearchResults] = useState([]);
+  const [searchCursor, setSearchCursor] = useState(null);
+  const [searching, setSearching] = useState(false);
+
+  // Debounced search: one request per pause in typing, stale responses are ignored
+  useEffect(() => {
+    const text = searchQuery.trim();
+    if (!text) {
+      setSearchResults([]);
+      setSearchCursor(null);
+      return undefined;
+    }
+
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        setSearching(true);
+        const page = await chatService.searchChats(text);
+        if (!cancelled) {
+          setSearchResults(page.results);
+          setSearchCursor(page.nextCursor);
+        }
+      } catch (error) {
+        if (!cancelled) setSearchResults([]);
+      } finally {
+        if (!cancelled) setSearching(false);
+      }
+    }, 250);
+
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [searchQuery]);
+
+  const loadMoreSearchResults = async () => {
+    try {
+      setSearching(true);
+      const page = await chatService.searchChats(searchQuery.trim(), Number(searchCursor));
+      setSearchResults(prev => [...prev, ...page.results]);
+      setSearchCursor(page.nextCursor);
+    } catch (error) {
+      console.error('Axtarış nəticələri yüklənərkən xəta:', error);
+    } finally {
+      setSearching(false);
+    }
+  };
+
+  const handleSelectSearchResult = async (result) => {
+    const chat = chats.find(c => c.chat_id === result.chat_id) || {
+      chat_id: result.chat_id,
+      title: result.chat_title,
+      created_at: result.created_at,
+      updated_at: result.created_at
+    };
+    await selectChat(chat);
+    if (result.message_id) {
+      scrollToMessage(result.message_id);
+    }
+  };
 
   const handleCreateNewChat = async () => {
     try {
@@ -63,6 +137,26 @@ const Sidebar = ({ availableTables = [] }) => {
           </button>
         </div>
 
+        {/* Search */}
+        <div className="mt-4 relative">
+          <Search className="h-4 w-4 text-gray-400 absolute left-3 top-1/2 -translate-y-1/2" />
+          <input
+            type="text"
+            value={searchQuery}
+            onChange={(e) => setSearchQuery(e.target.value)}
+            placeholder="Chatlərdə axtar..."
+            className="w-full pl-9 pr-8 py-2 text-sm border border-gray-200 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500"
+          />
+          {searchQuery && (
+            <button
+              onClick={() => setSearchQuery('')}
+              className="absolute right-2 top-1/2 -translate-y-1/2 p-1 text-gray-400 hover:text-gray-600"
+            >
+              <X className="h-4 w-4" />
+            </button>
+          )}
+        </div>
+
         {/* Available Tables */}
         {availableTables.length > 0 && (
           <div className="mt-4">
@@ -109,7 +203,45 @@ const Sidebar = ({ availableTables = [] }) => {
           </div>
         )}
 
-        {/* Chat List */}
+        {/* Search Results */}
+        {searchQuery.trim() ? (
+          <div className="p-4 space-y-2">
+            {searching && searchResults.length === 0 && (
+              <div className="flex items-center gap-3 text-gray-500 py-4 justify-center">
+                <Loader className="h-4 w-4 animate-spin" />
+                <span className="text-sm">Axtarılır...</span>
+              </div>
+            )}
+            {!searching && searchResults.length === 0 && (
+              <p className="text-center text-gray-500 text-sm py-8">Heç nə tapılmadı</p>
+            )}
+            {searchResults.map((result) => (
+              <button
+                key={`${result.chat_id}-${result.message_id ?? 'title'}`}
+                onClick={() => handleSelectSearchResult(result)}
+                className="w-full text-left p-3 rounded-lg border border-gray-100 hover:bg-blue-50 transition-colors"
+              >
+                <p className="text-sm font-medium text-gray-800 truncate">{result.chat_title}</p>
+                <p className="text-xs text-gray-600 mt-1 line-clamp-3 break-words">
+                  {result.snippet_parts.map((part, index) => (
+                    part.highlight
+                      ? <mark key={index} className="bg-yellow-100 text-gray-900 rounded px-0.5">{part.text}</mark>
+                      : <span key={index}>{part.text}</span>
+                  ))}
+                </p>
+              </button>
+            ))}
+            {searchCursor && (
+              <button
+                onClick={loadMoreSearchResults}
+                disabled={searching}
+                className="w-full px-3 py-2 text-sm text-blue-600 hover:bg-blue-50 rounded-lg transition-colors disabled:opacity-50"
+              >
+                Daha çox nəticə
+              </button>
+            )}
+          </div>
+        ) : (
         <div className="p-4 space-y-2">
           {chats.length === 0 && !loading ? (
             <div className="text-center py-8">
@@ -130,7 +262,19 @@ const Sidebar = ({ availableTables = [] }) => {
               />
             ))
           )}
+
+          {/* Older chats are loaded page by page */}
+          {hasMoreChats && (
+            <button
+              onClick={loadMoreChats}
+              disabled={loading}
+              className="w-full px-3 py-2 text-sm text-blue-600 hover:bg-blue-50 rounded-lg transition-colors disabled:opacity-50"
+            >
+              Daha çox chat yüklə
+            </button>
+          )}
         </div>
+        )}
       </div>
 
       {/* Footer */}
@@ -3,7 +3,7 @@ import { TrendingUp } from 'lucide-react';
 import { ResponsiveContainer, ScatterChart, Scatter, XAxis, YAxis, CartesianGrid, Tooltip } from 'recharts';
 
 const ScatterChartView = ({ results }) => {
-  const { data, column_info } = results;
+  const { data, column_info, chart } = results;
   const numericCols = column_info.numeric;
 
   return (
@@ -11,6 +11,11 @@ const ScatterChartView = ({ results }) => {
       <h3 className="text-lg font-semibold text-gray-800 mb-4 flex items-center gap-2">
         <TrendingUp className="h-5 w-5 text-blue-600" />
         Korrelyasiya Analizi
+        {chart && (
+          <span className="ml-auto text-xs font-normal text-gray-500">
+            {chart.points} nöqtə / {chart.total_rows} sətir
+          </span>
+        )}
       </h3>
       <ResponsiveContainer width="100%" height={400}>
         <ScatterChart data={data}>
@@ -3,13 +3,18 @@ import { LineChart as LineChartIcon } from 'lucide-react';
 import { ResponsiveContainer, AreaChart, Area, XAxis, YAxis, CartesianGrid, Tooltip } from 'recharts';
 
 const TimeSeriesChart = ({ results }) => {
-  const { data, primaryNumericColumn, primaryDateColumn } = results;
+  const { data, primaryNumericColumn, primaryDateColumn, chart } = results;
 
   return (
     <div className="bg-white rounded-xl shadow-lg p-6">
       <h3 className="text-lg font-semibold text-gray-800 mb-4 flex items-center gap-2">
         <LineChartIcon className="h-5 w-5 text-blue-600" />
         Zaman Seriyası Analizi
+        {chart && (
+          <span className="ml-auto text-xs font-normal text-gray-500">
+            {chart.points} nöqtə / {chart.total_rows} sətir
+          </span>
+        )}
       </h3>
       <ResponsiveContainer width="100%" height={400}>
         <AreaChart data={data}>
@@ -11,9 +11,42 @@ export const useChat = () => {
   return context;
 };
 
+// Build the chat message the backend is saving in the background from the /api/query response
+const appendSavedMessage = (chatDetail, query, results) => {
+  if (!chatDetail || !results?.message_id) return chatDetail;
+
+  const messages = chatDetail.messages || [];
+  const lastOrder = messages.length > 0 ? messages[messages.length - 1].message_order : 0;
+  const createdAt = new Date().toISOString();
+
+  return {
+    ...chatDetail,
+    messages: [
+      ...messages,
+      {
+        message_id: results.message_id,
+        chat_id: chatDetail.chat_id,
+        message_text: query,
+        generated_sql: results.generated_sql || null,
+        message_order: lastOrder + 1,
+        created_at: createdAt,
+        visualizations: [{
+          viz_id: null,
+          message_id: results.message_id,
+          visualization_type: results.visualization_type || 'table',
+          data_json: results.data || [],
+          chart_config: results.visualization_config || null,
+          created_at: createdAt,
+        }],
+      },
+    ],
+  };
+};
+
 export const ChatProvider = ({ children }) => {
   // State management
   const [chats, setChats] = useState([]);
+  const [nextChatsCursor, setNextChatsCursor] = useState(null);
   const [activeChat, setActiveChat] = useState(null);
   const [activeChatDetail, setActiveChatDetail] = useState(null);
   const [loading, setLoading] = useState(false);
@@ -46,12 +79,13 @@ export const ChatProvider = ({ children }) => {
     }
   }, [error]);
 
-  // Load all chats from database
+  // Load the first page of chats from database
   const loadAllChats = useCallback(async () => {
     try {
       setLoading(true);
-      const loadedChats = await loadChats();
+      const { chats: loadedChats, nextCursor } = await loadChats();
       setChats(loadedChats);
+      setNextChatsCursor(nextCursor);
     } catch (err) {
       setError(err.message || 'Chatlər yüklənərkən xəta baş verdi');
     } finally {
@@ -59,6 +93,25 @@ export const ChatProvider = ({ children }) => {
     }
   }, [loadChats]);
 
+  // Load the next (older) page of chats and append it to the list
+  const loadMoreChats = useCallback(async () => {
+    if (!nextChatsCursor) return;
+
+    try {
+      setLoading(true);
+      const { chats: olderChats, nextCursor } = await loadChats(nextChatsCursor);
+      setChats(prevChats => {
+        const seen = new Set(prevChats.map(chat => chat.chat_id));
+        return [...prevChats, ...olderChats.filter(chat => !seen.has(chat.chat_id))];
+      });
+      setNextChatsCursor(nextCursor);
+    } catch (err) {
+      setError(err.message || 'Chatlər yüklənərkən xəta baş verdi');
+    } finally {
+      setLoading(false);
+    }
+  }, [loadChats, nextChatsCursor]);
+
   // Create new chat
   const handleCreateChat = useCallback(async (title = null) => {
     try {
@@ -158,24 +211,26 @@ export const ChatProvider = ({ children }) => {
       if (!activeChat) {
         const newChat = await handleCreateChat();
         
-        // Process query and save to new chat
+        // Process query; the backend saves it to the new chat in the background
         const processedResults = await processAndSaveQuery(query, newChat.chat_id);
         
-        // Reload chat detail to get the saved message
-        const updatedChatDetail = await loadChatDetail(newChat.chat_id);
-        setActiveChatDetail(updatedChatDetail);
+        // Show the saved message right away instead of re-fetching the chat detail
+        setActiveChatDetail(prev => appendSavedMessage(
+          prev?.chat_id === newChat.chat_id ? prev : { ...newChat, messages: [] },
+          query,
+          processedResults
+        ));
         
         // Update chat list (move to top and update message count)
         await loadAllChats();
         
         return processedResults;
       } else {
-        // Process query and save to existing active chat
+        // Process query; the backend saves it to the active chat in the background
         const processedResults = await processAndSaveQuery(query, activeChat.chat_id);
         
-        // Reload active chat detail to get the new message
-        const updatedChatDetail = await loadChatDetail(activeChat.chat_id);
-        setActiveChatDetail(updatedChatDetail);
+        // Show the saved message right away instead of re-fetching the chat detail
+        setActiveChatDetail(prev => appendSavedMessage(prev, query, processedResults));
         
         // Update chat list (move to top and update message count)
         await loadAllChats();
@@ -188,7 +243,7 @@ export const ChatProvider = ({ children }) => {
     } finally {
       setLoading(false);
     }
-  }, [activeChat, handleCreateChat, processAndSaveQuery, loadChatDetail, loadAllChats]);
+  }, [activeChat, handleCreateChat, processAndSaveQuery, loadAllChats]);
 
   // Create chat with first message (for when user submits without selecting a chat)
   const handleCreateChatWithMessage = useCallback(async (messageText, generatedSql, visualizationData) => {
@@ -269,6 +324,8 @@ export const ChatProvider = ({ children }) => {
     
     // Utility functions
     refreshChats: loadAllChats,
+    loadMoreChats,
+    hasMoreChats: Boolean(nextChatsCursor),
     clearError: handleClearError,
     getLastMessage,
     hasMessages,
@@ -26,14 +26,14 @@ export const useChatPersistence = () => {
     }
   }, []);
 
-  // Load all chats
-  const loadChats = useCallback(async () => {
+  // Load a page of chats ({ chats, nextCursor })
+  const loadChats = useCallback(async (cursor = null) => {
     try {
       setLoading(true);
       setError(null);
       
-      const chats = await chatService.getAllChats();
-      return chats;
+      const page = await chatService.getAllChats(cursor);
+      return page;
     } catch (err) {
       setError(err.message);
       throw err;
@@ -42,6 +42,11 @@ export const useDataAnalysis = () => {
   };
 
   const analyzeAndProcessData = (apiData) => {
+    // In chart mode the server returns only the (aggregated/downsampled) chart points
+    if (apiData && (!apiData.data || apiData.data.length === 0) && apiData.chart_data?.length) {
+      apiData = { ...apiData, data: apiData.chart_data };
+    }
+
     if (!apiData || !apiData.data) {
       return {
         type: 'empty',
@@ -72,62 +77,61 @@ export const useDataAnalysis = () => {
       };
     }
 
+    // Prefer the profile computed on the server (full-column dtypes, vectorized stats)
+    const serverProfile = apiData.column_info && apiData.statistics ? apiData : null;
+
     // Analyze column types and data patterns
     const columns = Object.keys(data[0] || {});
-    const numericColumns = [];
-    const dateColumns = [];
-    const textColumns = [];
-    const categoryColumns = [];
+    let numericColumns = [];
+    let dateColumns = [];
+    let textColumns = [];
+    let categoryColumns = [];
 
-    // Analyze each column
-    columns.forEach(col => {
-      const sampleValues = data.slice(0, 10).map(row => row[col]).filter(val => val !== null && val !== undefined);
-      
-      if (sampleValues.length === 0) return;
+    if (serverProfile) {
+      numericColumns = serverProfile.column_info.numeric || [];
+      dateColumns = serverProfile.column_info.date || [];
+      textColumns = serverProfile.column_info.text || [];
+      categoryColumns = serverProfile.column_info.category || [];
+    } else {
+      // Analyze each column
+      columns.forEach(col => {
+        const sampleValues = data.slice(0, 10).map(row => row[col]).filter(val => val !== null && val !== undefined);
+        
+        if (sampleValues.length === 0) return;
 
-      // Check if numeric
-      if (sampleValues.every(val => !isNaN(val) && isFinite(val))) {
-        numericColumns.push(col);
-      }
-      // Check if date
-      else if (sampleValues.some(val => !isNaN(Date.parse(val)))) {
-        dateColumns.push(col);
-      }
-      // Check if categorical (limited unique values)
-      else if (new Set(sampleValues).size <= Math.min(10, sampleValues.length * 0.8)) {
-        categoryColumns.push(col);
-      }
-      // Otherwise it's text
-      else {
-        textColumns.push(col);
-      }
-    });
+        // Check if numeric
+        if (sampleValues.every(val => !isNaN(val) && isFinite(val))) {
+          numericColumns.push(col);
+        }
+        // Check if date
+        else if (sampleValues.some(val => !isNaN(Date.parse(val)))) {
+          dateColumns.push(col);
+        }
+        // Check if categorical (limited unique values)
+        else if (new Set(sampleValues).size <= Math.min(10, sampleValues.length * 0.8)) {
+          categoryColumns.push(col);
+        }
+        // Otherwise it's text
+        else {
+          textColumns.push(col);
+        }
+      });
+    }
 
     // Determine visualization type based on data structure
     let visualizationType = 'table';
     let chartData = data;
 
+    if (serverProfile) {
+      visualizationType = serverProfile.visualization_type || 'table';
+    }
     // Time series detection
-    if (dateColumns.length > 0 && numericColumns.length > 0) {
+    else if (dateColumns.length > 0 && numericColumns.length > 0) {
       visualizationType = 'timeseries';
-      chartData = data.map(row => ({
-        ...row,
-        date: dateColumns.length > 0 ? new Date(row[dateColumns[0]]).toLocaleDateString('az-AZ') : row[dateColumns[0]]
-      }));
     }
     // Categorical comparison with numeric values
     else if (categoryColumns.length > 0 && numericColumns.length > 0 && data.length <= 20) {
-      if (categoryColumns.length === 1 && data.length <= 8) {
-        visualizationType = 'pie';
-      } else {
-        visualizationType = 'bar';
-      }
-      
-      chartData = data.map(row => ({
-        category: row[categoryColumns[0]] || 'Unknown',
-        value: parseFloat(row[numericColumns[0]]) || 0,
-        ...row
-      }));
+      visualizationType = categoryColumns.length === 1 && data.length <= 8 ? 'pie' : 'bar';
     }
     // Large dataset with multiple numeric columns
     else if (numericColumns.length >= 2 && data.length > 20) {
@@ -136,13 +140,29 @@ export const useDataAnalysis = () => {
     // Ranking/leaderboard data
     else if (data.length <= 50 && numericColumns.length > 0) {
       visualizationType = 'ranking';
-      chartData = data
+    }
+
+    if (visualizationType === 'timeseries') {
+      chartData = data.map(row => ({
+        ...row,
+        date: dateColumns.length > 0 ? new Date(row[dateColumns[0]]).toLocaleDateString('az-AZ') : row[dateColumns[0]]
+      }));
+    } else if (visualizationType === 'pie' || visualizationType === 'bar') {
+      chartData = data.map(row => ({
+        category: row[categoryColumns[0]] || 'Unknown',
+        value: parseFloat(row[numericColumns[0]]) || 0,
+        ...row
+      }));
+    } else if (visualizationType === 'ranking') {
+      chartData = [...data]
         .sort((a, b) => (parseFloat(b[numericColumns[0]]) || 0) - (parseFloat(a[numericColumns[0]]) || 0))
         .map((row, index) => ({ ...row, rank: index + 1 }));
     }
 
     // Calculate statistics
-    const statistics = calculateStatistics(data, numericColumns, categoryColumns);
+    const statistics = serverProfile
+      ? serverProfile.statistics
+      : calculateStatistics(data, numericColumns, categoryColumns);
 
     return {
       type: visualizationType,
@@ -157,7 +177,8 @@ export const useDataAnalysis = () => {
         category: categoryColumns,
         total: columns.length
       },
-      row_count: data.length,
+      row_count: apiData.row_count ?? data.length,
+      chart: apiData.chart || null,
       statistics,
       primaryNumericColumn: numericColumns[0],
       primaryCategoryColumn: categoryColumns[0],
@@ -222,9 +243,8 @@ export const useDataAnalysis = () => {
         
         // Process the data using your existing analysis logic
         const processedResult = analyzeAndProcessData({
-          data: response.data,
-          generated_sql: response.generated_sql,
-          row_count: response.data ? response.data.length : 0
+          ...response,
+          row_count: response.row_count ?? (response.data ? response.data.length : 0)
         });
         
         // Set the result for your existing Dashboard component
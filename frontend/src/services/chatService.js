@@ -24,21 +24,50 @@ class ChatService {
     }
   }
 
-  async getAllChats() {
+  async getAllChats(cursor = null, limit = 50) {
     try {
-      const response = await fetch(`${API_BASE_URL}/api/chats`);
+      const params = new URLSearchParams({ limit: String(limit) });
+      if (cursor) {
+        params.set('cursor', cursor);
+      }
+
+      const response = await fetch(`${API_BASE_URL}/api/chats?${params}`);
       
       if (!response.ok) {
         throw new Error('Chatlər alına bilmədi');
       }
 
-      return await response.json();
+      // The cursor for the next (older) page comes back in a response header
+      return {
+        chats: await response.json(),
+        nextCursor: response.headers.get('X-Next-Cursor'),
+      };
     } catch (error) {
       console.error('Chatlər alınarkən xəta:', error);
       throw error;
     }
   }
 
+  async searchChats(query, offset = 0, limit = 20) {
+    try {
+      const params = new URLSearchParams({ q: query, limit: String(limit), offset: String(offset) });
+      const response = await fetch(`${API_BASE_URL}/api/chats/search?${params}`);
+
+      if (!response.ok) {
+        throw new Error('Axtarış aparıla bilmədi');
+      }
+
+      // The offset of the next page comes back in a response header
+      return {
+        results: await response.json(),
+        nextCursor: response.headers.get('X-Next-Cursor'),
+      };
+    } catch (error) {
+      console.error('Chatlərdə axtarış zamanı xəta:', error);
+      throw error;
+    }
+  }
+
   async getChatDetail(chatId) {
     try {
       const response = await fetch(`${API_BASE_URL}/api/chats/${chatId}`);
@@ -196,6 +225,22 @@ class ChatService {
     }
   }
 
+  // Full data of a visualization stored as SQL + preview (re-executed on the server)
+  async getVisualizationData(vizId) {
+    try {
+      const response = await fetch(`${API_BASE_URL}/api/visualizations/${vizId}/data`);
+
+      if (!response.ok) {
+        throw new Error('Vizualizasiya məlumatı alına bilmədi');
+      }
+
+      return await response.json();
+    } catch (error) {
+      console.error('Vizualizasiya məlumatı alınarkən xəta:', error);
+      throw error;
+    }
+  }
+
   // Combined operation: Create chat with first message and visualization
   async createChatWithMessage(messageText, generatedSql, visualization = null) {
     try {
@@ -224,8 +269,26 @@ class ChatService {
     }
   }
 
+  // Əvvəlki sorğu hələ icra olunursa, yenisi başlamazdan əvvəl ləğv edilir
+  cancelActiveQuery() {
+    if (!this.activeQuery) return;
+    const { requestId, controller } = this.activeQuery;
+    this.activeQuery = null;
+    controller.abort();
+    fetch(`${API_BASE_URL}/api/query/${encodeURIComponent(requestId)}`, { method: 'DELETE' })
+      .catch(() => {});
+  }
+
   // Data analysis endpoint (existing functionality)
+  // With a chatId the backend saves the message and result itself and returns message_id,
+  // so the rows are never uploaded back
   async processQuery(query, chatId = null) {
+    this.cancelActiveQuery();
+    const requestId = crypto.randomUUID();
+    const controller = new AbortController();
+    const activeQuery = { requestId, controller };
+    this.activeQuery = activeQuery;
+
     try {
       const response = await fetch(`${API_BASE_URL}/api/query`, {
         method: 'POST',
@@ -234,8 +297,13 @@ class ChatService {
         },
         body: JSON.stringify({ 
           query,
-          analyze_structure: true 
-        })
+          analyze_structure: true,
+          chat_id: chatId,
+          request_id: requestId,
+          // Zaman seriyası və nöqtə qrafiki üçün server yalnız məhdud sayda nöqtə qaytarır
+          chart_mode: true
+        }),
+        signal: controller.signal
       });
 
       if (!response.ok) {
@@ -245,49 +313,17 @@ class ChatService {
 
       const data = await response.json();
       
-      // If we have a chatId, save this to the database
-      if (chatId) {
-        try {
-          // Create the payload in the exact format the backend expects
-          const payload = {
-            message_text: query,
-            generated_sql: data.generated_sql || null,
-            visualization: {
-              visualization_type: data.visualization_type || 'table',
-              data_json: data.data || [],
-              chart_config: data.visualization_config || null
-            }
-          };
-
-          console.log('Sending payload to backend:', JSON.stringify(payload, null, 2));
-
-          const saveResponse = await fetch(`${API_BASE_URL}/api/chats/${chatId}/messages-with-viz`, {
-            method: 'POST',
-            headers: {
-              'Content-Type': 'application/json',
-            },
-            body: JSON.stringify(payload),
-          });
-
-          if (!saveResponse.ok) {
-            const errorData = await saveResponse.json();
-            console.error('Mesaj saxlama xətası:', errorData);
-            console.error('Full error details:', JSON.stringify(errorData, null, 2));
-            // Don't throw, just log the error
-          } else {
-            console.log('Mesaj uğurla saxlandı');
-          }
-          
-        } catch (saveError) {
-          console.error('Chat-ə saxlanarkən xəta:', saveError);
-          // Don't throw here, return the data anyway
-        }
-      }
-
       return data;
     } catch (error) {
+      if (error.name === 'AbortError') {
+        throw new Error('Sorğu ləğv edildi');
+      }
       console.error('Sorğu icra edilərkən xəta:', error);
       throw error;
+    } finally {
+      if (this.activeQuery === activeQuery) {
+        this.activeQuery = null;
+      }
     }
   }
 }